@@ -0,0 +1,17 @@
+import pytest
+
+from outlines import SIZES
+
+
+def pytest_addoption(parser):
+    parser.addoption("--max-vertices", type=int, default=max(SIZES),
+                     help="skip the placement benchmarks on outlines with more vertices than this")
+
+
+def pytest_collection_modifyitems(config, items):
+    limit = config.getoption("--max-vertices")
+    skip = pytest.mark.skip(reason="more than --max-vertices={} vertices".format(limit))
+    for item in items:
+        callspec = getattr(item, 'callspec', None)
+        if callspec is not None and callspec.params.get('vertices', 0) > limit:
+            item.add_marker(skip)
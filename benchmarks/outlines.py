@@ -0,0 +1,63 @@
+"""synthetic site outlines for the placement benchmarks"""
+import numpy as np
+
+# mean length of the outline segments in site_outline & write_sites_kml, in metres
+SEGMENT = 12.5
+
+# vertex counts of the benchmarked outlines
+SIZES = (10, 1000, 10000, 100000)
+
+
+def jagged_outline(n, radius=2000.0, x0=500000.0, y0=4200000.0, seed=0):
+    """
+    closed, jagged outline in projected (metre) coordinates, like a site after its UTM projection
+
+    Args:
+    n: number of distinct vertices in the outline.
+    radius: mean distance of the vertices from the centre, in metres. Default 2000.
+    x0, y0: centre of the outline. Defaults put it inside UTM zone 18.
+    seed: seed for the radial noise, so repeated runs use the same outline.
+
+    Returns:
+    xy: (n + 1, 2) numpy array, with the first vertex repeated at the end to close the ring.
+
+    """
+    rs = np.random.RandomState(seed)
+    t = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    r = radius * (1 + 0.15 * np.sin(7 * t) + 0.05 * rs.rand(n))
+    xy = np.column_stack([r * np.cos(t) + x0, r * np.sin(t) + y0])
+    return np.vstack([xy, xy[:1]])
+
+
+def site_outline(n, seed=0):
+    """
+    jagged outline with n vertices about SEGMENT metres apart, at least 2 km across
+
+    Growing the site with the vertex count keeps the segments, and so the work per vertex,
+    comparable between sizes.
+    """
+    return jagged_outline(n, radius=max(2000.0, n * SEGMENT / (2 * np.pi)), seed=seed)
+
+
+def write_sites_kml(path, sites, vertices, lon0=-77.05, lat0=38.87):
+    """
+    write a KML file with sites polygon placemarks, site_0 to site_<sites - 1>
+
+    Args:
+    path: path of the .kml file.
+    sites: number of sites, laid out 0.1 degree apart in longitude.
+    vertices: number of vertices in each site outline.
+    lon0, lat0: lon-lat of the first site. Defaults are in Washington DC.
+
+    """
+    with open(path, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<kml xmlns="http://www.opengis.net/kml/2.2">\n<Document>\n')
+        for i in range(sites):
+            xy = site_outline(vertices, seed=i) - (500000.0, 4200000.0)
+            # metres to degrees around the centre of the site
+            lon = lon0 + 0.1 * i + xy[:, 0] / (111320.0 * np.cos(np.radians(lat0)))
+            lat = lat0 + xy[:, 1] / 110540.0
+            coords = ' '.join('{:.7f},{:.7f},0'.format(x, y) for x, y in zip(lon, lat))
+            f.write('<Placemark><name>site_{}</name><Polygon><outerBoundaryIs><LinearRing><coordinates>{}'
+                    '</coordinates></LinearRing></outerBoundaryIs></Polygon></Placemark>\n'.format(i, coords))
+        f.write('</Document>\n</kml>\n')
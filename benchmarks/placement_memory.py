@@ -0,0 +1,95 @@
+"""
+wall time & peak memory of placeSensor on a large synthetic outline
+
+GEOS allocates outside of the python heap, so tracemalloc misses most of the memory held
+by the placement polygons. Each measurement runs in a fresh process instead, and reports the
+peak resident set size of that process along with its growth during the placement.
+
+Usage:
+    python benchmarks/placement_memory.py [--vertices 10000] [--rng 200] [--fov 45] [--baseline REV]
+
+--baseline also measures placeSensor from cov_algo.py as of a git revision, e.g. the commit
+before the MultiPolygon was built once at return, so the two can be compared side by side.
+"""
+import argparse
+import importlib.util
+import multiprocessing
+import os
+import resource
+import subprocess
+import tempfile
+import time
+
+from outlines import jagged_outline
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULE = 'src/final_project/tasks/cov_algo.py'
+
+
+def load_cov_algo(rev=None):
+    """import cov_algo from the working tree, or from a git revision if rev is given"""
+    if rev is None:
+        from final_project.tasks import cov_algo
+        return cov_algo
+
+    source = subprocess.check_output(['git', 'show', '{}:{}'.format(rev, MODULE)], cwd=ROOT)
+    with tempfile.NamedTemporaryFile('wb', suffix='.py', delete=False) as f:
+        f.write(source)
+    spec = importlib.util.spec_from_file_location('cov_algo_baseline', f.name)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    os.unlink(f.name)
+    return module
+
+
+def _peak_rss_mib():
+    # ru_maxrss is in KiB on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _measure(rev, vertices, rng, fov, queue):
+    cov_algo = load_cov_algo(rev)
+    xy = jagged_outline(vertices)
+
+    rss_before = _peak_rss_mib()
+    start = time.perf_counter()
+    sps = cov_algo.placeSensor(xy, rng=rng, fov=fov, skip_small=True)
+    wall = time.perf_counter() - start
+    rss_after = _peak_rss_mib()
+
+    queue.put({'sensors': len(sps), 'wall_s': wall, 'peak_rss_mib': rss_after, 'rss_growth_mib': rss_after - rss_before})
+
+
+def measure(rev, vertices, rng, fov):
+    """run one placement in a fresh process and return its timings & memory use"""
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_measure, args=(rev, vertices, rng, fov, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vertices', type=int, default=10000)
+    parser.add_argument('--rng', type=int, default=200)
+    parser.add_argument('--fov', type=int, default=45)
+    parser.add_argument('--baseline', metavar='REV', default=None, help='git revision to compare against')
+    args = parser.parse_args()
+
+    runs = [('working tree', None)]
+    if args.baseline:
+        runs.append((args.baseline, args.baseline))
+
+    print('{} vertices, rng={}, fov={}'.format(args.vertices, args.rng, args.fov))
+    print('{:<16}{:>10}{:>12}{:>16}{:>18}'.format('version', 'sensors', 'wall (s)', 'peak rss (MiB)', 'rss growth (MiB)'))
+    for label, rev in runs:
+        r = measure(rev, args.vertices, args.rng, args.fov)
+        print('{:<16}{:>10}{:>12.3f}{:>16.1f}{:>18.1f}'.format(
+            label, r['sensors'], r['wall_s'], r['peak_rss_mib'], r['rss_growth_mib']))
+
+
+if __name__ == '__main__':
+    main()
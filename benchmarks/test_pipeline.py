@@ -0,0 +1,53 @@
+"""
+end to end load_sites -> run_algos -> write_kml throughput on a generated multi site KML
+
+Needs the spatialite db of the test settings, like place_sensors/tests.py. The commands work
+on the data/ directories relative to the working directory, so each run happens in a fresh
+temporary one.
+"""
+import io
+import os
+
+import pytest
+from django.core.management import call_command
+
+from outlines import write_sites_kml
+
+SITES = 20
+VERTICES = 200
+
+# run_algos options of each way of running the placements
+MODES = {
+    'luigi': [],
+    'pool': ['--pool'],
+    'direct': ['--direct'],
+}
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    for d in ('site_wkt', 'sensor_wkt', 'sensor_kml'):
+        os.makedirs(str(tmp_path / 'data' / d))
+    kml = str(tmp_path / 'sites.kml')
+    write_sites_kml(kml, SITES, VERTICES)
+    monkeypatch.chdir(str(tmp_path))
+    return tmp_path
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('mode', sorted(MODES))
+def test_pipeline(benchmark, workdir, mode):
+    load = ['load_sites', 'sites.kml'] + (['--no-files'] if mode == 'direct' else [])
+
+    def pipeline():
+        call_command(*load, stdout=io.StringIO())
+        call_command('run_algos', '--all', '--workers', '2', *MODES[mode])
+        call_command('write_kml')
+
+    benchmark.group = 'pipeline'
+    benchmark.extra_info.update(sites=SITES, vertices=VERTICES)
+    benchmark.pedantic(pipeline, rounds=3, iterations=1)
+    # placements per second, to compare runs of different sizes
+    benchmark.extra_info['sites_per_s'] = SITES / benchmark.stats.stats.mean
+
+    assert len(os.listdir(str(workdir / 'data' / 'sensor_kml'))) == 2 * SITES
@@ -0,0 +1,39 @@
+"""
+placeSensor timings on synthetic outlines, for the default radar & camera specs
+
+Run with pytest-benchmark, see the bench environment in tox.ini. The interval engine places
+one sensor at a time in python, so from 10k vertices on it is only timed once per run.
+"""
+import pytest
+
+from final_project.tasks.cov_algo import placeSensor
+from outlines import SIZES, site_outline
+
+# (rng, fov) of the sensors load_sites creates
+SENSORS = {'radar': (200, 45), 'camera': (50, 10)}
+
+# placement engine: placeSensor keyword arguments
+ENGINES = {
+    'interval': {},
+    'vectorized': {'vectorized': True},
+    'cover': {'algorithm': 'cover'},
+}
+
+
+@pytest.mark.parametrize('engine', sorted(ENGINES))
+@pytest.mark.parametrize('sensor', sorted(SENSORS))
+@pytest.mark.parametrize('vertices', SIZES)
+def test_place_sensor(benchmark, vertices, sensor, engine):
+    xy = site_outline(vertices)
+    rng, fov = SENSORS[sensor]
+    kwargs = dict(ENGINES[engine], rng=rng, fov=fov)
+    benchmark.group = 'placeSensor-{}-{}'.format(sensor, vertices)
+    benchmark.extra_info['vertices'] = vertices
+
+    if engine == 'interval' and vertices >= 10000:
+        sps = benchmark.pedantic(placeSensor, args=(xy,), kwargs=kwargs, rounds=1, iterations=1)
+    else:
+        sps = benchmark(placeSensor, xy, **kwargs)
+
+    benchmark.extra_info['sensors'] = len(sps)
+    assert len(sps) > 0
@@ -240,3 +240,27 @@ SOCIALACCOUNT_ADAPTER = "final_project.users.adapters.SocialAccountAdapter"
 
 # Your stuff...
 # ------------------------------------------------------------------------------
+
+# PLACEMENT API
+# ------------------------------------------------------------------------------
+# see place_sensors.views. worker processes placing the submitted outlines, per web server process
+PLACEMENT_API_WORKERS = env.int("PLACEMENT_API_WORKERS", default=2)
+# jobs waiting or running before further submissions are turned down with a 429
+PLACEMENT_API_MAX_PENDING = env.int("PLACEMENT_API_MAX_PENDING", default=32)
+# largest outline accepted, in vertices
+PLACEMENT_API_MAX_VERTICES = env.int("PLACEMENT_API_MAX_VERTICES", default=100000)
+# shortest sensor range accepted, in metres
+PLACEMENT_API_MIN_RNG = env.float("PLACEMENT_API_MIN_RNG", default=10.0)
+# most sensors a submission may need, estimated as the outline perimeter over the range
+PLACEMENT_API_MAX_SENSORS = env.int("PLACEMENT_API_MAX_SENSORS", default=10000)
+# longest a submission may wait for its result before it gets a 202, in seconds
+PLACEMENT_API_MAX_WAIT = env.float("PLACEMENT_API_MAX_WAIT", default=2.0)
+# how long the job records & results are kept in the cache, in seconds
+PLACEMENT_API_JOB_TIMEOUT = env.int("PLACEMENT_API_JOB_TIMEOUT", default=3600)
+
+# MAP TILES
+# ------------------------------------------------------------------------------
+# see place_sensors.views.tile_view. lowest zoom the placements are drawn at, only the sites below it
+TILES_PLACEMENT_MIN_ZOOM = env.int("TILES_PLACEMENT_MIN_ZOOM", default=12)
+# how long a rendered tile is kept in the cache, in seconds
+TILES_CACHE_TIMEOUT = env.int("TILES_CACHE_TIMEOUT", default=86400)
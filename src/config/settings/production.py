@@ -198,6 +198,12 @@ LOGGING = {
             "handlers": ["console", "mail_admins"],
             "propagate": True,
         },
+        # stage timings & counts of the placement pipeline, one JSON line per stage
+        "final_project.tasks.metrics": {
+            "level": "INFO",
+            "handlers": ["console"],
+            "propagate": False,
+        },
     },
 }
 
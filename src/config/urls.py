@@ -16,6 +16,7 @@ urlpatterns = [
     path("users/", include("final_project.users.urls", namespace="users")),
     path("accounts/", include("allauth.urls")),
     # Your stuff: custom urls includes go here
+    path("api/", include("place_sensors.urls", namespace="place_sensors")),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
 if settings.DEBUG:
@@ -15,12 +15,111 @@ Why does this file exist, and why not put this in __main__?
   Also see (1) from http://click.pocoo.org/5/setuptools/#setuptools-integration
 """
 import argparse
+import os
+import sys
+from contextlib import ExitStack
 
-parser = argparse.ArgumentParser(description='Command description.')
-parser.add_argument('names', metavar='NAME', nargs=argparse.ZERO_OR_MORE,
-                    help="A name of something.")
+# default range & fov of the sensor types, as load_sites creates them
+SENSORS = {'radar': ('Radar', 200, 45), 'camera': ('Camera', 50, 10)}
+
+# nothing but argparse is imported up front, numpy & the placement code are imported in main
+# and GEOS only when an outline has to be projected. the choices are those of
+# final_project.tasks.outline_io.FORMATS, cov_algo.ALGORITHMS & projection.PROJECTIONS
+parser = argparse.ArgumentParser(prog='final_project',
+                                 description='Place sensors along site outlines, without Django or a database.')
+parser.add_argument('outline', nargs='?',
+                    help="KML/KMZ, GeoJSON or WKT (one per line) file with the site outlines, - for stdin")
+parser.add_argument('-o', '--output', default='-', help="output file, - for stdout (the default)")
+parser.add_argument('-f', '--from', dest='input_format', choices=('kml', 'geojson', 'wkt'),
+                    help="input format, guessed from the file suffix by default (wkt for stdin)")
+parser.add_argument('-t', '--to', dest='output_format', choices=('kml', 'geojson', 'wkt'),
+                    help="output format, guessed from the file suffix by default (wkt for stdout)")
+parser.add_argument('-s', '--sensor', choices=sorted(SENSORS), default='radar',
+                    help="sensor type, radar (200 m, 45 deg) or camera (50 m, 10 deg). Default radar")
+parser.add_argument('--rng', type=float, help="range of the sensor in metres, instead of the sensor type's")
+parser.add_argument('--fov', type=float, help="fov of the sensor in degrees, instead of the sensor type's")
+parser.add_argument('--algorithm', choices=('interval', 'cover'), default='interval',
+                    help="placement engine, see placeSensor. Default interval")
+parser.add_argument('--vectorized', action='store_true', help="use the array based placement")
+parser.add_argument('--projection', choices=('utm', 'aeqd'), default='utm',
+                    help="local projection of lat-long outlines. Default utm")
+parser.add_argument('--planar', action='store_true',
+                    help="the outlines are already in metres: place them as they are, without projecting")
+
+
+def place(polygons, sensor, args):
+    """
+    placement of one sensor along a site outline
+
+    Args:
+    polygons: site outline, as a list of polygons each with its list of vertex rings.
+    sensor: (stype, rng, fov) sensor spec.
+    args: parsed command line.
+
+    Returns:
+    placement: the sensor wedges, as a list of polygons in the layout of the outline.
+
+    """
+    stype, rng, fov = sensor
+    if args.planar:
+        from final_project.tasks.cov_algo import placeSensorRings
+
+        rings = placeSensorRings([xy for rings in polygons for xy in rings], rng=rng, fov=fov, skip_small=True,
+                                 vectorized=args.vectorized, algorithm=args.algorithm)
+        return [[ring] for ring in rings]
+
+    from final_project.tasks.cov_algo import place_site
+    from final_project.tasks.footprints import polygon_rings
+    from final_project.tasks.outline_io import to_geometry
+
+    placement, = place_site(to_geometry(polygons), [(stype, stype, rng, fov)], args.projection,
+                            args.vectorized, algorithm=args.algorithm)
+    return polygon_rings(placement)
+
+
+def run(args):
+    """read the outlines, place a sensor along each one and write the placements"""
+    from final_project.tasks.kml import create_kml
+    from final_project.tasks.outline_io import WRITERS, guess_format, iter_outlines
+
+    stype, rng, fov = SENSORS[args.sensor]
+    sensor = (stype, args.rng or rng, args.fov or fov)
+    input_format = args.input_format or guess_format(args.outline)
+    output_format = args.output_format or guess_format(args.output)
+    stem = 'site' if args.outline == '-' else os.path.splitext(os.path.basename(args.outline))[0]
+
+    with ExitStack() as stack:
+        if args.outline == '-':
+            fin = sys.stdin.buffer if input_format == 'kml' else sys.stdin
+        elif input_format == 'kml':
+            # kml is parsed from bytes, and kmz archives are opened by name
+            fin = args.outline
+        else:
+            fin = stack.enter_context(open(args.outline))
+
+        if args.output == '-':
+            fout = sys.stdout
+        elif output_format == 'kml':
+            fout = stack.enter_context(create_kml(args.output, kmz=args.output.lower().endswith('.kmz')))
+        else:
+            fout = stack.enter_context(open(args.output, 'w'))
+
+        n = 0
+        writer = WRITERS[output_format](fout, sensor)
+        for i, (name, polygons) in enumerate(iter_outlines(fin, input_format)):
+            writer.write(name or '{}_{}'.format(stem, i), place(polygons, sensor, args), polygons)
+            n += 1
+        writer.close()
+    return n
 
 
 def main(args=None):
     args = parser.parse_args(args=args)
-    print(args.names)
+    if args.outline is None:
+        parser.print_help()
+        return 0
+    try:
+        run(args)
+    except (OSError, ValueError, KeyError) as e:
+        parser.exit(1, '{}: error: {}\n'.format(parser.prog, e))
+    return 0
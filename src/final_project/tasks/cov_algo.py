@@ -1,69 +1,386 @@
+"""
+sensor placement along site outlines
+
+Only numpy is imported up front. GEOS & GDAL (django.contrib.gis) are imported by the
+functions that need them, and the luigi tasks live in luigi_tasks, so that the array based
+placements start fast, e.g. from the command line (see final_project.cli).
+"""
 import os
-from math import sqrt, ceil, pi, cos, sin
+import time
+from math import sqrt, ceil
 from collections import namedtuple
+from functools import partial
 
 import numpy as np
 
-from luigi import Task, LocalTarget, Parameter, IntParameter
-from django.contrib.gis.gdal import SpatialReference, CoordTransform, OGRGeomType
-from django.contrib.gis.geos import LinearRing, LineString, Polygon, MultiPolygon, GEOSGeometry
+from final_project.tasks import metrics
+from final_project.tasks.footprints import (placement_wedges, wedge_bounds, wedge_multipolygon, wedge_polygons,
+                                            wedge_rings)
+from final_project.tasks.geoio import dump_geometry, load_geometry, read_geometry
+from final_project.tasks.placement_cache import content_key
+from final_project.tasks.poses import merge_poses, pack_poses
+from final_project.tasks.projection import local_projection, transform_pair
+from final_project.tasks.set_cover import placeSensorCover
+from final_project.tasks.simplify import SIMPLIFY_VERSION, record_coverage_difference, simplify_rings, tolerance_for
+from final_project.tasks.spatial_index import GridIndex
 
+# version of the placement algorithm, part of the placement cache keys.
+# bump it whenever a change to placeSensor changes its output
+ALGORITHM_VERSION = 1
 
-class PlaceSensorTask(Task):
-    """luigi task for calculating sensor placements"""
+# placement engines: sensors every rng along the outline, or a greedy set cover of the outline
+ALGORITHMS = ('interval', 'cover')
 
-    INPUT_ROOT = os.path.join('data', 'site_wkt/')
-    OUTPUT_ROOT = os.path.join('data', 'sensor_wkt/')
-    site = Parameter()  # luigi parameter for site name
-    sensor_stype = Parameter()  # luigi parameter for sensor type
-    sensor_rng = IntParameter()  # luigi parameter for sensor range
-    sensor_fov = IntParameter()  # luigi parameter for sensor fov
 
-    def requires(self):
-        return []
+def __getattr__(name):
+    # the luigi tasks used to be defined here, they are imported from luigi_tasks on first use
+    if name in ('PlaceSensorTask', 'PlaceSiteTask'):
+        from final_project.tasks import luigi_tasks
+        return getattr(luigi_tasks, name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
-    def output(self):
-        # return the placement of sensors in Well Known Text (wkt) format
-        return LocalTarget(os.path.join(self.OUTPUT_ROOT, "{}_{}".format(self.site, self.sensor_stype)))
 
-    def run(self):
-        site_file = os.path.join(self.INPUT_ROOT, self.site)
-        with open(site_file, 'r') as f:
-            poly_wkt = f.read()
+def project_site(poly, projection='utm'):
+    """
+    convert a site outline from lat-long to the local projection of the site
 
-        poly = GEOSGeometry(poly_wkt)
-        # convert from lat-long to utm (xy)
-        wgsProj = SpatialReference('+proj=longlat +datum=WGS84')
-        utmProj = SpatialReference('+proj=utm +zone=18 +ellps=WGS84')
+    Args:
+    poly: site outline in lat-long. It is not modified.
+    projection: 'utm' or 'aeqd', see projection.local_projection. Default 'utm'.
 
-        ct = CoordTransform(wgsProj, utmProj)
-        poly.transform(ct)
-        # pass the polygon in form of lines in a numpy array
-        xy = np.asarray(poly.tuple[0])
+    Returns:
+    (poly, to_wgs): the projected outline and the CoordTransform back to lat-long.
 
-        sps = placeSensor(xy, rng=self.sensor_rng, fov=self.sensor_fov, skip_small=True)
+    """
+    to_local, to_wgs = transform_pair(local_projection(poly, projection))
+    return poly.transform(to_local, clone=True), to_wgs
+
+
+def load_site(site_file, projection='utm', fmt='wkt'):
+    """
+    read a site outline & convert it from lat-long to the local projection of the site
+
+    Args:
+    site_file: path of the file with the site outline.
+    projection: 'utm' or 'aeqd', see projection.local_projection. Default 'utm'.
+    fmt: format of the file, 'wkt' or 'wkb'. Default 'wkt'.
+
+    Returns:
+    (poly, to_wgs): the projected outline and the CoordTransform back to lat-long.
+
+    """
+    return project_site(read_geometry(site_file, fmt), projection)
+
+
+def outline_rings(poly):
+    """
+    the rings of a site outline as numpy arrays
+
+    Args:
+    poly: Polygon or MultiPolygon site outline.
+
+    Returns:
+    rings: list with an (n, 2) numpy array per ring, the exterior ring then the holes of each part.
+
+    """
+    polygons = poly if poly.geom_type == 'MultiPolygon' else [poly]
+    return [np.asarray(ring.tuple) for p in polygons for ring in p]
+
+
+def place_site(poly, sensors, projection='utm', vectorized=False, cache=None, rings=None, algorithm='interval',
+               poses=False, simplify=False):
+    """
+    place several sensors along a site outline, in memory
+
+    The outline is projected once and shared by all the sensors. Sensors are placed along
+    every ring of the outline, holes & all the parts of a MultiPolygon included.
+
+    Args:
+    poly: site outline in lat-long, Polygon or MultiPolygon.
+    sensors: list of (stype, name, rng, fov) sensor specs.
+    projection: 'utm' or 'aeqd', see projection.local_projection. Default 'utm'.
+    vectorized: use the array based placement. Default False.
+    cache: placement cache (see placement_cache) to look the placements up in & add them to,
+        keyed by the projected outline & the sensor spec. Default None, no cache.
+    rings: indices, in outline_rings order, of the only rings to place. Default None, all of them.
+    algorithm: placement engine, 'interval' or 'cover', see placeSensor. Default 'interval'.
+    poses: return the sensor poses rather than the wedges, which are then never built. Default False.
+    simplify: place the sensors along the outline simplified to a tolerance derived from their range,
+        see simplify.simplify_rings. Sensors with the same tolerance (see simplify.tolerance_for)
+        share the simplified outline, which is also cached. Default False.
+
+    Returns:
+    placements: list with the MultiPolygon placement, in lat-long, of each sensor. With poses, a
+        (data, srs) pair per sensor instead: the packed poses (see poses.pack_poses) in the local
+        projection & the proj4 string of that projection.
+
+    """
+    with metrics.timer('place.project'):
+        srs = local_projection(poly, projection)
+        to_local, to_wgs = transform_pair(srs)
+        local = poly.transform(to_local, clone=True)
+        # pass the polygon in form of lines in a numpy array per ring
+        xy = outline_rings(local)
+        if rings is not None:
+            xy = [xy[i] for i in rings]
+
+    placements = []
+    simplified = {}  # tolerance: simplified rings, shared by the sensors at the site
+    for stype, name, rng, fov in sensors:
+        variant = ('poses',) if poses else ()
+        if simplify:
+            tolerance = tolerance_for(rng)
+            variant += ('simplify', tolerance, SIMPLIFY_VERSION)
+
+        key = None
+        if cache is not None:
+            # the placement only depends on the projected outline, the projection it goes back
+            # through and the spec, not on the site or sensor names
+            key = content_key(xy, srs, rng, fov, False, True, vectorized, algorithm, ALGORITHM_VERSION, *variant)
+            with metrics.timer('place.cache_get') as counts:
+                data = cache.get(key)
+                counts['hits' if data is not None else 'misses'] = 1
+                if data is not None:
+                    placements.append((data, srs) if poses else load_geometry(data, 'wkb'))
+            if data is not None:
+                continue
+
+        placed = xy
+        if simplify:
+            if tolerance not in simplified:
+                simplified[tolerance] = simplify_rings(xy, tolerance, cache)
+            placed = simplified[tolerance]
+
+        if poses:
+            origins, headings = sensorPoses(placed, rng=rng, fov=fov, skip_small=True, vectorized=vectorized,
+                                            algorithm=algorithm)
+            if simplify:
+                record_coverage_difference(xy, placed, wedge_rings(origins, headings, rng, fov))
+            data = pack_poses(origins, headings)
+            if key is not None:
+                with metrics.timer('place.cache_set'):
+                    cache.set(key, data)
+            placements.append((data, srs))
+            continue
+
+        sps = placeSensor(placed, rng=rng, fov=fov, skip_small=True, vectorized=vectorized, algorithm=algorithm)
+        if simplify:
+            record_coverage_difference(xy, placed, placement_wedges(sps))
+        with metrics.timer('place.transform'):
+            sps.transform(to_wgs)
+        if key is not None:
+            with metrics.timer('place.cache_set'):
+                cache.set(key, dump_geometry(sps, 'wkb'))
+        placements.append(sps)
+    return placements
+
+
+def _place_rings(poly, rings, **kwargs):
+    # the worker's stage counts go back with the placements
+    return place_site(poly, rings=rings, **kwargs), metrics.collect()
+
+
+def _merge_placements(mpolys):
+    """a single MultiPolygon with the polygons of several placements, or a single (data, srs) of several poses"""
+    if isinstance(mpolys[0], tuple):
+        return merge_poses(data for data, srs in mpolys), mpolys[0][1]
+
+    from django.contrib.gis.geos import MultiPolygon
+
+    return MultiPolygon([p for mpoly in mpolys for p in mpoly], srid=mpolys[0].srid)
 
-        ct = CoordTransform(utmProj, wgsProj)
-        sps.transform(ct)
-        with self.output().open('w') as f:
-            f.write(sps.wkt)
-        
 
-def placeSensor(xy, rng=20, fov=10, split_on_turns=False, skip_small=False):
+def place_sites(outlines, sensors, projection='utm', vectorized=False, workers=None, cache=None,
+                algorithm='interval', poses=False, simplify=False):
+    """
+    place several sensors along many site outlines in a process pool, in memory
+
+    Outlines go to the workers and placements come back pickled, which GEOS does as wkb,
+    so nothing is formatted to or parsed from text on the way. The rings of a site with
+    holes or several parts are placed in parallel, one job per ring, and merged afterwards.
+
+    Args:
+    outlines: list of site outlines in lat-long.
+    sensors: list of (stype, name, rng, fov) sensor specs.
+    projection: 'utm' or 'aeqd', see projection.local_projection. Default 'utm'.
+    vectorized: use the array based placement. Default False.
+    workers: number of worker processes. Default is the cpu count.
+    cache: placement cache shared by the workers, see place_site. Default None.
+    algorithm: placement engine, 'interval' or 'cover', see placeSensor. Default 'interval'.
+    poses: return packed poses rather than wedges, see place_site. Default False.
+    simplify: simplify the outlines before the placement, see place_site. Default False.
+
+    Returns:
+    placements: for each outline, the list of placements from place_site.
+
+    """
+    kwargs = dict(sensors=sensors, projection=projection, vectorized=vectorized, cache=cache, algorithm=algorithm,
+                  poses=poses, simplify=simplify)
+    workers = workers or os.cpu_count()
+    if workers == 1 or len(outlines) == 0:
+        return [place_site(poly, **kwargs) for poly in outlines]
+
+    # one job per site, or per ring for the sites with several rings
+    jobs = []
+    for i, poly in enumerate(outlines):
+        polygons = poly if poly.geom_type == 'MultiPolygon' else [poly]
+        n = sum(len(p) for p in polygons)
+        jobs.extend([(i, None)] if n <= 1 else [(i, [k]) for k in range(n)])
+    if len(jobs) == 1:
+        return [place_site(outlines[0], **kwargs)]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    parts = [[] for _ in outlines]
+    chunksize = max(1, len(jobs) // (workers * 4))
+    # the workers start with no stage counts, not a copy of the parent's
+    with ProcessPoolExecutor(max_workers=workers, initializer=metrics.reset) as pool:
+        results = pool.map(partial(_place_rings, **kwargs), [outlines[i] for i, rings in jobs],
+                           [rings for i, rings in jobs], chunksize=chunksize)
+        for (i, rings), (placements, stages) in zip(jobs, results):
+            parts[i].append(placements)
+            metrics.merge(stages)
+
+    return [site_parts[0] if len(site_parts) == 1 else [_merge_placements(mpolys) for mpolys in zip(*site_parts)]
+            for site_parts in parts]
+
+
+def _run_task(task):
+    task.run()
+    # the worker's stage counts go back to the parent
+    return metrics.collect()
+
+
+def run_tasks(tasks, workers=None):
+    """
+    run a batch of independent tasks in a process pool, without the luigi scheduler
+
+    Each task runs its own run() in a worker process, so it writes exactly the output the
+    luigi scheduler would have produced. Tasks whose output already exists are skipped.
+
+    Args:
+    tasks: list of luigi tasks without dependencies, e.g. PlaceSensorTask's.
+    workers: number of worker processes. Default is the cpu count.
+
+    Returns:
+    n: number of tasks that were run.
+
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    pending = [t for t in tasks if not t.complete()]
+    if not pending:
+        return 0
+
+    workers = workers or os.cpu_count()
+    # hand the tasks out in chunks to cut the pickling round trips on large batches
+    chunksize = max(1, len(pending) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=metrics.reset) as pool:
+        for stages in pool.map(_run_task, pending, chunksize=chunksize):
+            metrics.merge(stages)
+    return len(pending)
+
+
+def placeSensor(xy, rng=20, fov=10, split_on_turns=False, skip_small=False, vectorized=False, algorithm='interval'):
     """
     algorithm to place sensors optimally
 
     Args:
-    xy: numpy array containing the line segments for the outline.
+    xy: numpy array containing the line segments for the outline, or a list of them for
+        an outline with several rings (holes, several parts). Each ring is placed independently.
     rng:integer giving range of sensor. Default 20.
     fov: integer giving fov of sensor. Default 10.
     split_on_turns: allow segments to split on turns. Default False.
     skip_small: skip small remaining segment parts in each line segments.
+    vectorized: use the array based placement (see placeSensorPoses) instead of
+        walking the segments one by one. Default False.
+    algorithm: 'interval' to place the sensors every rng along the outline, or 'cover' for the
+        fewest sensors that cover the whole outline (see set_cover.placeSensorCover, which
+        ignores split_on_turns, skip_small & vectorized). Default 'interval'.
 
     Returns:
     sps: MultiPolygon datatype containing the sensor placement polygons.
 
     """
+    rings = placeSensorRings(xy, rng=rng, fov=fov, split_on_turns=split_on_turns, skip_small=skip_small,
+                             vectorized=vectorized, algorithm=algorithm)
+
+    # convert the rings into a MultiPolygon, once all the sensors are placed
+    with metrics.timer('placeSensor.multipolygon'):
+        if not len(rings):
+            from django.contrib.gis.geos import MultiPolygon
+            return MultiPolygon([])
+        return wedge_multipolygon(rings)
+
+
+def placeSensorRings(xy, rng=20, fov=10, split_on_turns=False, skip_small=False, vectorized=False,
+                     algorithm='interval'):
+    """
+    placeSensor, with the placement as numpy vertex rings rather than a MultiPolygon
+
+    Only the interval algorithm without vectorized needs GEOS, to check which segments the
+    sensors already placed cover. The others run on numpy alone.
+
+    Args:
+    see placeSensor.
+
+    Returns:
+    rings: (n, k, 2) numpy array with the closed vertex ring of each sensor placement polygon.
+
+    """
+    origins, headings = sensorPoses(xy, rng=rng, fov=fov, split_on_turns=split_on_turns, skip_small=skip_small,
+                                    vectorized=vectorized, algorithm=algorithm)
+    if not len(origins):
+        return np.empty((0, 0, 2))
+    return wedge_rings(origins, headings, rng, fov)
+
+
+def sensorPoses(xy, rng=20, fov=10, split_on_turns=False, skip_small=False, vectorized=False,
+                algorithm='interval'):
+    """
+    placeSensor, with the placement as the sensor poses, before any wedge is built
+
+    Args:
+    see placeSensor.
+
+    Returns:
+    (origins, headings): (n, 2) numpy arrays with the position & the unit heading vector of each
+        sensor, see poses.pack_poses to store them.
+
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError("unknown algorithm {!r}, expected one of {}".format(algorithm, ALGORITHMS))
+    xy = xy if isinstance(xy, (list, tuple)) else [xy]
+    with metrics.timer('placeSensor') as counts:
+        poses = [_placeRingPoses(ring, rng=rng, fov=fov, split_on_turns=split_on_turns, skip_small=skip_small,
+                                 vectorized=vectorized, algorithm=algorithm)
+                 for ring in xy]
+        poses = [p for p in poses if p is not None and len(p[0])]
+        if poses:
+            origins = np.concatenate([origins for origins, headings in poses])
+            headings = np.concatenate([headings for origins, headings in poses])
+        else:
+            origins, headings = np.empty((0, 2)), np.empty((0, 2))
+        counts.update(rings=len(xy), vertices=sum(len(ring) for ring in xy), sensors=len(origins))
+    return origins, headings
+
+
+def _placeRingPoses(xy, rng=20, fov=10, split_on_turns=False, skip_small=False, vectorized=False,
+                    algorithm='interval'):
+    """
+    place sensors along one ring of the outline, see placeSensor
+
+    Returns:
+    (origins, headings): (n, 2) numpy arrays with the sensor positions & unit heading vectors,
+        or None if no sensor was placed.
+
+    """
+    if algorithm == 'cover':
+        return placeSensorCover(xy, rng=rng, fov=fov)
+    if vectorized:
+        return placeSensorPoses(xy, rng=rng, split_on_turns=split_on_turns, skip_small=skip_small)
+
+    from django.contrib.gis.geos import LineString
 
     # no of points
     n = xy.shape[0]
@@ -81,6 +398,12 @@ def placeSensor(xy, rng=20, fov=10, split_on_turns=False, skip_small=False):
     dfy = [] # list of sensor y coordinates
     sl_total = 0
     lp = []  # list of polygons
+    pp = []  # prepared geometries of the polygons in lp, for the cheap intersects tests
+    # time & calls of the GEOS coverage checks, recorded once at the end
+    check_seconds = 0.0
+    n_tests = n_intersections = 0
+    hdg = []  # list of sensor headings, as unit vectors
+    index = GridIndex(rng)  # grid index over the bounding boxes of the polygons in lp
   
     residual_seg_length = 0
     # named tuple for the line segment
@@ -107,16 +430,26 @@ def placeSensor(xy, rng=20, fov=10, split_on_turns=False, skip_small=False):
         #     continue
 
         # check if the current line segment is being monitor by a previously placed sensor
+        # only the polygons whose bounding box overlaps the segment can intersect it
         if i > 0:
-            for p in sps:
-                igeom = p.intersection(line_seg)
-                if igeom.geom_type == OGRGeomType('Point'):
+            start = time.perf_counter()
+            for k in index.query(line_seg.extent):
+                # reject the polygons missing the segment before computing any intersection
+                n_tests += 1
+                if not pp[k].intersects(line_seg):
+                    continue
+                n_intersections += 1
+                igeom = lp[k].intersection(line_seg)
+                # newer GEOS returns an empty LineString rather than an empty collection
+                if igeom.empty:
+                    continue
+                if igeom.geom_type == 'Point':
                     x = igeom.tuple[0]
                     y = igeom.tuple[1]
                     residual_seg_length = sqrt((v_seg.x1 - x)**2 + (v_seg.y1 - y)**2)
                     # print("point intersection!")        
                     continue
-                elif igeom.geom_type == OGRGeomType('LineString'):
+                elif igeom.geom_type == 'LineString':
                     x = igeom.tuple[1][0]
                     y = igeom.tuple[1][1]
                     residual_seg_length = sqrt((v_seg.x1 - x)**2 + (v_seg.y1 - y)**2)
@@ -125,6 +458,7 @@ def placeSensor(xy, rng=20, fov=10, split_on_turns=False, skip_small=False):
                 else:
                     x = 0
                     y = 0
+            check_seconds += time.perf_counter() - start
 
         # u is vector along the segment & ux,uy are length of unit vectors along x & y
         u = sqrt((v_seg.x2 - v_seg.x1)**2 + (v_seg.y2 - v_seg.y1)**2)
@@ -138,6 +472,7 @@ def placeSensor(xy, rng=20, fov=10, split_on_turns=False, skip_small=False):
         if num_seg >= 0:      
       
             # add interpolated segments
+            placed = len(dfx)
             for j in range(num_seg):
                 slx = v_seg.x1 + ux * residual_seg_length + ux * rng * j - v_seg.x2
                 sly = v_seg.y1 + uy * residual_seg_length + uy * rng * j - v_seg.y2
@@ -149,35 +484,23 @@ def placeSensor(xy, rng=20, fov=10, split_on_turns=False, skip_small=False):
                 
                 dfx.append(v_seg.x1 + ux * residual_seg_length + ux * rng * j)
                 dfy.append(v_seg.y1 + uy * residual_seg_length + uy * rng * j)
-                
                 sl_total = 0
-                t = (fov / 180.0) * pi
-                x0 = dfx[-1]
-                x = ux * rng
-                y0 = dfy[-1]
-                y = uy * rng
-
-                coords = []
-
-                coords.append((x0,y0))
-                # create an arc with line segments
-                numSegs = ceil(fov/4)
-                for s in range(1,numSegs+1, 1):
-                    coords.append((x*cos(t/s) - y*sin(t/s) + x0, y*cos(t/s) + x*sin(t/s) + y0))
-                for s in range(-numSegs,0, 1):
-                    coords.append((x*cos(t/s) - y*sin(t/s) + x0, y*cos(t/s) + x*sin(t/s) + y0))
-                # close the Polygon
-                coords.append((x0, y0))
-                p = Polygon(LinearRing(coords))
 
-                # list of Polygon's
-                lp.append(p)
+            # create the wedges for all the sensors on this segment in one go
+            if len(dfx) > placed:
+                origins = np.column_stack((dfx[placed:], dfy[placed:]))
+                rings = wedge_rings(origins, ((ux, uy),), rng, fov)
 
-                xl = x0
-                yl = y0
+                # list of Polygon's
+                hdg.extend([(ux, uy)] * len(origins))
+                polygons = wedge_polygons(rings)
+                lp.extend(polygons)
+                pp.extend(p.prepared for p in polygons)
+                for bbox in wedge_bounds(rings).tolist():
+                    index.insert(bbox)
 
-            # convert list into MultiPolygon
-            sps = MultiPolygon(lp)
+                xl = dfx[-1]
+                yl = dfy[-1]
 
         else:
             if split_on_turns:
@@ -192,4 +515,77 @@ def placeSensor(xy, rng=20, fov=10, split_on_turns=False, skip_small=False):
         else:
             residual_seg_length = 0
 
-    return sps
+    metrics.add('placeSensor.check', check_seconds, tests=n_tests, intersections=n_intersections)
+    if not dfx:
+        return None
+    return np.column_stack((dfx, dfy)), np.array(hdg)
+
+
+def placeSensorPoses(xy, rng=20, split_on_turns=False, skip_small=False):
+    """
+    array based placement of sensors along the outline
+
+    The outline is cut into runs, sensors are spaced rng apart from the start of each
+    run, and every position & heading is interpolated in one pass over the cumulative
+    arc length with numpy. Instead of intersecting each segment with the wedges placed so
+    far, a sensor is assumed to cover the rng of outline ahead of it.
+
+    split_on_turns & skip_small keep their meaning from placeSensor:
+    - without split_on_turns every segment starts a new run, so the spacing restarts at
+      each vertex. With it the whole outline is one run and the spacing carries over turns.
+    - with skip_small, segments shorter than rng/2 do not start a new run (the previous
+      sensor is assumed to handle them), and sensors within rng/4 of the end of their run
+      are dropped, as that part is left to manual adjustments.
+
+    Args:
+    xy: numpy array containing the line segments for the outline.
+    rng: integer giving range of sensor. Default 20.
+    split_on_turns: allow segments to split on turns. Default False.
+    skip_small: skip small remaining segment parts in each line segments.
+
+    Returns:
+    (origins, headings): (n, 2) numpy arrays with the sensor positions and the unit
+        vectors along the outline the sensors point to.
+
+    """
+    xy = np.asarray(xy, dtype=float)
+    d = np.diff(xy, axis=0)
+    seg_length = np.hypot(d[:, 0], d[:, 1])
+
+    # repeated vertices have no direction to point a sensor along
+    keep = seg_length > 0
+    start = xy[:-1][keep]
+    d = d[keep]
+    seg_length = seg_length[keep]
+    if not seg_length.size:
+        return np.empty((0, 2)), np.empty((0, 2))
+    unit = d / seg_length[:, None]
+    cum = np.concatenate(([0.0], np.cumsum(seg_length)))
+
+    # segments starting a new run of sensors
+    if split_on_turns:
+        restart = np.zeros(1, dtype=int)
+    elif skip_small:
+        restart = np.union1d([0], np.flatnonzero(seg_length >= rng * 0.5))
+    else:
+        restart = np.arange(seg_length.size)
+    run_start = cum[restart]
+    run_length = np.append(run_start[1:], cum[-1]) - run_start
+
+    # ceil(length / rng) stations per run, rng apart from the start of the run
+    counts = np.ceil(run_length / rng).astype(int)
+    first = np.cumsum(counts) - counts
+    run = np.repeat(np.arange(counts.size), counts)
+    offset = (np.arange(run.size) - first[run]) * float(rng)
+
+    if skip_small:
+        keep = (offset == 0) | (run_length[run] - offset >= rng * 0.25)
+        run = run[keep]
+        offset = offset[keep]
+
+    # find the segment under each station & interpolate along it
+    stations = run_start[run] + offset
+    # a station rounding onto the end of the outline belongs to the last segment
+    seg = np.clip(np.searchsorted(cum, stations, side='right') - 1, 0, len(cum) - 2)
+    origins = start[seg] + unit[seg] * (stations - cum[seg])[:, None]
+    return origins, unit[seg]
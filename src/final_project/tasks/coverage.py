@@ -0,0 +1,238 @@
+"""
+coverage metrics of a sensor placement
+
+How well a placement covers its site outline: the covered length & percentage of the outline,
+the gaps left uncovered, the mean number of sensors covering each covered point of the outline
+(overlap) and the number of sensors.
+
+Two methods are available:
+- 'exact' intersects the outline with the wedges in GEOS. Wedges that miss the outline are
+  rejected with a prepared geometry test before anything is intersected.
+- 'sample' cuts the outline into pieces spacing long and counts the wedges around the mid point
+  of each piece with a numpy point in polygon test. It is much faster on large sites, and
+  exact to within spacing.
+"""
+from collections import namedtuple
+
+import numpy as np
+from django.contrib.gis.geos import LineString, MultiLineString
+
+from final_project.tasks.footprints import polygon_rings
+from final_project.tasks.projection import local_projection, transform_pair
+from final_project.tasks.set_cover import coverage_targets
+
+METHODS = ('exact', 'sample')
+
+# sample & wedge pairs are tested in chunks of this many, to bound the memory used
+CHUNK = 65536
+
+# length: length of the site outline, every ring included.
+# covered_length: length of the outline inside at least one wedge, coverage: as a percentage of length.
+# gaps: MultiLineString with the uncovered parts of the outline.
+# overlap: mean number of wedges covering the covered outline. sensors: number of wedges in the placement.
+CoverageMetrics = namedtuple('CoverageMetrics', ['length', 'covered_length', 'coverage', 'gaps', 'overlap',
+                                                 'sensors'])
+
+
+def _lines(geom):
+    """the LineStrings in a linear geometry, as a list"""
+    if geom.empty:
+        return []
+    if geom.geom_type == 'LineString':
+        return [geom]
+    return [g for g in geom if g.geom_type == 'LineString']
+
+
+def coverage_exact(outline, placement):
+    """
+    coverage metrics from the GEOS intersection of the outline with the wedges
+
+    Args:
+    outline: site outline, Polygon or MultiPolygon, in a projected (metre) coordinate system.
+    placement: MultiPolygon of sensor wedges, in the same coordinate system.
+
+    Returns:
+    metrics: CoverageMetrics.
+
+    """
+    boundary = outline.boundary
+    length = boundary.length
+    prepared = boundary.prepared
+    # the full intersections are only computed for the wedges that touch the outline
+    wedges = [p for p in placement if prepared.intersects(p)]
+
+    if wedges:
+        union = placement.unary_union
+        covered_length = boundary.intersection(union).length
+        gaps = _lines(boundary.difference(union))
+        overlap = sum(boundary.intersection(p).length for p in wedges) / covered_length if covered_length else 0.0
+    else:
+        covered_length = 0.0
+        gaps = _lines(boundary)
+        overlap = 0.0
+
+    return CoverageMetrics(length, covered_length, 100.0 * covered_length / length if length else 0.0,
+                           MultiLineString(gaps, srid=outline.srid), overlap, len(placement))
+
+
+def _inside(points, chains):
+    """crossing number point in polygon test of (n, 2) points, each against its own (n, k, 2) vertex chain"""
+    x = points[:, 0:1]
+    y = points[:, 1:2]
+    xi, yi = chains[:, :-1, 0], chains[:, :-1, 1]
+    xj, yj = chains[:, 1:, 0], chains[:, 1:, 1]
+    crosses = (yi > y) != (yj > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        xs = (xj - xi) * (y - yi) / (yj - yi) + xi
+    return np.count_nonzero(crosses & (x < xs), axis=1) % 2 == 1
+
+
+def _chains(placement):
+    """
+    one vertex chain per polygon of the placement, padded to a common length
+
+    The holes are appended to the exterior ring, each followed by a step back to the first
+    vertex: the two connecting edges cancel out in the crossing count. The padding repeats
+    the last vertex, which adds no edges.
+    """
+    chains = []
+    for rings in polygon_rings(placement):
+        first = rings[0][:1]
+        chains.append(np.concatenate([rings[0]] + [part for hole in rings[1:] for part in (hole, first)]))
+    k = max(len(c) for c in chains)
+    padded = np.empty((len(chains), k, 2))
+    for i, c in enumerate(chains):
+        padded[i, :len(c)] = c
+        padded[i, len(c):] = c[-1]
+    return padded
+
+
+def _wedge_counts(points, chains):
+    """number of the (n, k, 2) vertex chains around each of the (m, 2) points"""
+    # testing only the points inside the box of each chain
+    counts = np.zeros(len(points), dtype=np.int64)
+    if not len(chains) or not len(points):
+        return counts
+    lo = chains.min(axis=1)
+    hi = chains.max(axis=1)
+    by_x = np.argsort(points[:, 0], kind='stable')
+    xs = points[by_x, 0]
+    first = np.searchsorted(xs, lo[:, 0], 'left')
+    count = np.searchsorted(xs, hi[:, 0], 'right') - first
+    w = np.repeat(np.arange(len(chains)), count)
+    # first + 0..count-1 for every chain, without a python loop
+    j = by_x[np.repeat(first, count) + np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)]
+    keep = (points[j, 1] >= lo[w, 1]) & (points[j, 1] <= hi[w, 1])
+    w, j = w[keep], j[keep]
+    for c0 in range(0, len(j), CHUNK):
+        wc, jc = w[c0:c0 + CHUNK], j[c0:c0 + CHUNK]
+        counts += np.bincount(jc[_inside(points[jc], chains[wc])], minlength=len(points))
+    return counts
+
+
+def _substring(xy, cum, a, b):
+    """the part of a ring between the arc lengths a & b, as a list of vertices"""
+    d = np.diff(xy, axis=0)
+    i, j = np.searchsorted(cum, (a, b), 'right') - 1
+    i = min(i, len(d) - 1)
+    j = min(j, len(d) - 1)
+    ua = (a - cum[i]) / (cum[i + 1] - cum[i]) if cum[i + 1] > cum[i] else 0.0
+    ub = (b - cum[j]) / (cum[j + 1] - cum[j]) if cum[j + 1] > cum[j] else 0.0
+    return [tuple(xy[i] + d[i] * ua)] + [tuple(p) for p in xy[i + 1:j + 1]] + [tuple(xy[j] + d[j] * ub)]
+
+
+def coverage_sampled(outline, placement, spacing=1.0):
+    """
+    coverage metrics from the wedges around sample points spacing apart along the outline
+
+    Args:
+    outline: site outline, Polygon or MultiPolygon, in a projected (metre) coordinate system.
+    placement: MultiPolygon of sensor wedges, in the same coordinate system.
+    spacing: length of the outline pieces each sample point stands for. Default 1.0.
+
+    Returns:
+    metrics: CoverageMetrics.
+
+    """
+    rings = [ring for rings in polygon_rings(outline) for ring in rings]
+    samples = [coverage_targets(xy, spacing) for xy in rings]
+    points = np.concatenate([s[0] for s in samples]) if samples else np.empty((0, 2))
+    weights = np.concatenate([s[1] for s in samples]) if samples else np.empty(0)
+
+    counts = _wedge_counts(points, _chains(placement)) if len(placement) else np.zeros(len(points), dtype=np.int64)
+
+    length = weights.sum()
+    covered = counts > 0
+    covered_length = weights[covered].sum()
+    overlap = (counts * weights)[covered].sum() / covered_length if covered_length else 0.0
+
+    # runs of uncovered pieces along each ring make the gaps
+    gaps = []
+    start = 0
+    for xy, (pts, w) in zip(rings, samples):
+        cum = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(xy, axis=0).T))))
+        ends = np.cumsum(w)
+        free = np.concatenate(([False], ~covered[start:start + len(w)], [False]))
+        edges = np.flatnonzero(free[1:] != free[:-1])
+        for a, b in zip(edges[0::2], edges[1::2]):
+            gaps.append(LineString(_substring(xy, cum, ends[a] - w[a], ends[b - 1])))
+        start += len(w)
+
+    return CoverageMetrics(float(length), float(covered_length),
+                           100.0 * covered_length / length if length else 0.0,
+                           MultiLineString(gaps, srid=outline.srid), float(overlap), len(placement))
+
+
+def sampled_coverage(rings, wedges, spacing=1.0):
+    """
+    length & covered length of vertex rings, sampled as coverage_sampled does
+
+    Args:
+    rings: list of (n, 2) numpy arrays with the rings, in a projected (metre) coordinate system.
+    wedges: (n, k, 2) numpy array with the vertex rings of the wedges, see footprints.wedge_rings.
+    spacing: length of the ring pieces each sample point stands for. Default 1.0.
+
+    Returns:
+    (length, covered_length): in metres.
+
+    """
+    samples = [coverage_targets(np.asarray(xy)[:, :2], spacing) for xy in rings]
+    points = np.concatenate([s[0] for s in samples]) if samples else np.empty((0, 2))
+    weights = np.concatenate([s[1] for s in samples]) if samples else np.empty(0)
+    counts = _wedge_counts(points, wedges)
+    return float(weights.sum()), float(weights[counts > 0].sum())
+
+
+def evaluate_coverage(outline, placement, projection='utm', method='exact', spacing=1.0):
+    """
+    coverage metrics of a placement in lat-long
+
+    Both geometries are projected to the local projection of the site, so lengths are in metres.
+
+    Args:
+    outline: site outline in lat-long, Polygon or MultiPolygon.
+    placement: MultiPolygon placement in lat-long.
+    projection: 'utm' or 'aeqd', see projection.local_projection. Default 'utm'.
+    method: 'exact' or 'sample', see coverage_exact & coverage_sampled. Default 'exact'.
+    spacing: sample spacing in metres for the 'sample' method. Default 1.0.
+
+    Returns:
+    metrics: CoverageMetrics, with the gaps in lat-long.
+
+    """
+    if method not in METHODS:
+        raise ValueError("unknown method {!r}, expected one of {}".format(method, METHODS))
+    to_local, to_wgs = transform_pair(local_projection(outline, projection))
+    local_outline = outline.transform(to_local, clone=True)
+    local_placement = placement.transform(to_local, clone=True)
+
+    if method == 'exact':
+        metrics = coverage_exact(local_outline, local_placement)
+    else:
+        metrics = coverage_sampled(local_outline, local_placement, spacing)
+
+    gaps = metrics.gaps
+    if not gaps.empty:
+        gaps.transform(to_wgs)
+    gaps.srid = 4326
+    return metrics._replace(gaps=gaps)
@@ -0,0 +1,200 @@
+"""
+vectorized sensor footprints
+
+A sensor footprint is a wedge: a closed ring that starts at the sensor, runs along an arc
+at the sensor range and comes back to the sensor. The rings for any number of sensors are
+built as one numpy array; GEOS objects are only created by wedge_polygons/wedge_multipolygon,
+straight from packed WKB.
+"""
+import struct
+from functools import lru_cache
+from math import ceil, cos, pi, sin
+
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def arc_template(fov):
+    """
+    cos & sin of the arc vertex angles of a wedge
+
+    The arc is laid out the way placeSensor has always drawn it: at angles t/s for
+    s = 1..n followed by s = -n..-1, where t is the fov in radians and n = ceil(fov/4).
+    math.cos/sin are used so the values are bit for bit the ones the scalar code used.
+
+    Args:
+    fov: fov of the sensor in degrees.
+
+    Returns:
+    (c, s): read-only numpy arrays with the 2 * ceil(fov/4) cosines & sines.
+
+    """
+    t = (fov / 180.0) * pi
+    n = ceil(fov / 4)
+    steps = list(range(1, n + 1)) + list(range(-n, 0))
+    c = np.array([cos(t / s) for s in steps], dtype=float)
+    s = np.array([sin(t / s) for s in steps], dtype=float)
+    c.setflags(write=False)
+    s.setflags(write=False)
+    return c, s
+
+
+def wedge_rings(origins, headings, rng, fov, angles=False):
+    """
+    vertex rings of the wedges for a batch of sensors
+
+    The arc geometry for the fov is computed once (see arc_template) and rotated onto
+    every sensor heading, so no trig is evaluated per sensor.
+
+    Args:
+    origins: (n, 2) array of sensor positions.
+    headings: (n, 2) array of unit vectors the sensors point along, or a (1, 2) array or
+        single (ux, uy) vector to share one heading. With angles, (n,) array of heading angles
+        in radians counter clockwise from the x axis instead.
+    rng: range of the sensors, scalar or (n,) array.
+    fov: fov of the sensors in degrees, shared by the batch.
+    angles: headings are angles rather than unit vectors. Default False.
+
+    Returns:
+    rings: (n, 2 * ceil(fov/4) + 2, 2) array. Each ring starts and ends at the sensor origin.
+
+    """
+    origins = np.asarray(origins, dtype=float).reshape(-1, 2)
+    headings = np.asarray(headings, dtype=float)
+    if angles:
+        headings = np.column_stack((np.cos(headings.ravel()), np.sin(headings.ravel())))
+    elif headings.shape == (2,):
+        headings = headings.reshape(1, 2)
+    elif headings.ndim != 2 or headings.shape[1] != 2:
+        raise ValueError("headings: expected (n, 2) unit vectors, got shape {}, use angles=True for angles".format(
+            headings.shape))
+    rng = np.asarray(rng, dtype=float).reshape(-1, 1)
+
+    c, s = arc_template(fov)
+    x = headings[:, 0:1] * rng
+    y = headings[:, 1:2] * rng
+    x0 = origins[:, 0:1]
+    y0 = origins[:, 1:2]
+
+    rings = np.empty((origins.shape[0], c.size + 2, 2), dtype=float)
+    rings[:, 0, :] = origins
+    rings[:, 1:-1, 0] = x * c - y * s + x0
+    rings[:, 1:-1, 1] = y * c + x * s + y0
+    rings[:, -1, :] = origins
+    return rings
+
+
+def wedge_bounds(rings):
+    """(n, 4) array of (xmin, ymin, xmax, ymax) for the rings from wedge_rings"""
+    return np.concatenate((rings.min(axis=1), rings.max(axis=1)), axis=1)
+
+
+def _polygon_records(rings):
+    # one little endian WKB Polygon record per ring, packed back to back
+    n, k, _ = rings.shape
+    dtype = np.dtype([('byteorder', 'u1'), ('wkbtype', '<u4'), ('nrings', '<u4'),
+                      ('npoints', '<u4'), ('coords', '<f8', (k, 2))])
+    records = np.empty(n, dtype=dtype)
+    records['byteorder'] = 1
+    records['wkbtype'] = 3
+    records['nrings'] = 1
+    records['npoints'] = k
+    records['coords'] = rings
+    return records
+
+
+def wedge_polygons(rings, srid=None):
+    """
+    GEOS Polygons for the rings from wedge_rings
+
+    Args:
+    rings: (n, k, 2) array of closed rings.
+    srid: optional srid for the polygons.
+
+    Returns:
+    polygons: list of n Polygon objects.
+
+    """
+    from django.contrib.gis.geos import GEOSGeometry
+
+    records = _polygon_records(rings)
+    size = records.dtype.itemsize
+    buf = memoryview(records.tobytes())
+    return [GEOSGeometry(buf[i * size:(i + 1) * size], srid=srid) for i in range(len(records))]
+
+
+def wedge_multipolygon(rings, srid=None):
+    """
+    a single GEOS MultiPolygon for the rings from wedge_rings, parsed from one WKB buffer
+
+    Args:
+    rings: (n, k, 2) array of closed rings.
+    srid: optional srid for the MultiPolygon.
+
+    Returns:
+    mpoly: MultiPolygon with one Polygon per ring.
+
+    """
+    from django.contrib.gis.geos import GEOSGeometry
+
+    records = _polygon_records(rings)
+    header = struct.pack('<BII', 1, 6, len(records))
+    return GEOSGeometry(memoryview(header + records.tobytes()), srid=srid)
+
+
+def polygon_rings(geom, z=False):
+    """
+    vertex rings of a GEOS Polygon or MultiPolygon, read with numpy from its WKB
+
+    The inverse of wedge_multipolygon for any polygons, without going through GEOS one
+    coordinate at a time.
+
+    Args:
+    geom: Polygon or MultiPolygon.
+    z: keep the Z values of a 3D geometry, as a third column. Default False, Z values are dropped.
+
+    Returns:
+    polygons: one list per polygon with the (n, 2) (or (n, 3)) arrays of its rings, exterior ring first.
+
+    """
+    buf = bytes(geom.wkb)
+    offset = 0
+
+    def header():
+        nonlocal offset
+        order = '<' if buf[offset] == 1 else '>'
+        wkbtype, = struct.unpack_from(order + 'I', buf, offset + 1)
+        offset += 5
+        # ISO (1000s) & EWKB (high bit) flavours of 3D
+        dims = 3 if wkbtype & 0x80000000 or (wkbtype & 0xffff) // 1000 in (1, 3) else 2
+        return order, (wkbtype & 0xffff) % 1000, dims
+
+    def polygon(order, dims):
+        nonlocal offset
+        nrings, = struct.unpack_from(order + 'I', buf, offset)
+        offset += 4
+        rings = []
+        for _ in range(nrings):
+            npoints, = struct.unpack_from(order + 'I', buf, offset)
+            offset += 4
+            coords = np.frombuffer(buf, dtype=order + 'f8', count=npoints * dims, offset=offset)
+            rings.append(coords.reshape(npoints, dims) if z else coords.reshape(npoints, dims)[:, :2])
+            offset += 8 * npoints * dims
+        return rings
+
+    order, wkbtype, dims = header()
+    if wkbtype == 3:
+        return [polygon(order, dims)]
+    count, = struct.unpack_from(order + 'I', buf, offset)
+    offset += 4
+    polygons = []
+    for _ in range(count):
+        order, _, dims = header()
+        polygons.append(polygon(order, dims))
+    return polygons
+
+
+def placement_wedges(mpoly):
+    """(n, k, 2) array with the vertex rings of a MultiPolygon of wedges, the inverse of wedge_multipolygon"""
+    rings = [polygon[0] for polygon in polygon_rings(mpoly)] if len(mpoly) else []
+    return np.array(rings) if rings else np.empty((0, 0, 2))
@@ -0,0 +1,43 @@
+"""
+geometry checkpoint files
+
+Site outlines & placements are checkpointed between the pipeline stages either as Well
+Known Text (wkt, the original layout: no file suffix) or as Well Known Binary (wkb, with a
+.wkb suffix), which skips text formatting & parsing and keeps full float precision.
+"""
+import os
+
+FORMATS = ('wkt', 'wkb')
+SUFFIXES = {'wkt': '', 'wkb': '.wkb'}
+
+
+def geometry_path(root, name, fmt='wkt'):
+    """path of the checkpoint file for name under root, in format fmt"""
+    return os.path.join(root, name + SUFFIXES[fmt])
+
+
+def dump_geometry(geom, fmt='wkt'):
+    """serialize a GEOS geometry to str (wkt) or bytes (wkb)"""
+    if fmt == 'wkb':
+        return bytes(geom.wkb)
+    return geom.wkt
+
+
+def load_geometry(data, fmt='wkt'):
+    """parse a GEOS geometry from the str (wkt) or bytes (wkb) made by dump_geometry"""
+    from django.contrib.gis.geos import GEOSGeometry
+
+    if fmt == 'wkb':
+        return GEOSGeometry(memoryview(data))
+    return GEOSGeometry(data)
+
+
+def write_geometry(f, geom, fmt='wkt'):
+    """write a geometry to an open file, text mode for wkt and binary mode for wkb"""
+    f.write(dump_geometry(geom, fmt))
+
+
+def read_geometry(path, fmt='wkt'):
+    """read a geometry from a checkpoint file"""
+    with open(path, 'rb' if fmt == 'wkb' else 'r') as f:
+        return load_geometry(f.read(), fmt)
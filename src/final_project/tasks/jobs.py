@@ -0,0 +1,202 @@
+"""
+bounded job queue for on-demand placements
+
+Jobs run in a local process pool of at most `workers` processes, never in the thread that
+submits them. At most `max_pending` jobs wait or run at a time: past that, submit raises
+QueueFull so the caller can push back (HTTP 429) instead of queueing without bound. Jobs are
+keyed by a content hash of what they compute, so an identical submission gets the job already
+queued, or its result.
+
+Job records (status, timings & result) are also written to an optional store with the get/set
+interface of the placement caches, e.g. placement_cache.DjangoCache: with redis behind it,
+every process of the web server sees the jobs of the others. Only their finished results are
+reused though: a job pending in another process may have died with it, so it is queued again.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from final_project.tasks import metrics
+
+PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+
+
+class QueueFull(Exception):
+    """max_pending jobs are already waiting or running, try again later"""
+
+
+class QueueUnavailable(Exception):
+    """the worker pool cannot take jobs, e.g. it is shutting down"""
+
+
+def place_outline(wkb, sensor, projection='utm', vectorized=False, algorithm='interval'):
+    """
+    placement of one sensor along an outline, the job run by the placement API
+
+    Args:
+    wkb: site outline in lat-long, Polygon or MultiPolygon, as wkb bytes.
+    sensor: (stype, rng, fov) sensor spec.
+    projection, vectorized, algorithm: see cov_algo.place_site.
+
+    Returns:
+    feature: GeoJSON Feature dict of the placement, see outline_io.geojson_feature.
+
+    """
+    from final_project.tasks.cov_algo import place_site
+    from final_project.tasks.footprints import polygon_rings
+    from final_project.tasks.geoio import load_geometry
+    from final_project.tasks.outline_io import geojson_feature
+
+    stype, rng, fov = sensor
+    placement, = place_site(load_geometry(wkb, 'wkb'), [(stype, stype, rng, fov)], projection, vectorized,
+                            algorithm=algorithm)
+    return geojson_feature(None, polygon_rings(placement), sensor)
+
+
+class JobQueue(object):
+    """
+    jobs run in a bounded process pool, deduplicated by key
+
+    Args:
+    workers: number of worker processes. Default 2.
+    max_pending: jobs waiting or running at most, before submit raises QueueFull. Default 32.
+    keep: finished jobs kept in memory, the oldest are dropped first. Default 1000.
+    store: cache with get(key) & set(key, record) the job records are also written to. Default None.
+
+    """
+
+    PREFIX = 'job:'
+
+    def __init__(self, workers=2, max_pending=32, keep=1000, store=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.keep = keep
+        self.store = store
+        self._lock = threading.Lock()
+        self._pool = None
+        self._jobs = OrderedDict()  # key: (record, future, finished event), finished jobs last
+        self._pending = 0
+
+    def _executor(self):
+        if self._pool is None:
+            # the workers start with no stage counts, not a copy of the parent's
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=metrics.reset)
+        return self._pool
+
+    def _save(self, record):
+        if self.store is not None:
+            self.store.set(self.PREFIX + record['id'], dict(record))
+
+    def _record(self, key):
+        """copy of the record of a job, from memory or else the store, None if unknown"""
+        job = self._jobs.get(key)
+        if job is None:
+            return self.store.get(self.PREFIX + key) if self.store is not None else None
+        record, future, _ = job
+        record = dict(record)
+        if record['status'] == PENDING and future.running():
+            record['status'] = RUNNING
+        return record
+
+    def submit(self, key, fn, *args, **kwargs):
+        """
+        queue fn(*args, **kwargs) as the job key, unless a job with that key is already queued here,
+        or done here or in the store
+
+        Returns:
+        record: dict with the id, status, submitted & finished times, seconds, result & error of the job.
+
+        Raises:
+        QueueFull: max_pending jobs are waiting or running.
+        QueueUnavailable: the pool cannot take jobs.
+
+        """
+        with self._lock:
+            if key in self._jobs:
+                record = self._record(key)
+                # failed jobs are run again, e.g. after a worker was killed
+                if record['status'] != FAILED:
+                    return record
+            elif self.store is not None:
+                # the pending jobs of other processes are not tracked, only their results are reused
+                record = self.store.get(self.PREFIX + key)
+                if record is not None and record['status'] == DONE:
+                    return record
+            if self._pending >= self.max_pending:
+                raise QueueFull("{} jobs pending".format(self._pending))
+            try:
+                future = self._executor().submit(fn, *args, **kwargs)
+            except BrokenProcessPool:
+                # a worker died, the pool is replaced on the next submission
+                self._pool = None
+                raise QueueUnavailable("the worker pool is broken")
+            except RuntimeError as e:
+                raise QueueUnavailable(str(e))
+            record = {'id': key, 'status': PENDING, 'submitted': time.time(), 'finished': None, 'seconds': None,
+                      'result': None, 'error': None}
+            self._jobs[key] = (record, future, threading.Event())
+            self._jobs.move_to_end(key)
+            self._pending += 1
+            self._save(record)
+        future.add_done_callback(partial(self._done, key))
+        return self.get(key)
+
+    def _done(self, key, future):
+        with self._lock:
+            record, _, finished = self._jobs[key]
+            record['finished'] = time.time()
+            record['seconds'] = record['finished'] - record['submitted']
+            try:
+                record['result'] = future.result()
+                record['status'] = DONE
+            except BrokenProcessPool:
+                self._pool = None
+                record['status'] = FAILED
+                record['error'] = "the worker running the job died"
+            except Exception as e:
+                record['status'] = FAILED
+                record['error'] = "{}: {}".format(type(e).__name__, e)
+            self._pending -= 1
+            self._save(record)
+            metrics.add('jobs.' + record['status'], record['seconds'])
+            finished.set()
+
+            # drop the oldest finished jobs, they are still in the store
+            self._jobs.move_to_end(key)
+            n_finished = len(self._jobs) - self._pending
+            for k in list(self._jobs):
+                if n_finished <= self.keep:
+                    break
+                if self._jobs[k][0]['finished'] is not None:
+                    del self._jobs[k]
+                    n_finished -= 1
+
+    def get(self, key):
+        """the record of a job (see submit), None if unknown"""
+        with self._lock:
+            return self._record(key)
+
+    def wait(self, key, timeout):
+        """the record of a job once it finished, or after timeout seconds"""
+        with self._lock:
+            job = self._jobs.get(key)
+        if job is not None:
+            job[2].wait(timeout)
+            if job[0]['finished'] is not None:
+                # it may have been dropped from memory since
+                return dict(job[0])
+        return self.get(key)
+
+    def pending(self):
+        """number of jobs waiting or running"""
+        with self._lock:
+            return self._pending
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
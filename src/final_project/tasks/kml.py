@@ -0,0 +1,217 @@
+"""
+streaming KML / KMZ reader & writer
+
+Placemarks are parsed one at a time with an XML pull parser and dropped as soon as they are
+read, so the memory used stays flat whatever the size of the file. Coordinates are parsed
+with numpy into (n, 2) arrays of lon-lat, the altitude being cut off with a view of the
+parsed array rather than a copy.
+
+The writer goes the other way: the rings of the placement & outline are read from their WKB
+with numpy and formatted a placemark at a time into a buffered file, with the styles of the
+site.kml template, instead of rendering every wedge through GEOS & the template engine.
+"""
+import io
+import os
+import zipfile
+from contextlib import contextmanager
+from html import escape
+from xml.etree import ElementTree
+
+import numpy as np
+
+from final_project.tasks.footprints import polygon_rings
+
+# styles of the sensor wedges & of the site outline, as in place_sensors/templates/site.kml
+WEDGE_STYLE = ('<Style><LineStyle><color>FF000000</color></LineStyle><PolyStyle><color>7F6891aa</color>'
+               '<fill>1</fill><outline>1</outline></PolyStyle></Style>')
+OUTLINE_STYLE = ('<Style><LineStyle><color>FF000000</color></LineStyle><PolyStyle><color>7FAAAAAA</color>'
+                 '<fill>1</fill><outline>1</outline></PolyStyle></Style>')
+
+BUFFER_SIZE = 2 ** 20  # write buffer of the kml files, in bytes
+
+KML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n<kml xmlns="http://www.opengis.net/kml/2.2">\n<Document>\n'
+KML_FOOTER = '</Document>\n</kml>\n'
+
+
+def _local(tag):
+    """tag name without its namespace"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_coordinates(text):
+    """
+    parse the text of a KML coordinates element
+
+    Args:
+    text: whitespace separated lon,lat[,alt] tuples.
+
+    Returns:
+    xy: (n, 2) numpy array of lon-lat. A view, the altitudes are not copied out.
+
+    """
+    text = text.strip()
+    if not text:
+        return np.empty((0, 2))
+    # number of values per tuple, 2 or 3
+    dims = text.split(None, 1)[0].count(',') + 1
+    values = np.array(text.replace(',', ' ').split(), dtype=float)
+    return values.reshape(-1, dims)[:, :2]
+
+
+def _polygon_rings(polygon):
+    """coordinate arrays of the outer boundary then the inner boundaries of a KML Polygon"""
+    rings = []
+    for boundary in ('outerBoundaryIs', 'innerBoundaryIs'):
+        for b in polygon:
+            if _local(b.tag) != boundary:
+                continue
+            rings.extend(parse_coordinates(c.text or '') for c in b.iter() if _local(c.tag) == 'coordinates')
+    return rings
+
+
+@contextmanager
+def open_kml(path):
+    """open a KML file, or the main KML document of a KMZ archive, as a binary stream"""
+    if hasattr(path, 'read'):
+        # already open, e.g. stdin: read as plain kml
+        yield path
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            names = [n for n in zf.namelist() if n.lower().endswith('.kml')]
+            if not names:
+                raise ValueError("no kml document in {}".format(path))
+            # the main document is doc.kml by convention, else the first one in the archive
+            with zf.open('doc.kml' if 'doc.kml' in names else names[0]) as f:
+                yield f
+    else:
+        with open(path, 'rb') as f:
+            yield f
+
+
+def iter_placemarks(path):
+    """
+    stream the polygon placemarks of a KML or KMZ file
+
+    Placemarks without a polygon are skipped. Placemarks without a name are named after the
+    file and their position among the polygon placemarks, e.g. sites_3, as the command line does.
+
+    Args:
+    path: path of the .kml or .kmz file, or a binary file object with kml.
+
+    Yields:
+    (name, polygons): the placemark name and, for each of its polygons, the list of its rings
+        as (n, 2) arrays of lon-lat, outer boundary first.
+
+    """
+    stem = os.path.splitext(os.path.basename(path))[0] if isinstance(path, str) else 'site'
+    i = 0
+    with open_kml(path) as f:
+        stack = []  # open elements, to detach each placemark from its parent once read
+        for event, elem in ElementTree.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                stack.append(elem)
+                continue
+            stack.pop()
+            if _local(elem.tag) != 'Placemark':
+                continue
+
+            name = next((c.text for c in elem if _local(c.tag) == 'name'), None)
+            polygons = [_polygon_rings(p) for p in elem.iter() if _local(p.tag) == 'Polygon']
+
+            # free the placemark
+            elem.clear()
+            if stack:
+                stack[-1].remove(elem)
+
+            if polygons:
+                yield name if name and name.strip() else '{}_{}'.format(stem, i), polygons
+                i += 1
+
+
+def format_coordinates(xy):
+    """
+    KML coordinates element of a ring, formatted like GEOS does (LinearRing.kml)
+
+    Args:
+    xy: (n, 2) numpy array of lon-lat, or (n, 3) with the altitudes.
+
+    Returns:
+    text: <coordinates>lon,lat,alt ...</coordinates>, with 0 altitudes for 2D rings.
+
+    """
+    n, dims = xy.shape
+    # one % format for the whole ring, floats print the way GEOS coordinates do
+    fmt = '%s,%s,%s ' if dims == 3 else '%s,%s,0 '
+    return '<coordinates>' + ((fmt * n) % tuple(xy.ravel().tolist()))[:-1] + '</coordinates>'
+
+
+def _placemark(name, style, rings):
+    """KML Placemark with a Polygon of rings, exterior ring first"""
+    parts = ['<Placemark><name>', escape(name), '</name>', style,
+             '<Polygon><extrude>1</extrude><altitudeMode>clampToGround</altitudeMode>',
+             '<outerBoundaryIs><LinearRing>', format_coordinates(rings[0]), '</LinearRing></outerBoundaryIs>']
+    for ring in rings[1:]:
+        parts += ['<innerBoundaryIs><LinearRing>', format_coordinates(ring), '</LinearRing></innerBoundaryIs>']
+    parts.append('</Polygon></Placemark>\n')
+    return ''.join(parts)
+
+
+def write_site_kml(f, site_name, sensor_name, placement, outline):
+    """
+    stream the KML document of a site & the placement of one sensor, like the site.kml template
+
+    Args:
+    f: text file to write to.
+    site_name: name of the site.
+    sensor_name: name of the sensor, the wedges are named {site_name}.{sensor_name}.{i}.
+    placement: MultiPolygon placement in lat-long.
+    outline: site outline in lat-long, Polygon or MultiPolygon. Each part gets a placemark.
+
+    Returns:
+    n: number of placemarks written.
+
+    """
+    f.write(KML_HEADER)
+    n = write_placemarks(f, site_name, sensor_name, polygon_rings(placement, z=True), polygon_rings(outline, z=True))
+    f.write(KML_FOOTER)
+    return n
+
+
+def write_placemarks(f, site_name, sensor_name, placement, outline):
+    """
+    write the placemarks of a site & the placement of one sensor, without the document around them
+
+    Args:
+    f: text file to write to.
+    site_name: name of the site.
+    sensor_name: name of the sensor, the wedges are named {site_name}.{sensor_name}.{i}.
+    placement: list of polygons, each a list of vertex arrays (see footprints.polygon_rings), of the wedges.
+    outline: list of polygons of the site outline, in the same layout.
+
+    Returns:
+    n: number of placemarks written.
+
+    """
+    # the wedges have no holes, only their exterior ring is written as in the template
+    for i, rings in enumerate(placement):
+        f.write(_placemark('{}.{}.{}'.format(site_name, sensor_name, i), WEDGE_STYLE, rings[:1]))
+    for rings in outline:
+        f.write(_placemark(site_name, OUTLINE_STYLE, rings))
+    return len(placement) + len(outline)
+
+
+@contextmanager
+def create_kml(path, kmz=False):
+    """
+    create a KML file, or a KMZ archive with the document as doc.kml, as a buffered text stream
+
+    The KMZ document is compressed as it is written, it is never held in memory whole.
+    """
+    if kmz:
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            with zf.open('doc.kml', 'w') as raw:
+                with io.TextIOWrapper(io.BufferedWriter(raw, BUFFER_SIZE), encoding='utf-8') as f:
+                    yield f
+    else:
+        with open(path, 'w', encoding='utf-8', buffering=BUFFER_SIZE) as f:
+            yield f
@@ -0,0 +1,137 @@
+"""
+luigi tasks for the sensor placements
+
+PlaceSensorTask places one sensor at a site, PlaceSiteTask every sensor at a site, reading the
+site outline from & writing the placements to checkpoint files (see geoio). They run under
+the luigi scheduler, or in a process pool with cov_algo.run_tasks.
+"""
+import hashlib
+import os
+
+from luigi import Task, LocalTarget, Parameter, IntParameter, BoolParameter, ChoiceParameter, ListParameter
+from luigi.format import Nop
+
+from final_project.tasks import metrics
+from final_project.tasks.cov_algo import (ALGORITHMS, ALGORITHM_VERSION, outline_rings, place_site, placeSensor,
+                                          project_site)
+from final_project.tasks.footprints import placement_wedges
+from final_project.tasks.geoio import FORMATS, geometry_path, read_geometry, write_geometry
+from final_project.tasks.placement_cache import BACKENDS, get_cache
+from final_project.tasks.projection import PROJECTIONS
+from final_project.tasks.simplify import SIMPLIFY_VERSION, record_coverage_difference, simplify_rings, tolerance_for
+
+
+def spec_digest(rng, fov, vectorized=False, projection='utm', algorithm='interval', simplify=False):
+    """short digest of everything a placement depends on besides the site, for the placement file names"""
+    spec = (rng, fov, vectorized, projection, ALGORITHM_VERSION)
+    if algorithm != 'interval':
+        # the interval placement files keep the names they had before there was a choice
+        spec += (algorithm,)
+    if simplify:
+        spec += ('simplify', tolerance_for(rng), SIMPLIFY_VERSION)
+    return hashlib.sha1(repr(spec).encode()).hexdigest()[:10]
+
+
+class PlaceSensorTask(Task):
+    """luigi task for calculating sensor placements"""
+
+    INPUT_ROOT = os.path.join('data', 'site_wkt/')
+    OUTPUT_ROOT = os.path.join('data', 'sensor_wkt/')
+    site = Parameter()  # luigi parameter for site name
+    sensor_stype = Parameter()  # luigi parameter for sensor type
+    sensor_rng = IntParameter()  # luigi parameter for sensor range
+    sensor_fov = IntParameter()  # luigi parameter for sensor fov
+    vectorized = BoolParameter(default=False)  # use the array based placement
+    projection = ChoiceParameter(choices=PROJECTIONS, default='utm')  # local projection picked from the site centroid
+    simplify = BoolParameter(default=False)  # simplify the outline to a tolerance derived from the range first
+    # placement cache backend the simplified outlines are shared through, see placement_cache
+    cache = ChoiceParameter(choices=('',) + BACKENDS, default='', significant=False)
+    cache_size = IntParameter(default=512, significant=False)  # size of the disk cache in MiB
+
+    def requires(self):
+        return []
+
+    def output(self):
+        # return the placement of sensors in Well Known Text (wkt) format, named after its spec like PlaceSiteTask's
+        digest = spec_digest(self.sensor_rng, self.sensor_fov, self.vectorized, self.projection,
+                             simplify=self.simplify)
+        return LocalTarget(os.path.join(self.OUTPUT_ROOT, "{}_{}_{}".format(self.site, self.sensor_stype, digest)))
+
+    def run(self):
+        with metrics.timer('task.read'):
+            poly = read_geometry(os.path.join(self.INPUT_ROOT, self.site))
+        with metrics.timer('place.project'):
+            poly, to_wgs = project_site(poly, self.projection)
+            # pass the polygon in form of lines in a numpy array per ring
+            xy = outline_rings(poly)
+
+        placed = xy
+        if self.simplify:
+            tolerance = tolerance_for(self.sensor_rng)
+            placed = simplify_rings(xy, tolerance, get_cache(self.cache, max_bytes=self.cache_size * 2 ** 20))
+
+        sps = placeSensor(placed, rng=self.sensor_rng, fov=self.sensor_fov, skip_small=True,
+                          vectorized=self.vectorized)
+        if self.simplify:
+            record_coverage_difference(xy, placed, placement_wedges(sps))
+
+        with metrics.timer('place.transform'):
+            sps.transform(to_wgs)
+        with metrics.timer('task.write', files=1):
+            with self.output().open('w') as f:
+                f.write(sps.wkt)
+
+
+class PlaceSiteTask(Task):
+    """
+    luigi task for calculating the sensor placements of one site for several sensors
+
+    The site outline is read & projected once and shared by all the sensors. The placement
+    files are named after the site, the sensor and a digest of everything the placement
+    depends on, so a changed spec never picks up a stale file.
+    """
+
+    INPUT_ROOT = PlaceSensorTask.INPUT_ROOT
+    OUTPUT_ROOT = PlaceSensorTask.OUTPUT_ROOT
+    site = Parameter()  # luigi parameter for site name
+    sensors = ListParameter()  # luigi parameter for the (stype, name, rng, fov) of each sensor
+    vectorized = BoolParameter(default=False)  # use the array based placement
+    projection = ChoiceParameter(choices=PROJECTIONS, default='utm')  # local projection picked from the site centroid
+    fmt = ChoiceParameter(choices=FORMATS, default='wkt')  # format of the site & placement files
+    algorithm = ChoiceParameter(choices=ALGORITHMS, default='interval')  # placement engine
+    simplify = BoolParameter(default=False)  # simplify the outline to a tolerance derived from each range first
+    # placement cache backend, see placement_cache. it does not change the results
+    cache = ChoiceParameter(choices=('',) + BACKENDS, default='', significant=False)
+    cache_size = IntParameter(default=512, significant=False)  # size of the disk cache in MiB
+
+    @classmethod
+    def output_path(cls, site, stype, name, rng, fov, vectorized=False, projection='utm', fmt='wkt',
+                    algorithm='interval', simplify=False):
+        """path of the placement of one sensor at a site"""
+        digest = spec_digest(rng, fov, vectorized, projection, algorithm, simplify)
+        return geometry_path(cls.OUTPUT_ROOT, "{}_{}_{}_{}".format(site, stype, name, digest), fmt)
+
+    def requires(self):
+        return []
+
+    def output(self):
+        # one placement file per sensor, keyed by (stype, name)
+        target_format = Nop if self.fmt == 'wkb' else None
+        return {(stype, name): LocalTarget(self.output_path(self.site, stype, name, rng, fov, self.vectorized,
+                                                            self.projection, self.fmt, self.algorithm,
+                                                            self.simplify),
+                                           format=target_format)
+                for stype, name, rng, fov in self.sensors}
+
+    def run(self):
+        cache = get_cache(self.cache, max_bytes=self.cache_size * 2 ** 20)
+        with metrics.timer('task.read'):
+            poly = read_geometry(geometry_path(self.INPUT_ROOT, self.site, self.fmt), self.fmt)
+        placements = place_site(poly, self.sensors, projection=self.projection, vectorized=self.vectorized,
+                                cache=cache, algorithm=self.algorithm, simplify=self.simplify)
+
+        outputs = self.output()
+        with metrics.timer('task.write', files=len(placements)):
+            for (stype, name, rng, fov), sps in zip(self.sensors, placements):
+                with outputs[(stype, name)].open('w') as f:
+                    write_geometry(f, sps, self.fmt)
@@ -0,0 +1,187 @@
+"""
+timers & counters for the stages of the placement pipeline
+
+Every stage (kml parsing, projection, placement, the GEOS coverage checks, file & db writes,
+kml rendering) adds its wall time, its number of calls and its item counts (sites, vertices,
+sensors, rows...) to a process wide registry. Recording is a perf_counter call and a few dict
+updates under a lock, cheap enough to leave on in production. The hot loops add their counts
+once per call, not once per item.
+
+Worker processes hand their counts back to the parent with collect() & merge(). The management
+commands log the totals as one JSON line per stage, and optionally write them to a Prometheus
+textfile (for the node_exporter textfile collector) with write_textfile().
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# prefix of the Prometheus metric names
+PREFIX = 'site_planner'
+
+_lock = threading.Lock()
+_stages = {}  # stage name: {'calls': n, 'seconds': s, <item>: count, ...}
+
+
+def add(stage, seconds=0.0, calls=1, **counts):
+    """
+    add a measurement to a stage
+
+    Args:
+    stage: name of the stage, dotted, e.g. 'load_sites.db_write'.
+    seconds: wall time spent in the stage.
+    calls: number of calls to count. Default 1.
+    counts: items processed, e.g. sensors=12, vertices=300.
+
+    """
+    with _lock:
+        s = _stages.get(stage)
+        if s is None:
+            s = _stages[stage] = {'calls': 0, 'seconds': 0.0}
+        s['calls'] += calls
+        s['seconds'] += seconds
+        for item, n in counts.items():
+            s[item] = s.get(item, 0) + n
+
+
+def count(stage, **counts):
+    """add item counts to a stage, without a call or time"""
+    add(stage, 0.0, 0, **counts)
+
+
+@contextmanager
+def timer(stage, **counts):
+    """
+    time a block as one call of a stage
+
+    Yields:
+    counts: dict the block can add its item counts to, recorded with the time on exit.
+
+    """
+    counts = dict(counts)
+    start = time.perf_counter()
+    try:
+        yield counts
+    finally:
+        add(stage, time.perf_counter() - start, **counts)
+
+
+def timed_iter(stage, iterable):
+    """iterate, timing every item fetched as one call of stage, e.g. the parsing of a streamed file"""
+    it = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            add(stage, time.perf_counter() - start, calls=0)
+            return
+        add(stage, time.perf_counter() - start)
+        yield item
+
+
+def snapshot():
+    """copy of the counts of every stage, {stage: {'calls': n, 'seconds': s, <item>: count, ...}}"""
+    with _lock:
+        return {stage: dict(s) for stage, s in _stages.items()}
+
+
+def reset():
+    """clear every stage, e.g. at the start of a command or in a new worker process"""
+    with _lock:
+        _stages.clear()
+
+
+def collect():
+    """snapshot & reset, for a worker process to hand its counts to the parent"""
+    with _lock:
+        stages = {stage: dict(s) for stage, s in _stages.items()}
+        _stages.clear()
+    return stages
+
+
+def merge(stages):
+    """add the counts of a snapshot, e.g. from a worker process, to this process"""
+    for stage, s in stages.items():
+        s = dict(s)
+        add(stage, s.pop('seconds'), s.pop('calls'), **s)
+
+
+def log_metrics(log=logger, level=logging.INFO):
+    """log every stage as one JSON line, {"stage": ..., "calls": ..., "seconds": ..., <item>: ...}"""
+    for stage, s in sorted(snapshot().items()):
+        log.log(level, json.dumps(dict(stage=stage, **s), sort_keys=True))
+
+
+def report(path=None, labels=None):
+    """log every stage, and write them to the Prometheus textfile at path if one is given"""
+    log_metrics()
+    if path:
+        write_textfile(path, labels)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_textfile(stages=None, labels=None):
+    """
+    Prometheus text exposition of the stages
+
+    Args:
+    stages: snapshot to format. Default is the current one.
+    labels: dict of labels added to every sample, e.g. {'command': 'run_algos'}.
+
+    Returns:
+    text: the metrics, one gauge family each for the seconds, calls & items of the stages.
+
+    """
+    stages = snapshot() if stages is None else stages
+    labels = labels or {}
+
+    def sample(name, value, **extra):
+        lbl = dict(labels, **extra)
+        lbl = ','.join('{}="{}"'.format(k, _escape(v)) for k, v in sorted(lbl.items()))
+        return '{}_{}{{{}}} {}'.format(PREFIX, name, lbl, repr(float(value)))
+
+    lines = ['# HELP {}_stage_seconds Wall time spent in a stage of the last run.'.format(PREFIX),
+             '# TYPE {}_stage_seconds gauge'.format(PREFIX)]
+    lines.extend(sample('stage_seconds', s['seconds'], stage=stage) for stage, s in sorted(stages.items()))
+    lines += ['# HELP {}_stage_calls Number of calls to a stage in the last run.'.format(PREFIX),
+              '# TYPE {}_stage_calls gauge'.format(PREFIX)]
+    lines.extend(sample('stage_calls', s['calls'], stage=stage) for stage, s in sorted(stages.items()))
+    lines += ['# HELP {}_stage_items Items (sites, vertices, sensors, rows...) processed by a stage in the last run.'
+              .format(PREFIX),
+              '# TYPE {}_stage_items gauge'.format(PREFIX)]
+    lines.extend(sample('stage_items', n, stage=stage, item=item)
+                 for stage, s in sorted(stages.items())
+                 for item, n in sorted(s.items()) if item not in ('calls', 'seconds'))
+    lines += ['# HELP {}_last_run_timestamp_seconds End of the last run, in unix time.'.format(PREFIX),
+              '# TYPE {}_last_run_timestamp_seconds gauge'.format(PREFIX),
+              sample('last_run_timestamp_seconds', time.time())]
+    return '\n'.join(lines) + '\n'
+
+
+def write_textfile(path, labels=None):
+    """
+    write the stages to a Prometheus textfile
+
+    The file is replaced atomically, so the collector never reads a partial file.
+
+    Args:
+    path: path of the .prom file.
+    labels: dict of labels added to every sample, see format_textfile.
+
+    """
+    text = format_textfile(labels=labels)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(text)
+    # mkstemp makes the file private, the collector may run as another user
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
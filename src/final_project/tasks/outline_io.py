@@ -0,0 +1,247 @@
+"""
+site outlines & placements as KML, GeoJSON or WKT, read & written with numpy
+
+For the command line (final_project.cli), which places sensors without Django or a database.
+Geometries stay in the layout of kml.iter_placemarks & footprints.polygon_rings throughout:
+a list of polygons, each a list of (n, 2) vertex arrays with the exterior ring first. No GEOS
+geometry is made on the way in or out, to_geometry builds one when an outline has to be projected.
+"""
+import json
+import os
+import re
+
+import numpy as np
+
+from final_project.tasks.kml import KML_FOOTER, KML_HEADER, iter_placemarks, write_placemarks
+
+FORMATS = ('kml', 'geojson', 'wkt')
+SUFFIXES = {'.kml': 'kml', '.kmz': 'kml', '.geojson': 'geojson', '.json': 'geojson', '.wkt': 'wkt'}
+
+_TOKENS = re.compile(r'\(|\)|[^()]+')
+
+
+def guess_format(path, default='wkt'):
+    """format of a file from its suffix, default for stdin/stdout ('-') or an unknown suffix"""
+    return SUFFIXES.get(os.path.splitext(path)[1].lower(), default)
+
+
+def _ring(text):
+    """(n, 2) array of a WKT coordinate list, x y[ z[ m]] pairs separated by commas"""
+    dims = len(text.split(',', 1)[0].split())
+    return np.array(text.replace(',', ' ').split(), dtype=float).reshape(-1, dims)[:, :2]
+
+
+def parse_wkt(text):
+    """
+    parse a WKT (or EWKT) Polygon or MultiPolygon
+
+    Args:
+    text: the WKT, e.g. 'POLYGON ((0 0, 1 0, 1 1, 0 0))' or 'SRID=4326;MULTIPOLYGON (...)'.
+
+    Returns:
+    polygons: one list per polygon with the (n, 2) arrays of its rings, exterior ring first.
+
+    """
+    text = text.strip().split(';', 1)[-1]
+    head, paren, body = text.partition('(')
+    kind = head.split()[0].upper() if head.split() else ''
+    if kind not in ('POLYGON', 'MULTIPOLYGON'):
+        raise ValueError("expected a POLYGON or MULTIPOLYGON, got {!r}".format(text[:40]))
+
+    # the coordinate lists are the text at the innermost depth
+    ring_depth = 3 if kind == 'MULTIPOLYGON' else 2
+    polygons = []
+    rings = []
+    depth = 0
+    for token in _TOKENS.findall(paren + body):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            if depth == ring_depth - 1 and rings:
+                polygons.append(rings)
+                rings = []
+            depth -= 1
+        elif depth == ring_depth and token.strip():
+            rings.append(_ring(token))
+    if depth:
+        raise ValueError("unbalanced parentheses in {!r}".format(text[:40]))
+    return polygons
+
+
+def format_wkt(polygons):
+    """WKT MultiPolygon of a list of polygons, MULTIPOLYGON EMPTY for none"""
+    if not len(polygons):
+        return 'MULTIPOLYGON EMPTY'
+    parts = []
+    for rings in polygons:
+        parts.append('(' + ', '.join('(' + (('%r %r, ' * len(xy)) % tuple(xy[:, :2].ravel().tolist()))[:-2] + ')'
+                                     for xy in rings) + ')')
+    return 'MULTIPOLYGON (' + ', '.join(parts) + ')'
+
+
+def _geojson_rings(rings):
+    """(n, 2) arrays of the rings of a GeoJSON Polygon's coordinates, ValueError if they are not rings"""
+    if not isinstance(rings, list):
+        raise ValueError("coordinates: expected a list of rings, got {!r}".format(rings))
+    arrays = []
+    for ring in rings:
+        xy = np.array(ring, dtype=float) if isinstance(ring, list) else None
+        if xy is None or xy.ndim != 2 or xy.shape[1] < 2 or len(xy) < 4:
+            raise ValueError("coordinates: expected a ring of at least 4 positions, got {!r}".format(ring))
+        arrays.append(xy[:, :2])
+    return arrays
+
+
+def parse_geojson(geometry):
+    """
+    polygons of a GeoJSON Polygon, MultiPolygon or GeometryCollection geometry, [] for others
+
+    Raises:
+    ValueError: the geometry has no type, or its coordinates are not nested as its type says.
+
+    """
+    if not geometry:
+        return []
+    if not isinstance(geometry, dict) or 'type' not in geometry:
+        raise ValueError("geometry: expected a GeoJSON object with a type")
+    kind = geometry['type']
+    if kind == 'GeometryCollection':
+        if not isinstance(geometry.get('geometries'), list):
+            raise ValueError("geometries: expected a list of geometries")
+        return [rings for g in geometry['geometries'] for rings in parse_geojson(g)]
+    if kind not in ('Polygon', 'MultiPolygon'):
+        return []
+    coordinates = geometry.get('coordinates')
+    if not isinstance(coordinates, list):
+        raise ValueError("coordinates: expected a list for a {}".format(kind))
+    if kind == 'Polygon':
+        coordinates = [coordinates]
+    return [_geojson_rings(rings) for rings in coordinates if rings]
+
+
+def iter_geojson(f):
+    """
+    read the polygon features of a GeoJSON FeatureCollection, Feature or bare geometry
+
+    Yields:
+    (name, polygons): the name property of the feature (None without one) & its polygons.
+        Features without a polygon are skipped.
+
+    """
+    data = json.load(f)
+    if data.get('type') == 'FeatureCollection':
+        features = data['features']
+    elif data.get('type') == 'Feature':
+        features = [data]
+    else:
+        features = [{'geometry': data}]
+    for feature in features:
+        polygons = parse_geojson(feature.get('geometry'))
+        if polygons:
+            yield (feature.get('properties') or {}).get('name'), polygons
+
+
+def iter_wkt(f):
+    """read one Polygon or MultiPolygon WKT per non blank line, yields (None, polygons)"""
+    for line in f:
+        if line.strip():
+            yield None, parse_wkt(line)
+
+
+def iter_outlines(f, fmt):
+    """
+    read the site outlines of an open file
+
+    Args:
+    f: file object, binary for kml, text for geojson & wkt.
+    fmt: 'kml', 'geojson' or 'wkt'.
+
+    Yields:
+    (name, polygons): site name (None if the file has none) and polygons.
+
+    """
+    if fmt == 'kml':
+        return iter_placemarks(f)
+    if fmt == 'geojson':
+        return iter_geojson(f)
+    if fmt == 'wkt':
+        return iter_wkt(f)
+    raise ValueError("unknown format {!r}, expected one of {}".format(fmt, FORMATS))
+
+
+def geojson_feature(name, placement, sensor):
+    """
+    GeoJSON Feature of a placement
+
+    Args:
+    name: site name, the name property.
+    placement: list of polygons with the sensor wedges.
+    sensor: (stype, rng, fov) sensor spec, added to the properties.
+
+    Returns:
+    feature: dict, with a MultiPolygon geometry & the number of sensors placed.
+
+    """
+    stype, rng, fov = sensor
+    return {'type': 'Feature',
+            'properties': {'name': name, 'sensor': stype, 'rng': rng, 'fov': fov, 'sensors': len(placement)},
+            'geometry': {'type': 'MultiPolygon',
+                         'coordinates': [[xy[:, :2].tolist() for xy in rings] for rings in placement]}}
+
+
+def to_geometry(polygons, srid=4326):
+    """GEOS Polygon, or MultiPolygon for several parts, of a list of polygons"""
+    from django.contrib.gis.geos import LinearRing, MultiPolygon, Polygon
+
+    parts = [Polygon(*[LinearRing(xy) for xy in rings]) for rings in polygons]
+    geom = parts[0] if len(parts) == 1 else MultiPolygon(parts)
+    geom.srid = srid
+    return geom
+
+
+class WktWriter:
+    """one WKT MultiPolygon placement per line"""
+
+    def __init__(self, f, sensor):
+        self.f = f
+
+    def write(self, name, placement, outline):
+        self.f.write(format_wkt(placement) + '\n')
+
+    def close(self):
+        pass
+
+
+class GeoJSONWriter:
+    """a FeatureCollection with one MultiPolygon placement feature per site"""
+
+    def __init__(self, f, sensor):
+        self.f = f
+        self.sensor = sensor
+        self.n = 0
+        f.write('{"type": "FeatureCollection", "features": [\n')
+
+    def write(self, name, placement, outline):
+        self.f.write((',\n' if self.n else '') + json.dumps(geojson_feature(name, placement, self.sensor)))
+        self.n += 1
+
+    def close(self):
+        self.f.write('\n]}\n')
+
+
+class KmlWriter:
+    """a KML document with the wedges & outline of every site, styled as write_kml does"""
+
+    def __init__(self, f, sensor):
+        self.f = f
+        self.stype = sensor[0]
+        f.write(KML_HEADER)
+
+    def write(self, name, placement, outline):
+        write_placemarks(self.f, name, self.stype, placement, outline)
+
+    def close(self):
+        self.f.write(KML_FOOTER)
+
+
+WRITERS = {'kml': KmlWriter, 'geojson': GeoJSONWriter, 'wkt': WktWriter}
@@ -0,0 +1,177 @@
+"""
+content addressed cache for sensor placements
+
+Placements are keyed by a hash of the projected outline coordinates and the parameters that
+change the result (sensor spec, placement options, algorithm version), so a site that did not
+change is never placed twice, whatever its name. Values are the placements as wkb bytes.
+
+Two backends are available: DiskCache, a size bounded LRU directory, and DjangoCache, which
+stores the placements in one of the django CACHES (redis in production).
+"""
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+BACKENDS = ('disk', 'django')
+
+# version of the key layout, part of every key. bump it whenever content_key hashes differently
+KEY_VERSION = 2
+
+
+def content_key(xy, *params):
+    """
+    cache key for a placement
+
+    Args:
+    xy: numpy array (or list of arrays) with the projected outline coordinates.
+    params: anything else the placement depends on. Hashed through its repr.
+
+    Returns:
+    key: hex sha256 digest. The number & shape of the rings are hashed with their coordinates,
+        so the same vertices split into rings differently make different keys.
+
+    """
+    # a list of arrays is a list of rings, a list of points a single ring
+    rings = xy if isinstance(xy, (list, tuple)) and not (len(xy) and np.ndim(xy[0]) == 1) else [xy]
+    h = hashlib.sha256()
+    h.update(repr((KEY_VERSION, len(rings))).encode())
+    for ring in rings:
+        ring = np.ascontiguousarray(ring, dtype='<f8')
+        h.update(repr(ring.shape).encode())
+        h.update(ring.tobytes())
+    h.update(repr(params).encode())
+    return h.hexdigest()
+
+
+class DiskCache(object):
+    """
+    size bounded, least recently used placement cache in a directory
+
+    Every entry is a file named by its key. Reading an entry touches it, and whenever the
+    directory grows past max_bytes the least recently used entries are deleted. Writes are
+    atomic, so several worker processes can share the directory.
+
+    Args:
+    root: cache directory. Default data/placement_cache.
+    max_bytes: size the cache is trimmed to. Default 512 MiB.
+
+    """
+
+    EVICT_EVERY = 100  # check the size of the cache every this many writes
+
+    def __init__(self, root=os.path.join('data', 'placement_cache'), max_bytes=512 * 2 ** 20):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._writes = 0
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key + '.wkb')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        # mark the entry as recently used. another process may have evicted it since the read
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def set(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        self._writes += 1
+        if self._writes % self.EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        """delete the least recently used entries until the cache fits in max_bytes, returns the count"""
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            for fn in filenames:
+                if not fn.endswith('.wkb'):
+                    continue
+                path = os.path.join(dirpath, fn)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for mtime, size, path in entries)
+        removed = 0
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+class DjangoCache(object):
+    """
+    placement cache in one of the django CACHES
+
+    Eviction is left to the cache itself, e.g. the maxmemory policy of redis.
+
+    Args:
+    alias: name of the cache in settings.CACHES. Default 'default'.
+    timeout: expiry of the entries in seconds. Default None, never expire.
+
+    """
+
+    PREFIX = 'placement:'
+
+    def __init__(self, alias='default', timeout=None):
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def _cache(self):
+        from django.core.cache import caches
+        return caches[self.alias]
+
+    def get(self, key):
+        return self._cache.get(self.PREFIX + key)
+
+    def set(self, key, data):
+        self._cache.set(self.PREFIX + key, data, timeout=self.timeout)
+
+    def evict(self):
+        return 0
+
+
+def get_cache(backend, max_bytes=None):
+    """
+    placement cache for a backend name
+
+    Args:
+    backend: 'disk', 'django', or None/'' for no cache.
+    max_bytes: size of the disk cache. Default is the DiskCache default.
+
+    Returns:
+    cache: DiskCache, DjangoCache or None.
+
+    """
+    if not backend:
+        return None
+    if backend == 'disk':
+        return DiskCache(max_bytes=max_bytes) if max_bytes else DiskCache()
+    if backend == 'django':
+        return DjangoCache()
+    raise ValueError("unknown placement cache {!r}, expected one of {}".format(backend, BACKENDS))
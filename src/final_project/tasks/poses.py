@@ -0,0 +1,90 @@
+"""
+sensor placements as packed poses
+
+A placement is fully described by the pose of each sensor: its position & heading in the
+local projection of the site, plus the rng & fov of the sensor. Poses are packed as a
+struct of float64 records, 24 bytes per sensor against ~16 bytes per wedge vertex for the
+polygons, and the wedges are only built (see footprints.wedge_rings) when they are drawn,
+queried or exported. Unpacked, the poses are a numpy record array, so spacing or heading
+statistics over many placements stay vectorized.
+"""
+import numpy as np
+
+from final_project.tasks.footprints import wedge_multipolygon, wedge_rings
+from final_project.tasks.projection import transform_pair
+
+# x, y in metres in the local projection, heading in radians counter clockwise from the x axis
+POSE_DTYPE = np.dtype([('x', '<f8'), ('y', '<f8'), ('heading', '<f8')])
+
+
+def pack_poses(origins, headings):
+    """
+    pack sensor poses into bytes
+
+    Args:
+    origins: (n, 2) array of sensor positions.
+    headings: (n, 2) array of unit vectors the sensors point along, or (n,) array of angles in radians.
+
+    Returns:
+    data: n POSE_DTYPE records as bytes.
+
+    """
+    origins = np.asarray(origins, dtype=float).reshape(-1, 2)
+    headings = np.asarray(headings, dtype=float)
+    if headings.ndim == 2:
+        headings = np.arctan2(headings[:, 1], headings[:, 0])
+    poses = np.empty(len(origins), dtype=POSE_DTYPE)
+    poses['x'] = origins[:, 0]
+    poses['y'] = origins[:, 1]
+    poses['heading'] = headings
+    return poses.tobytes()
+
+
+def unpack_poses(data):
+    """read-only POSE_DTYPE record array of packed poses, without copying them"""
+    return np.frombuffer(data, dtype=POSE_DTYPE)
+
+
+def pose_rings(poses, rng, fov):
+    """
+    vertex rings of the wedges of a pose array
+
+    Args:
+    poses: POSE_DTYPE record array, or packed poses.
+    rng, fov: range & fov of the sensor.
+
+    Returns:
+    rings: (n, k, 2) array, in the projection of the poses, see footprints.wedge_rings.
+
+    """
+    if isinstance(poses, (bytes, bytearray, memoryview)):
+        poses = unpack_poses(poses)
+    return wedge_rings(np.column_stack((poses['x'], poses['y'])), poses['heading'], rng, fov, angles=True)
+
+
+def pose_placement(data, srs, rng, fov):
+    """
+    lat-long MultiPolygon placement of packed poses
+
+    Args:
+    data: packed poses.
+    srs: proj4 string of the local projection of the poses.
+    rng, fov: range & fov of the sensor.
+
+    Returns:
+    mpoly: MultiPolygon with one wedge per sensor, in lat-long.
+
+    """
+    from django.contrib.gis.geos import MultiPolygon
+
+    poses = unpack_poses(data)
+    if not len(poses):
+        return MultiPolygon([], srid=4326)
+    mpoly = wedge_multipolygon(pose_rings(poses, rng, fov))
+    mpoly.transform(transform_pair(srs)[1])
+    return mpoly
+
+
+def merge_poses(parts):
+    """the packed poses of several placements, as one placement"""
+    return b''.join(bytes(data) for data in parts)
@@ -0,0 +1,91 @@
+"""
+local metric projections for sites & a process wide pool of coordinate transforms
+
+Sites are stored in lon/lat (WGS84) and the placement works in metres, so every site is
+projected to a local projection picked from its centroid: its UTM zone, or an azimuthal
+equidistant projection centred near the site. SpatialReference & CoordTransform objects are
+expensive to build, so they are kept in LRU pools keyed by their proj4 strings and shared by
+every task that runs in the process.
+"""
+from functools import lru_cache
+
+WGS84 = '+proj=longlat +datum=WGS84'
+
+PROJECTIONS = ('utm', 'aeqd')
+
+# aeqd centres are rounded to this many decimals (~1 km), so that sites close to each other
+# share a projection (and its pooled transforms) at a negligible cost in distortion
+AEQD_CENTRE_DECIMALS = 2
+
+
+def utm_zone(lon, lat):
+    """
+    UTM zone number for a lon/lat position, including the Norway & Svalbard exceptions
+
+    Args:
+    lon: longitude in degrees.
+    lat: latitude in degrees.
+
+    Returns:
+    zone: integer between 1 and 60.
+
+    """
+    zone = int((lon + 180) // 6) % 60 + 1
+    if 56 <= lat < 64 and 3 <= lon < 12:
+        zone = 32
+    elif 72 <= lat < 84 and 0 <= lon < 42:
+        zone = 31 if lon < 9 else 33 if lon < 21 else 35 if lon < 33 else 37
+    return zone
+
+
+def utm_proj4(lon, lat):
+    """proj4 string of the UTM zone containing a lon/lat position"""
+    south = '+south ' if lat < 0 else ''
+    return '+proj=utm +zone={} {}+ellps=WGS84'.format(utm_zone(lon, lat), south)
+
+
+def aeqd_proj4(lon, lat):
+    """proj4 string of an azimuthal equidistant projection centred near a lon/lat position"""
+    return '+proj=aeqd +lat_0={:.{p}f} +lon_0={:.{p}f} +ellps=WGS84 +units=m'.format(
+        lat, lon, p=AEQD_CENTRE_DECIMALS)
+
+
+def local_projection(geom, method='utm'):
+    """
+    pick a metric projection for a lon/lat geometry from its centroid
+
+    Args:
+    geom: GEOS geometry in lon/lat.
+    method: 'utm' for the UTM zone of the centroid, or 'aeqd' for an azimuthal equidistant
+        projection centred on it. UTM falls back to aeqd beyond its 84N/80S limits.
+
+    Returns:
+    srs: proj4 string of the projection.
+
+    """
+    if method not in PROJECTIONS:
+        raise ValueError("unknown projection {!r}, expected one of {}".format(method, PROJECTIONS))
+    centroid = geom.centroid
+    lon, lat = centroid.x, centroid.y
+    if method == 'utm' and -80 <= lat <= 84:
+        return utm_proj4(lon, lat)
+    return aeqd_proj4(lon, lat)
+
+
+@lru_cache(maxsize=64)
+def spatial_reference(srs):
+    """pooled SpatialReference for a proj4/wkt/epsg string"""
+    from django.contrib.gis.gdal import SpatialReference
+    return SpatialReference(srs)
+
+
+@lru_cache(maxsize=128)
+def coord_transform(source, target):
+    """pooled CoordTransform between two srs strings"""
+    from django.contrib.gis.gdal import CoordTransform
+    return CoordTransform(spatial_reference(source), spatial_reference(target))
+
+
+def transform_pair(srs, base=WGS84):
+    """pooled (base -> srs, srs -> base) CoordTransforms"""
+    return coord_transform(base, srs), coord_transform(srs, base)
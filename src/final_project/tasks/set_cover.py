@@ -0,0 +1,241 @@
+"""
+coverage optimal sensor placement as a weighted set cover
+
+Instead of spacing the sensors rng apart (placeSensor), candidate sensor poses are sampled
+along the outline and the outline is cut into short pieces, the coverage targets, weighted by
+their length. Which candidate covers which target is worked out once, into a sparse incidence
+matrix in CSR form (indptr, indices), with the targets binned on a grid so each candidate is
+only tested against the targets under its wedge. A lazy greedy set cover then picks the candidates:
+always the one covering the most uncovered outline length per unit cost.
+
+Only numpy is needed, the incidence matrix is built & used as plain index arrays.
+"""
+import heapq
+from math import ceil, cos, pi
+
+import numpy as np
+
+from final_project.tasks.footprints import wedge_bounds, wedge_rings
+
+# candidates are tested against the targets in chunks of this many, to bound the memory used
+CHUNK = 4096
+
+
+def _segments(xy):
+    """start points, unit vectors, lengths & cumulative start arc lengths of the non zero segments"""
+    xy = np.asarray(xy, dtype=float)
+    d = np.diff(xy, axis=0)
+    length = np.hypot(d[:, 0], d[:, 1])
+    keep = length > 0
+    start, d, length = xy[:-1][keep], d[keep], length[keep]
+    cum = np.concatenate(([0.0], np.cumsum(length)[:-1]))
+    return start, d / length[:, None], length, cum
+
+
+def coverage_targets(xy, spacing):
+    """
+    cut an outline into coverage targets
+
+    Args:
+    xy: (n, 2) numpy array with the outline.
+    spacing: length of the pieces the outline is cut into.
+
+    Returns:
+    (targets, weights): (t, 2) array with the mid point of each piece and (t,) array with its length.
+
+    """
+    start, u, length, cum = _segments(xy)
+    if not length.size:
+        return np.empty((0, 2)), np.empty(0)
+    total = cum[-1] + length[-1]
+
+    edges = np.arange(0, total, spacing)
+    weights = np.diff(np.append(edges, total))
+    s = edges + weights / 2
+    seg = np.clip(np.searchsorted(cum, s, 'right') - 1, 0, len(cum) - 1)
+    targets = start[seg] + u[seg] * (s - cum[seg])[:, None]
+    return targets, weights
+
+
+def candidate_poses(xy, step):
+    """
+    sample candidate sensor poses along an outline
+
+    Candidates sit at every vertex and every step along the outline, each with two headings:
+    forward along the outline and back along it.
+
+    Args:
+    xy: (n, 2) numpy array with the outline.
+    step: spacing of the candidate positions between the vertices.
+
+    Returns:
+    (origins, headings): (m, 2) arrays with the candidate positions and unit heading vectors.
+
+    """
+    start, u, length, cum = _segments(xy)
+    if not length.size:
+        return np.empty((0, 2)), np.empty((0, 2))
+    total = cum[-1] + length[-1]
+
+    s = np.union1d(cum, np.arange(0, total, step))
+    ahead = np.clip(np.searchsorted(cum, s, 'right') - 1, 0, len(cum) - 1)
+    # the segment coming into the position, the last one at the start of a closed ring
+    behind = (np.searchsorted(cum, s, 'left') - 1) % len(cum)
+    positions = start[ahead] + u[ahead] * (s - cum[ahead])[:, None]
+
+    origins = np.repeat(positions, 2, axis=0)
+    headings = np.empty_like(origins)
+    headings[0::2] = u[ahead]
+    headings[1::2] = -u[behind]
+    return origins, headings
+
+
+def incidence(origins, headings, targets, rng, fov):
+    """
+    sparse candidate to target incidence matrix
+
+    A target is covered by a candidate when it lies in the circular sector inscribed in the
+    candidate's wedge (see footprints.wedge_rings): within fov degrees of the heading, and
+    close enough that the arc chords of the wedge polygon do not cut it off.
+
+    Args:
+    origins: (m, 2) array of candidate positions.
+    headings: (m, 2) array of candidate unit heading vectors.
+    targets: (t, 2) array of target points.
+    rng: range of the sensor.
+    fov: fov of the sensor in degrees.
+
+    Returns:
+    (indptr, indices): CSR arrays, the targets covered by candidate i are indices[indptr[i]:indptr[i + 1]].
+
+    """
+    m = len(origins)
+    if not m or not len(targets):
+        return np.zeros(m + 1, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    # the wedge arc vertices sit at angles t/k, so the widest chord spans t/2 (or 2t/n in the middle)
+    t = fov / 180.0 * pi
+    n = ceil(fov / 4)
+    reach = rng * cos(max(t / 4, t / n))
+    cos_t = cos(t) if t < pi else -1.0
+
+    # bin the targets on a grid of rng/4 cells, sorted by cell in row major order
+    cell = rng / 4.0
+    ij = np.floor(targets / cell).astype(np.int64)
+    lo = ij.min(axis=0)
+    dims = ij.max(axis=0) - lo + 1
+    keys = (ij[:, 0] - lo[0]) * dims[1] + (ij[:, 1] - lo[1])
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    sorted_targets = targets[order]
+
+    rows = []
+    cols = []
+    for c0 in range(0, m, CHUNK):
+        o = origins[c0:c0 + CHUNK]
+        h = headings[c0:c0 + CHUNK]
+        # only the targets in the cells under the bounding box of the wedge can be covered
+        bounds = wedge_bounds(wedge_rings(o, h, rng, fov))
+        i0, j0 = (np.floor(bounds[:, :2] / cell).astype(np.int64) - lo).T
+        i1, j1 = (np.floor(bounds[:, 2:] / cell).astype(np.int64) - lo).T
+        j0 = np.clip(j0, 0, dims[1] - 1)
+        j1 = np.clip(j1, 0, dims[1] - 1)
+
+        cand = []
+        tgt = []
+        # the cells of one grid row under a box have consecutive keys, so each row is one
+        # searchsorted range. a wedge box is at most 2 rng, i.e. 9 cells, high
+        for di in range(9):
+            i = i0 + di
+            inside = (i <= i1) & (i >= 0) & (i < dims[0]) & (j0 <= j1)
+            first = np.searchsorted(keys, i * dims[1] + j0, 'left')
+            count = np.where(inside, np.searchsorted(keys, i * dims[1] + j1, 'right') - first, 0)
+            c = np.repeat(np.arange(len(o)), count)
+            # first + 0..count-1 for every candidate, without a python loop
+            offset = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+            cand.append(c)
+            tgt.append(np.repeat(first, count) + offset)
+        c = np.concatenate(cand)
+        j = np.concatenate(tgt)
+
+        v = sorted_targets[j] - o[c]
+        dist = np.hypot(v[:, 0], v[:, 1])
+        along = (v * h[c]).sum(axis=1)
+        hit = (dist <= reach) & ((along >= dist * cos_t) | (dist == 0))
+        rows.append(c[hit] + c0)
+        cols.append(order[j[hit]])
+
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    by_row = np.lexsort((cols, rows))
+    indptr = np.zeros(m + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=m), out=indptr[1:])
+    return indptr, cols[by_row]
+
+
+def greedy_cover(indptr, indices, weights, costs=None):
+    """
+    lazy greedy weighted set cover
+
+    Repeatedly picks the candidate with the largest uncovered target weight per unit cost.
+    As the gain of a candidate can only shrink, gains are kept in a heap and only the top one
+    is brought up to date before it is picked.
+
+    Args:
+    indptr, indices: CSR incidence matrix from incidence().
+    weights: (t,) array with the weight of each target.
+    costs: (m,) array with the cost of each candidate. Default 1 each.
+
+    Returns:
+    selected: sorted array with the indices of the picked candidates. Targets no candidate
+        covers are left uncovered.
+
+    """
+    m = len(indptr) - 1
+    weights = np.asarray(weights, dtype=float)
+    costs = np.ones(m) if costs is None else np.asarray(costs, dtype=float)
+    covered = np.zeros(len(weights), dtype=bool)
+
+    rows = np.repeat(np.arange(m), np.diff(indptr))
+    gains = np.bincount(rows, weights=weights[indices], minlength=m) / costs
+    heap = [(-g, i) for i, g in enumerate(gains.tolist()) if g > 0]
+    heapq.heapify(heap)
+
+    selected = []
+    while heap:
+        _, i = heapq.heappop(heap)
+        cols = indices[indptr[i]:indptr[i + 1]]
+        free = cols[~covered[cols]]
+        if not free.size:
+            continue
+        gain = weights[free].sum() / costs[i]
+        if heap and gain < -heap[0][0]:
+            # stale, some of its targets were covered since: put it back with its current gain
+            heapq.heappush(heap, (-gain, i))
+            continue
+        selected.append(i)
+        covered[free] = True
+    return np.array(sorted(selected), dtype=np.int64)
+
+
+def placeSensorCover(xy, rng=20, fov=10, step=None, spacing=None):
+    """
+    coverage optimal placement of sensors along an outline, as a greedy set cover
+
+    Args:
+    xy: numpy array containing the line segments for the outline.
+    rng: range of the sensor. Default 20.
+    fov: fov of the sensor in degrees. Default 10.
+    step: spacing of the candidate poses. Default rng/8.
+    spacing: length of the coverage targets. Default rng/16.
+
+    Returns:
+    (origins, headings): (n, 2) numpy arrays with the picked sensor positions and unit
+        heading vectors, in the order they come along the outline.
+
+    """
+    origins, headings = candidate_poses(xy, step or rng / 8.0)
+    targets, weights = coverage_targets(xy, spacing or rng / 16.0)
+    indptr, indices = incidence(origins, headings, targets, rng, fov)
+    selected = greedy_cover(indptr, indices, weights)
+    return origins[selected], headings[selected]
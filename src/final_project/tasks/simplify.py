@@ -0,0 +1,174 @@
+"""
+outline simplification before the placement
+
+Densely digitized outlines (a vertex every few centimetres) cost the placement a walk over every
+vertex, while a sensor with a range of hundreds of metres does not see the detail. The rings are
+simplified with Douglas-Peucker to a tolerance derived from the sensor range, with numpy: every
+pass finds the farthest vertex of all the open spans at once.
+
+The tolerance is rounded down to a power of two metres, so sensors whose ranges fall in the same
+power of two band (radars of 200 & 250 m) share one simplified outline, while those of another band
+get their own: the default radar (2 m) & camera (0.5 m) do not share. The simplified rings are kept in
+the placement cache keyed by the projected outline & the tolerance, where the runs of every sensor of
+the band at a site find them. The vertex counts before & after, and the coverage of the placement
+measured on the original outline against the simplified one (sampled every CHECK_SPACING metres),
+are recorded as metrics.
+"""
+from math import floor, log2
+
+import numpy as np
+
+from final_project.tasks import metrics
+from final_project.tasks.placement_cache import content_key
+
+# version of the simplification, part of the cache keys. bump it whenever the rings returned change
+SIMPLIFY_VERSION = 1
+
+# tolerance as a fraction of the sensor range, before rounding down to a power of two
+TOLERANCE_FRACTION = 0.01
+
+# sample spacing of the coverage check in metres, that of coverage.coverage_sampled. it is independent of
+# the tolerance: the same outline is sampled the same way whatever the sensor, and both rings are sampled
+# alike, so the sampling error mostly cancels out of the difference between them
+CHECK_SPACING = 1.0
+
+
+def tolerance_for(rng, fraction=TOLERANCE_FRACTION):
+    """
+    simplification tolerance for a sensor range
+
+    Args:
+    rng: range of the sensor in metres.
+    fraction: tolerance as a fraction of rng. Default TOLERANCE_FRACTION.
+
+    Returns:
+    tolerance: the largest power of two metres at most rng * fraction, 0.0 for no simplification.
+        Only ranges within a factor of two of each other can share it, e.g. 2.0 for ranges of
+        200 to 399 m but 0.5 for 50 m.
+
+    """
+    limit = rng * fraction
+    if limit <= 0:
+        return 0.0
+    return 2.0 ** floor(log2(limit))
+
+
+def douglas_peucker(xy, tolerance):
+    """
+    simplify a closed ring with Douglas-Peucker
+
+    Every span between two kept vertices is split at its vertex farthest from the segment joining
+    them, until no vertex is farther than tolerance. All the spans are split in one numpy pass.
+
+    Args:
+    xy: (n, 2) or (n, 3) numpy array with the closed ring, only x & y are measured.
+    tolerance: largest distance of a dropped vertex to the simplified ring.
+
+    Returns:
+    xy: the kept vertices, first & last included. The ring itself if fewer than 4 would be left.
+
+    """
+    n = len(xy)
+    if n < 5 or tolerance <= 0:
+        return xy
+    p = np.asarray(xy, dtype=float)[:, :2]
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    start = np.array([0])
+    end = np.array([n - 1])
+    while len(start):
+        inner = end - start - 1
+        start, end, inner = start[inner > 0], end[inner > 0], inner[inner > 0]
+        if not len(start):
+            break
+        # the inner vertices of every span, flattened, with the span they belong to
+        offsets = np.cumsum(inner) - inner
+        span = np.repeat(np.arange(len(start)), inner)
+        idx = np.arange(inner.sum()) - offsets[span] + start[span] + 1
+        a = p[start[span]]
+        d = p[end[span]] - a
+        q = p[idx] - a
+        # distance to the segment, or to its start when it has no length (the first span of a ring)
+        length2 = (d * d).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.where(length2 > 0, np.clip((q * d).sum(axis=1) / length2, 0.0, 1.0), 0.0)
+        dist = np.hypot(*(q - d * t[:, None]).T)
+
+        # the first farthest vertex of each span
+        dmax = np.maximum.reduceat(dist, offsets)
+        farthest = np.minimum.reduceat(np.where(dist == dmax[span], np.arange(len(dist)), len(dist)), offsets)
+        split = dmax > tolerance
+        far = idx[farthest[split]]
+        keep[far] = True
+        start, end = np.concatenate([start[split], far]), np.concatenate([far, end[split]])
+
+    if np.count_nonzero(keep) < 4:
+        return xy
+    return xy[keep]
+
+
+def _pack_rings(rings):
+    header = np.array([len(rings), rings[0].shape[1] if rings else 2] + [len(xy) for xy in rings], dtype='<i8')
+    return header.tobytes() + b''.join(np.ascontiguousarray(xy, dtype='<f8').tobytes() for xy in rings)
+
+
+def _unpack_rings(data):
+    count, dims = np.frombuffer(data, dtype='<i8', count=2)
+    lengths = np.frombuffer(data, dtype='<i8', count=count, offset=16)
+    coords = np.frombuffer(data, dtype='<f8', offset=16 + 8 * int(count)).reshape(-1, int(dims))
+    return np.split(coords, np.cumsum(lengths)[:-1]) if count else []
+
+
+def simplify_rings(xy, tolerance, cache=None):
+    """
+    simplify the rings of an outline, see douglas_peucker
+
+    Args:
+    xy: list of (n, 2) numpy arrays with the rings of the projected outline.
+    tolerance: tolerance in metres, see tolerance_for.
+    cache: placement cache (see placement_cache) the simplified rings are looked up in & added to,
+        keyed by the outline & the tolerance. Default None, no cache.
+
+    Returns:
+    rings: list with the simplified rings.
+
+    """
+    with metrics.timer('simplify') as counts:
+        key = None
+        if cache is not None:
+            key = content_key(xy, 'simplify', tolerance, SIMPLIFY_VERSION)
+            data = cache.get(key)
+            counts['hits' if data is not None else 'misses'] = 1
+            if data is not None:
+                rings = _unpack_rings(data)
+                counts.update(vertices=sum(len(ring) for ring in xy), kept=sum(len(ring) for ring in rings))
+                return rings
+
+        rings = [douglas_peucker(ring, tolerance) for ring in xy]
+        if key is not None:
+            cache.set(key, _pack_rings(rings))
+        counts.update(vertices=sum(len(ring) for ring in xy), kept=sum(len(ring) for ring in rings))
+    return rings
+
+
+def record_coverage_difference(xy, rings, wedges, spacing=CHECK_SPACING):
+    """
+    record the coverage of a placement on the simplified rings & on the original ones
+
+    The coverage difference is covered_length / length on the original outline against
+    simplified_covered_length / simplified_length on the simplified one, in the 'simplify.check' stage.
+
+    Args:
+    xy: list of (n, 2) numpy arrays with the original rings.
+    rings: the simplified rings the sensors were placed along.
+    wedges: (n, k, 2) numpy array with the vertex rings of the wedges placed.
+    spacing: sample spacing in metres, see coverage.coverage_sampled. Default CHECK_SPACING.
+
+    """
+    from final_project.tasks.coverage import sampled_coverage
+
+    with metrics.timer('simplify.check') as counts:
+        length, covered = sampled_coverage(xy, wedges, spacing)
+        simplified_length, simplified_covered = sampled_coverage(rings, wedges, spacing)
+        counts.update(length=length, covered_length=covered, simplified_length=simplified_length,
+                      simplified_covered_length=simplified_covered)
@@ -0,0 +1,79 @@
+from math import floor
+
+
+class GridIndex(object):
+    """
+    uniform grid index over axis aligned bounding boxes
+
+    Each box is bucketed under every grid cell it overlaps, so an insert only touches
+    the cells under the box and a query only visits the buckets under the query box.
+    Query results come back in insertion order, so iterating over them visits items in
+    the same order as a scan over the full list would.
+
+    Args:
+    cell_size: edge length of a grid cell, in the units of the indexed coordinates.
+
+    """
+
+    def __init__(self, cell_size):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive, got {}".format(cell_size))
+        self.cell_size = float(cell_size)
+        self._cells = {}  # (col, row) -> list of box indices
+        self._boxes = []  # list of (xmin, ymin, xmax, ymax)
+
+    def __len__(self):
+        return len(self._boxes)
+
+    def _cell_range(self, xmin, ymin, xmax, ymax):
+        c = self.cell_size
+        return int(floor(xmin / c)), int(floor(ymin / c)), int(floor(xmax / c)), int(floor(ymax / c))
+
+    def insert(self, bbox):
+        """
+        add a bounding box to the index
+
+        Args:
+        bbox: (xmin, ymin, xmax, ymax) tuple, e.g. the extent of a GEOS geometry.
+
+        Returns:
+        idx: integer index of the box, i.e. its position in insertion order.
+
+        """
+        idx = len(self._boxes)
+        self._boxes.append(tuple(bbox))
+        c0, r0, c1, r1 = self._cell_range(*bbox)
+        for c in range(c0, c1 + 1):
+            for r in range(r0, r1 + 1):
+                self._cells.setdefault((c, r), []).append(idx)
+        return idx
+
+    def query(self, bbox):
+        """
+        find the boxes overlapping a bounding box
+
+        Args:
+        bbox: (xmin, ymin, xmax, ymax) tuple to search with. Touching boxes count as overlapping.
+
+        Returns:
+        hits: sorted list of the indices of the overlapping boxes.
+
+        """
+        xmin, ymin, xmax, ymax = bbox
+        c0, r0, c1, r1 = self._cell_range(xmin, ymin, xmax, ymax)
+        cells = self._cells
+        found = set()
+        for c in range(c0, c1 + 1):
+            for r in range(r0, r1 + 1):
+                bucket = cells.get((c, r))
+                if bucket:
+                    found.update(bucket)
+
+        boxes = self._boxes
+        hits = []
+        for k in found:
+            b = boxes[k]
+            if b[0] <= xmax and b[2] >= xmin and b[1] <= ymax and b[3] >= ymin:
+                hits.append(k)
+        hits.sort()
+        return hits
@@ -0,0 +1,144 @@
+"""
+z/x/y map tiles of outlines & placements, clipped & simplified with numpy
+
+Tiles are the usual web mercator (slippy map) tiles. Each ring is clipped to the tile, grown
+by a small buffer so polygon edges do not show at the tile seams, then snapped to a grid of
+EXTENT x EXTENT cells over the tile, dropping the vertices that fall in the cell of the one
+before. At low zooms a wedge or a small site collapses to a few cells and is dropped whole, so
+the size of a tile stays bounded whatever the number of sites under it.
+"""
+from math import atan, degrees, pi, sinh
+
+import numpy as np
+
+EXTENT = 4096  # grid cells per tile side the vertices are snapped to, as in Mapbox Vector Tiles
+BUFFER = 64  # cells the tile is grown by before clipping
+MAX_ZOOM = 24
+
+
+def tile_bounds(z, x, y, buffer=0):
+    """
+    lon-lat bounds of a tile
+
+    Args:
+    z, x, y: zoom & column, row of the tile, the row counted from the north.
+    buffer: cells (of EXTENT per tile side) to grow the tile by. Default 0.
+
+    Returns:
+    (west, south, east, north): bounds in degrees.
+
+    """
+    n = 2 ** z
+    pad = buffer / EXTENT
+
+    def lat(row):
+        return degrees(atan(sinh(pi * (1 - 2 * row / n))))
+
+    return ((x - pad) / n * 360.0 - 180.0, lat(y + 1 + pad), (x + 1 + pad) / n * 360.0 - 180.0, lat(y - pad))
+
+
+def _clip_edge(xy, axis, value, keep_above):
+    """one Sutherland-Hodgman pass: the closed ring xy cut by the line xy[:, axis] == value"""
+    inside = xy[:, axis] >= value if keep_above else xy[:, axis] <= value
+    a, b = xy[:-1], xy[1:]
+    ia, ib = inside[:-1], inside[1:]
+    # every edge a -> b adds the crossing point when it crosses the line, then b when b is inside.
+    # the crossings of the edges along the line are nan, and never kept
+    out = np.empty((len(a), 2, 2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[:, 0] = a + (b - a) * ((value - a[:, axis]) / (b[:, axis] - a[:, axis]))[:, None]
+    out[:, 0, axis] = value
+    out[:, 1] = b
+    keep = np.stack([ia != ib, ib], axis=1)
+    points = out[keep]
+    if not len(points):
+        return points
+    return np.concatenate([points, points[:1]])
+
+
+def clip_ring(xy, bounds):
+    """
+    clip a closed ring to a box
+
+    Parts of a concave ring on either side of the box are joined along its edges, which draws
+    the same once filled.
+
+    Args:
+    xy: (n, 2) numpy array with the closed ring.
+    bounds: (xmin, ymin, xmax, ymax) box.
+
+    Returns:
+    xy: the clipped closed ring, empty if the ring is outside the box.
+
+    """
+    xmin, ymin, xmax, ymax = bounds
+    lo = xy.min(axis=0)
+    hi = xy.max(axis=0)
+    if lo[0] >= xmin and lo[1] >= ymin and hi[0] <= xmax and hi[1] <= ymax:
+        return xy
+    if hi[0] < xmin or hi[1] < ymin or lo[0] > xmax or lo[1] > ymax:
+        return xy[:0]
+    for axis, value, keep_above in ((0, xmin, True), (0, xmax, False), (1, ymin, True), (1, ymax, False)):
+        xy = _clip_edge(xy, axis, value, keep_above)
+        if not len(xy):
+            break
+    return xy
+
+
+def snap_ring(xy, bounds, extent=EXTENT):
+    """
+    snap a ring to a grid of extent x extent cells over bounds
+
+    Returns:
+    xy: the ring with the vertices at the lower corner of their cell, without the vertices in the
+        same cell as the one before. Empty if fewer than 3 distinct cells are left.
+
+    """
+    xmin, ymin, xmax, ymax = bounds
+    size = np.array([(xmax - xmin) / extent, (ymax - ymin) / extent])
+    cells = np.floor((xy - (xmin, ymin)) / size)
+    keep = np.ones(len(cells), dtype=bool)
+    keep[1:] = (cells[1:] != cells[:-1]).any(axis=1)
+    cells = cells[keep]
+    if (cells[-1] != cells[0]).any():
+        # the closing vertex fell in the cell of the one before
+        cells = np.concatenate([cells, cells[:1]])
+    if len(cells) < 4:
+        return xy[:0]
+    return cells * size + (xmin, ymin)
+
+
+def tile_polygons(polygons, z, x, y):
+    """
+    polygons clipped to a tile & simplified for its zoom
+
+    Args:
+    polygons: list of polygons, each a list of (n, 2) lon-lat vertex arrays, exterior ring first.
+    z, x, y: the tile.
+
+    Returns:
+    polygons: the polygons left in the tile, in the same layout. Holes that collapse are dropped,
+        and so are polygons whose exterior ring does.
+
+    """
+    clip = tile_bounds(z, x, y, BUFFER)
+    grid = tile_bounds(z, x, y)
+    out = []
+    for rings in polygons:
+        parts = []
+        for i, xy in enumerate(rings):
+            xy = clip_ring(xy, clip)
+            if len(xy):
+                xy = snap_ring(xy, grid)
+            if len(xy):
+                parts.append(xy)
+            elif i == 0:
+                break
+        if parts:
+            out.append(parts)
+    return out
+
+
+def tile_coordinates(polygons):
+    """GeoJSON MultiPolygon coordinates of tile_polygons, rounded to the 7 decimals (~1 cm) that matter"""
+    return [[np.round(xy, 7).tolist() for xy in rings] for rings in polygons]
@@ -0,0 +1,70 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from place_sensors.models import SensorPlacements
+
+from final_project.tasks.coverage import METHODS, evaluate_coverage
+from final_project.tasks.projection import PROJECTIONS
+
+
+def _evaluate(pair, **kwargs):
+    return evaluate_coverage(*pair, **kwargs)
+
+
+class Command(BaseCommand):
+    """ Command to evaluate the coverage of the sensor placements"""
+
+    help = "evaluate the coverage of the sensor placements & store the metrics with each placement"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--method", choices=METHODS, default='exact',
+                            help="intersect the outline with the wedges, or sample points along it")
+        parser.add_argument("--spacing", type=float, default=1.0, help="sample spacing in metres for --method sample")
+        parser.add_argument("--projection", choices=PROJECTIONS, default='utm',
+                            help="local projection the lengths are measured in")
+        parser.add_argument("--missing", action="store_true", help="only evaluate the placements without metrics")
+        parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                            help="number of placements to evaluate in parallel, defaults to the cpu count")
+        parser.add_argument("--batch-size", type=int, default=500, help="number of rows per db write")
+
+    def handle(self, *args, **options):
+        placements = SensorPlacements.objects.select_related('site', 'sensor').order_by('id')
+        if options['missing']:
+            placements = placements.filter(coverage__isnull=True)
+
+        evaluate = partial(_evaluate, projection=options['projection'], method=options['method'],
+                           spacing=options['spacing'])
+        batch_size = options['batch_size']
+        workers = options['workers'] or os.cpu_count()
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+        n = 0
+        rows = placements.iterator()
+        try:
+            # evaluate & write the placements a batch at a time
+            for batch in iter(lambda: list(islice(rows, batch_size)), []):
+                pairs = [(p.site.outline, p.wedges()) for p in batch]
+                if pool is None:
+                    results = map(evaluate, pairs)
+                else:
+                    results = pool.map(evaluate, pairs, chunksize=max(1, len(pairs) // (workers * 4)))
+
+                for p, metrics in zip(batch, results):
+                    p.perimeter_length = metrics.length
+                    p.covered_length = metrics.covered_length
+                    p.coverage = metrics.coverage
+                    p.overlap = metrics.overlap
+                    p.sensor_count = metrics.sensors
+                    p.gaps = metrics.gaps
+                with transaction.atomic():
+                    SensorPlacements.objects.bulk_update(batch, SensorPlacements.METRIC_FIELDS, batch_size=batch_size)
+                n += len(batch)
+                self.stdout.write("evaluated {} placements".format(n))
+        finally:
+            if pool is not None:
+                pool.shutdown()
@@ -1,65 +1,159 @@
+import glob
 import os
 
 from django.core.management import BaseCommand
-from django.contrib.gis.gdal import DataSource
-from django.contrib.gis.geos import Polygon, LinearRing
+from django.db import transaction
 
 from pset_utils.io import atomic_write
 
 from place_sensors.models import Locations, Sensors, SensorPlacements
 
+from final_project.tasks import metrics
+from final_project.tasks.geoio import FORMATS, geometry_path, write_geometry
+from final_project.tasks.kml import iter_placemarks
+from final_project.tasks.outline_io import to_geometry
+from final_project.tasks.placement_cache import content_key
+
 
 class Command(BaseCommand):
     """ Command to load site data from KML"""
 
     help = "Load Site Data from kml"
     INPUT_ROOT = os.path.join('data', 'site_wkt/')
+    OUTPUT_ROOT = os.path.join('data', 'sensor_wkt/')
 
     def add_arguments(self, parser):
-        parser.add_argument("file", type=str, help="kml file name")
+        parser.add_argument("file", type=str, help="kml or kmz file name")
         parser.add_argument("-r", "--radar", action="store_true")
         parser.add_argument("-c", "--camera", action="store_true")
+        parser.add_argument("--batch-size", type=int, default=500, help="number of sites per db write")
+        parser.add_argument("--format", choices=FORMATS, default='wkt', help="format of the site outline files")
+        parser.add_argument("--no-files", action="store_true",
+                            help="only load the db, without site outline files (for run_algos --direct)")
+        parser.add_argument("--progress", type=int, default=1000, help="report progress every this many sites")
+        parser.add_argument("--incremental", action="store_true",
+                            help="only add new sites, update changed ones & remove missing ones, instead of reloading all")
+        parser.add_argument("--metrics-file", help="write the stage timings & counts to this Prometheus textfile")
 
     def handle(self, *args, **options):
-        kmlfile = options['file']
-
-        # clear the DBs, as we are loading a new file
-        Locations.objects.all().delete()
-        Sensors.objects.all().delete()
-        SensorPlacements.objects.all().delete()
-
-        # clear all the existing wkt for site polygons and create afresh
-        for fp in os.listdir(self.INPUT_ROOT):
-            file_path = os.path.join(self.INPUT_ROOT, fp)
-            if os.path.isfile(file_path):
-                if not (fp == ".gitkeep"):
-                    os.unlink(file_path)
-        
-        # load the data from kml
-        ds = DataSource(kmlfile)
-        layer = ds[0]
-
-        for feat in layer:
-            site = feat.get('Name')
-            print(site)
-            poly = feat.geom
-            # important: converting from 3D to 2D
-            poly = Polygon(LinearRing([(pt[0], pt[1]) for pt in poly.tuple[0]]), srid=4326)
-            # save the location in the db
-            loc = Locations(name=site, outline=poly)
-            loc.save()
-            # save the site outlines in "Well Known Text" format to serialize them into a file
-            fp = os.path.join(self.INPUT_ROOT,site)
-            with atomic_write(fp, 'w') as f:
-                f.write(poly.wkt)
-
-        # save a default Radar Sensor. Later do this in a load_sensors command
-        s = Sensors(stype='Radar', name='vendor1', fov=45, rng=200)
-        s.save()
-
-        # save a default Camera Sensor. Later do this in a load_sensors command
-        s = Sensors(stype='Camera', name='vendor1', fov=10, rng=50)
-        s.save()
-
-
+        metrics.reset()
+        with metrics.timer('load_sites'):
+            self.load(**options)
+        metrics.report(options['metrics_file'], labels={'command': 'load_sites'})
 
+    @transaction.atomic
+    def load(self, **options):
+        kmlfile = options['file']
+        batch_size = options['batch_size']
+        fmt = options['format']
+        incremental = options['incremental']
+
+        if incremental:
+            # diff against the sites already loaded, by name & outline hash
+            existing = {name: (pk, digest) for pk, name, digest in
+                        Locations.objects.values_list('id', 'name', 'outline_hash')}
+        else:
+            # clear the DBs, as we are loading a new file
+            Locations.objects.all().delete()
+            Sensors.objects.all().delete()
+            SensorPlacements.objects.all().delete()
+
+            # clear all the existing wkt for site polygons and create afresh. the placement files
+            # made from the old outlines go too, unchanged sites are placed again from the placement cache
+            for root in (self.INPUT_ROOT, self.OUTPUT_ROOT):
+                for fp in os.listdir(root):
+                    file_path = os.path.join(root, fp)
+                    if os.path.isfile(file_path):
+                        if not (fp == ".gitkeep"):
+                            os.unlink(file_path)
+            existing = {}
+
+        # stream the sites from the kml, one placemark at a time
+        created = []  # new sites, written to the db in batches of batch_size
+        updated = []  # sites whose outline changed, also written in batches
+        seen = set()
+        n = n_created = n_updated = 0
+        for site, polygons in metrics.timed_iter('load_sites.parse', iter_placemarks(kmlfile)):
+            if incremental and site in seen:
+                self.stderr.write("skipping duplicate site {}".format(site))
+                continue
+            seen.add(site)
+
+            # important: converting from 3D to 2D, the parsed coordinates are already lon-lat only.
+            # every ring is kept, holes & the parts of multi part sites included
+            with metrics.timer('load_sites.geometry') as counts:
+                poly = to_geometry(polygons, srid=4326)
+                digest = content_key([xy for rings in polygons for xy in rings])
+                counts.update(sites=1, vertices=sum(len(xy) for rings in polygons for xy in rings))
+            n += 1
+            if n % options['progress'] == 0:
+                self.stdout.write("loaded {} sites".format(n))
+
+            old = existing.get(site)
+            if old is None:
+                # queue the location for the db
+                created.append(Locations(name=site, outline=poly, outline_hash=digest))
+                n_created += 1
+            elif old[1] != digest:
+                updated.append(Locations(id=old[0], name=site, outline=poly, outline_hash=digest))
+                n_updated += 1
+                self.remove_site_files(site)
+            elif options['no_files'] or os.path.exists(geometry_path(self.INPUT_ROOT, site, fmt)):
+                # unchanged site
+                continue
+
+            if len(created) >= batch_size:
+                self.create_sites(created, batch_size)
+                created = []
+            if len(updated) >= batch_size:
+                self.update_sites(updated, batch_size)
+                updated = []
+            if options['no_files']:
+                continue
+            # save the site outlines in "Well Known Text" (or binary) format to serialize them into a file
+            fp = geometry_path(self.INPUT_ROOT, site, fmt)
+            with metrics.timer('load_sites.file_write', files=1):
+                with atomic_write(fp, 'wb' if fmt == 'wkb' else 'w') as f:
+                    write_geometry(f, poly, fmt)
+        self.create_sites(created, batch_size)
+        self.update_sites(updated, batch_size)
+
+        # sites missing from the kml are removed, with their placements
+        removed = sorted(set(existing) - seen)
+        for i in range(0, len(removed), batch_size):
+            with metrics.timer('load_sites.db_write', deleted=len(removed[i:i + batch_size])):
+                Locations.objects.filter(id__in=[existing[site][0] for site in removed[i:i + batch_size]]).delete()
+        for site in removed:
+            self.remove_site_files(site)
+
+        self.stdout.write("loaded {} sites: {} new, {} changed, {} removed".format(
+            n, n_created, n_updated, len(removed)))
+
+        # save a default Radar & Camera Sensor. Later do this in a load_sensors command
+        Sensors.objects.get_or_create(stype='Radar', name='vendor1', fov=45, rng=200)
+        Sensors.objects.get_or_create(stype='Camera', name='vendor1', fov=10, rng=50)
+
+    def create_sites(self, sites, batch_size):
+        """write the new sites to the db"""
+        if not sites:
+            return
+        with metrics.timer('load_sites.db_write', created=len(sites)):
+            Locations.objects.bulk_create(sites, batch_size=batch_size)
+
+    def update_sites(self, sites, batch_size):
+        """write the changed outlines to the db & drop the placements made from the old ones"""
+        if not sites:
+            return
+        with metrics.timer('load_sites.db_write', updated=len(sites)):
+            Locations.objects.bulk_update(sites, ['outline', 'outline_hash'], batch_size=batch_size)
+            SensorPlacements.objects.filter(site_id__in=[site.id for site in sites]).delete()
+
+    def remove_site_files(self, site):
+        """delete the outline files of a site & the placement files made from them"""
+        paths = [geometry_path(self.INPUT_ROOT, site, fmt) for fmt in FORMATS]
+        # placement files are named {site}_{stype}_{sensor}_{spec}. a site whose name extends this
+        # one may lose its files too, which only costs a re-run from the placement cache
+        paths.extend(glob.glob(os.path.join(glob.escape(self.OUTPUT_ROOT), glob.escape(site) + '_*')))
+        for path in paths:
+            if os.path.isfile(path):
+                os.unlink(path)
@@ -1,55 +1,162 @@
 import os
 
 from luigi import build
-from django.core.management import BaseCommand
-from django.contrib.gis.geos import GEOSGeometry
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
 
-from place_sensors.models import Locations, Sensors, SensorPlacements
+from place_sensors.models import Locations, Sensors, SensorPlacements, placement_digest, poses_digest
 
-from final_project.tasks.cov_algo import PlaceSensorTask
+from final_project.tasks import metrics
+from final_project.tasks.cov_algo import ALGORITHMS, place_sites, run_tasks
+from final_project.tasks.geoio import FORMATS, read_geometry
+from final_project.tasks.luigi_tasks import PlaceSiteTask
+from final_project.tasks.placement_cache import BACKENDS, get_cache
+from final_project.tasks.projection import PROJECTIONS
 
 
 class Command(BaseCommand):
-    """ Command to run the algorithms for a given sensor"""
+    """ Command to run the algorithms for the given sensor types"""
 
     help = "run placement algorithms"
-    OUTPUT_ROOT = os.path.join('data', 'sensor_wkt/')  # path to look for results
 
     def add_arguments(self, parser):
         parser.add_argument("-r", "--radar", action="store_true")
         parser.add_argument("-c", "--camera", action="store_true")
+        parser.add_argument("-t", "--type", action="append", dest="types", default=[],
+                            help="sensor type to run, may be repeated")
+        parser.add_argument("-a", "--all", action="store_true", help="run every sensor type")
+        parser.add_argument("--vectorized", action="store_true", help="use the array based placement")
+        parser.add_argument("--algorithm", choices=ALGORITHMS, default='interval',
+                            help="sensors every rng along the outline, or the fewest sensors covering it")
+        parser.add_argument("--simplify", action="store_true",
+                            help="simplify the outlines to a tolerance derived from each sensor range first")
+        parser.add_argument("--projection", choices=PROJECTIONS, default='utm',
+                            help="local projection picked from each site centroid")
+        parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                            help="number of sites to place in parallel, defaults to the cpu count")
+        parser.add_argument("--pool", action="store_true",
+                            help="run the placements in a process pool instead of through the luigi scheduler")
+        parser.add_argument("--batch-size", type=int, default=500, help="number of rows per db write")
+        parser.add_argument("--direct", action="store_true",
+                            help="place the outlines from the db in memory, without the site & placement files")
+        parser.add_argument("--poses", action="store_true",
+                            help="with --direct, store the packed sensor poses instead of the wedge polygons")
+        parser.add_argument("--format", choices=FORMATS, default='wkt', help="format of the site & placement files")
+        parser.add_argument("--cache", choices=BACKENDS,
+                            help="reuse the placements of unchanged outlines & specs from a disk or django cache")
+        parser.add_argument("--cache-size", type=int, default=512, help="size of the disk cache in MiB")
+        parser.add_argument("--metrics-file", help="write the stage timings & counts to this Prometheus textfile")
 
     def handle(self, *args, **options):
-        # TODO: Need to handle the case in which multiple sensor types are passed
+        metrics.reset()
+        with metrics.timer('run_algos'):
+            self.run(**options)
+        metrics.report(options['metrics_file'], labels={'command': 'run_algos'})
+
+    def run(self, **options):
+        if options['poses'] and not options['direct']:
+            raise CommandError("--poses needs --direct, the site & placement files hold wedges")
+
+        # every sensor (all vendors) of the requested sensor types
+        stypes = set(options['types'])
         if options['radar']:
-            s = Sensors.objects.filter(stype='Radar')
-        elif options['camera']:
-            s = Sensors.objects.filter(stype='Camera')
+            stypes.add('Radar')
+        if options['camera']:
+            stypes.add('Camera')
+
+        if options['all']:
+            sensors = Sensors.objects.all()
+        elif stypes:
+            sensors = Sensors.objects.filter(stype__in=stypes)
         else:
             return
+        sensors = list(sensors.order_by('id'))
+        if not sensors:
+            return
 
-        # delete the existing sensor placements from the db
-        if SensorPlacements.objects.filter(sensor=s[0]):
-            SensorPlacements.objects.filter(sensor=s[0]).delete()
+        specs = [(s.stype, s.name, s.rng, s.fov) for s in sensors]
+        sites = list(Locations.objects.all())
+        cache = get_cache(options['cache'], max_bytes=options['cache_size'] * 2 ** 20)
+        metrics.count('run_algos', sites=len(sites), sensors=len(sensors))
 
-        # create a luigi task list, parameterized by sensors & its specs
-        # note: as sensor specs are significant parameters, if they are changed,
-        # the task would run again. this is as per design
-        task_list = []
-        for site in Locations.objects.all():
-            # TODO: Serialize sensor & site objects and pass them as luigi parameters
-            task_list.append(PlaceSensorTask(site.name, s[0].stype, s[0].rng, s[0].fov))
+        if options['direct']:
+            # pass the outlines from the db straight to the placement & the results straight to the db
+            with metrics.timer('run_algos.place'):
+                results = place_sites([site.outline for site in sites], specs, projection=options['projection'],
+                                      vectorized=options['vectorized'], workers=options['workers'], cache=cache,
+                                      algorithm=options['algorithm'], poses=options['poses'],
+                                      simplify=options['simplify'])
+            placements = {(site.id, s.id): sps
+                          for site, site_placements in zip(sites, results)
+                          for s, sps in zip(sensors, site_placements)}
+        else:
+            # create a luigi task list with one task per site, parameterized by the sensors & their specs.
+            # each site is read & projected once and shared by all the sensors
+            # note: as sensor specs are significant parameters, if they are changed,
+            # the task would run again. this is as per design
+            task_list = [PlaceSiteTask(site.name, specs, vectorized=options['vectorized'],
+                                       projection=options['projection'], fmt=options['format'],
+                                       algorithm=options['algorithm'], simplify=options['simplify'],
+                                       cache=options['cache'] or '', cache_size=options['cache_size'])
+                         for site in sites]
 
-        # run the sensor placement tasks
-        build(task_list, local_scheduler=True)
+            # run the sensor placement tasks. the task stages are only counted with the pool, or with
+            # a single luigi worker: several luigi workers run the tasks in processes of their own
+            with metrics.timer('run_algos.place'):
+                if options['pool']:
+                    run_tasks(task_list, workers=options['workers'])
+                else:
+                    build(task_list, local_scheduler=True, workers=options['workers'])
+            placements = self.read_placements(sites, sensors, task_list, options['format'])
+
+        if cache is not None:
+            cache.evict()
 
         # write the results from each sensor placements in the db
         # TODO: Add db write into luigi tasks? Need to build django support in luigi
-        for site in Locations.objects.all():
-            mpoly_file = os.path.join(self.OUTPUT_ROOT, "{}_{}".format(site, s[0].stype))
-            with open(mpoly_file, 'r') as f:
-                mpoly_wkt = f.read()
-            p = SensorPlacements(site=site, sensor=s[0], placement=GEOSGeometry(mpoly_wkt))
-            p.save()
+        self.save_placements(placements, options['batch_size'])
+
+    def read_placements(self, sites, sensors, tasks, fmt='wkt'):
+        """read the placement files written by the luigi tasks of each site, keyed by (site id, sensor id)"""
+        placements = {}
+        with metrics.timer('run_algos.read', files=len(sites) * len(sensors)):
+            for site, task in zip(sites, tasks):
+                outputs = task.output()
+                for s in sensors:
+                    placements[(site.id, s.id)] = read_geometry(outputs[(s.stype, s.name)].path, fmt)
+        return placements
+
+    def save_placements(self, placements, batch_size):
+        """
+        upsert the placements keyed by (site id, sensor id): update the existing rows & bulk create the new ones
+
+        A placement is a MultiPolygon, or a (data, srs) pair of packed poses from place_sites(poses=True),
+        stored in place of the wedges.
+        """
+        sensor_ids = {sensor_id for site_id, sensor_id in placements}
+        existing = {(p.site_id, p.sensor_id): p
+                    for p in SensorPlacements.objects.filter(sensor__in=sensor_ids).only('id', 'site_id', 'sensor_id')}
 
+        created = []
+        updated = []
+        for (site_id, sensor_id), placement in placements.items():
+            if isinstance(placement, tuple):
+                fields = dict(placement=None, poses=placement[0], pose_srs=placement[1],
+                              placement_hash=poses_digest(*placement))
+            else:
+                fields = dict(placement=placement, poses=None, pose_srs='', placement_hash=placement_digest(placement))
+            p = existing.get((site_id, sensor_id))
+            if p is None:
+                created.append(SensorPlacements(site_id=site_id, sensor_id=sensor_id, **fields))
+            else:
+                for field, value in fields.items():
+                    setattr(p, field, value)
+                # the coverage metrics were for the old placement
+                for field in SensorPlacements.METRIC_FIELDS:
+                    setattr(p, field, None)
+                updated.append(p)
 
+        with metrics.timer('run_algos.db_write', created=len(created), updated=len(updated)), transaction.atomic():
+            SensorPlacements.objects.bulk_update(updated, ('placement', 'poses', 'pose_srs', 'placement_hash') +
+                                                 SensorPlacements.METRIC_FIELDS, batch_size=batch_size)
+            SensorPlacements.objects.bulk_create(created, batch_size=batch_size)
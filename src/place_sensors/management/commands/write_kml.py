@@ -1,10 +1,65 @@
+import hashlib
 import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
 
 from django.core.management import BaseCommand
+from django.db import transaction
 from django.template import loader
 
 from place_sensors.models import SensorPlacements
 
+from final_project.tasks import metrics
+from final_project.tasks.kml import create_kml, write_site_kml
+
+# version of the kml output, part of the export hashes. bump it whenever the files written change
+KML_VERSION = 1
+
+
+def export_hash(sp, kmz=False, template=False):
+    """sha256 of everything the kml file of a placement is made from, see SensorPlacements.kml_hash"""
+    h = hashlib.sha256()
+    h.update(repr((KML_VERSION, kmz, template, sp.site.name, sp.sensor.stype, sp.sensor.name,
+                   sp.sensor.rng, sp.sensor.fov)).encode())
+    if sp.placement is not None:
+        h.update(bytes(sp.placement.ewkb))
+    else:
+        h.update(bytes(sp.poses))
+        h.update(sp.pose_srs.encode())
+    h.update(bytes(sp.site.outline.ewkb))
+    return h.hexdigest()
+
+
+def export_placement(path, site, stype, mpoly, outline, kmz=False, template=False):
+    """write the kml (or kmz) file of the placement of one sensor at a site"""
+    if not template:
+        # format the placemarks straight from the wkb into the file, one at a time
+        with metrics.timer('write_kml.stream', files=1) as counts:
+            with create_kml(path, kmz) as f:
+                counts['placemarks'] = write_site_kml(f, site, stype, mpoly, outline)
+        return
+
+    # template reference:
+    # https://developers.google.com/kml/documentation/kmlreference
+    # one placemark per part of the outline, each with its holes
+    outline_parts = list(outline) if outline.geom_type == 'MultiPolygon' else [outline]
+
+    with metrics.timer('write_kml.render', placemarks=len(mpoly) + len(outline_parts)):
+        k = loader.render_to_string('site.kml',
+                                    {'site_name': site, 'sensor_name': stype, 'poly': mpoly,
+                                     'outline': outline, 'outline_parts': outline_parts})
+
+    with metrics.timer('write_kml.file_write', files=1, bytes=len(k)):
+        with create_kml(path, kmz) as f:
+            f.write(k)
+
+
+def _export(job, **kwargs):
+    export_placement(*job, **kwargs)
+    # the worker's stage counts go back to the parent
+    return metrics.collect()
+
 
 class Command(BaseCommand):
     """ Command to write the sensor coverage to kml """
@@ -13,28 +68,85 @@ class Command(BaseCommand):
     OUTPUT_ROOT = os.path.join('data', 'sensor_kml/')  # path to look for results
 
     def add_arguments(self, parser):
-        pass
+        parser.add_argument("--kmz", action="store_true", help="write compressed kmz files instead of kml")
+        parser.add_argument("--template", action="store_true",
+                            help="render the site.kml template, e.g. a customized one, instead of the streaming writer")
+        parser.add_argument("--force", action="store_true",
+                            help="write every placement, not only the ones changed since the last export "
+                                 "(e.g. after editing the template)")
+        parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                            help="number of files to write in parallel, defaults to the cpu count")
+        parser.add_argument("--batch-size", type=int, default=500, help="number of placements per db read & write")
+        parser.add_argument("--metrics-file", help="write the stage timings & counts to this Prometheus textfile")
 
     def handle(self, *args, **options):
-        # clear all the existing kmls
-        for fp in os.listdir(self.OUTPUT_ROOT):
-            file_path = os.path.join(self.OUTPUT_ROOT, fp)
-            if os.path.isfile(file_path):
-                if not (fp == ".gitkeep"):
-                    os.unlink(file_path)
+        metrics.reset()
+        with metrics.timer('write_kml'):
+            self.write(kmz=options['kmz'], template=options['template'], force=options['force'],
+                       workers=options['workers'], batch_size=options['batch_size'])
+        metrics.report(options['metrics_file'], labels={'command': 'write_kml'})
+
+    def write(self, kmz=False, template=False, force=False, workers=None, batch_size=500):
+        """
+        write the files of the placements that changed since the last export, in a process pool
 
-        # template reference:
-        # https://developers.google.com/kml/documentation/kmlreference
-        for sp in SensorPlacements.objects.all():
-            mpoly = sp.placement
-            site = sp.site.name
-            outline = sp.site.outline
-            stype = sp.sensor.stype
+        A placement is written again when the hash of its geometry, site outline, sensor spec &
+        output options differs from the kml_hash stored at its last export, or its file is gone.
+        Files of placements no longer in the db are removed. Files are named after the site, the
+        sensor type & the sensor name, as several sensors (vendors) share a type.
+        """
+        ext = 'kmz' if kmz else 'kml'
+        export = partial(_export, kmz=kmz, template=template)
+        workers = workers or os.cpu_count()
+        # the workers start with no stage counts, not a copy of the parent's
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=metrics.reset) if workers > 1 else None
 
-            mpoly_file = os.path.join(self.OUTPUT_ROOT, "{}_{}.kml".format(site, stype))
-            k = loader.render_to_string('site.kml',
-                                        {'site_name': site, 'sensor_name': stype, 'poly': mpoly, 'outline': outline})
+        expected = set()  # names of the files of the placements in the db
+        n = n_written = 0
+        rows = SensorPlacements.objects.select_related('site', 'sensor').order_by('id').iterator()
+        try:
+            for batch in iter(lambda: list(islice(rows, batch_size)), []):
+                jobs = []
+                changed = []
+                with metrics.timer('write_kml.hash', placements=len(batch)):
+                    for sp in batch:
+                        name = "{}_{}_{}.{}".format(sp.site.name, sp.sensor.stype, sp.sensor.name, ext)
+                        if name in expected:
+                            # two sensors of a type with the same name, the file holds the first
+                            self.stderr.write("skipping {}: {} is written for another placement".format(sp, name))
+                            continue
+                        expected.add(name)
+                        path = os.path.join(self.OUTPUT_ROOT, name)
+                        digest = export_hash(sp, kmz, template)
+                        if not force and digest == sp.kml_hash and os.path.exists(path):
+                            continue
+                        sp.kml_hash = digest
+                        changed.append(sp)
+                        jobs.append((path, sp.site.name, sp.sensor.stype, sp.wedges(), sp.site.outline))
 
-            with open(mpoly_file, 'w') as f:
-                f.write(k)
+                if pool is None:
+                    for job in jobs:
+                        export_placement(*job, kmz=kmz, template=template)
+                else:
+                    for stages in pool.map(export, jobs, chunksize=max(1, len(jobs) // (workers * 4))):
+                        metrics.merge(stages)
+
+                # the hashes are only stored once the files are written
+                with metrics.timer('write_kml.db_write', rows=len(changed)), transaction.atomic():
+                    SensorPlacements.objects.bulk_update(changed, ['kml_hash'], batch_size=batch_size)
+                n += len(batch)
+                n_written += len(changed)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        # remove the files of the placements that are gone, and of the other output format
+        removed = 0
+        for fp in os.listdir(self.OUTPUT_ROOT):
+            file_path = os.path.join(self.OUTPUT_ROOT, fp)
+            if os.path.isfile(file_path) and fp != ".gitkeep" and fp not in expected:
+                os.unlink(file_path)
+                removed += 1
 
+        metrics.count('write_kml', placements=n, written=n_written, removed=removed)
+        self.stdout.write("wrote {} of {} placements, removed {} files".format(n_written, n, removed))
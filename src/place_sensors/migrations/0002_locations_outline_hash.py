@@ -0,0 +1,18 @@
+# Generated by Django 2.2.1 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('place_sensors', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='locations',
+            name='outline_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
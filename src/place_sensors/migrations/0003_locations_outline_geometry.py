@@ -0,0 +1,19 @@
+# Generated by Django 2.2.1 on 2026-10-18 10:00
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('place_sensors', '0002_locations_outline_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='locations',
+            name='outline',
+            field=django.contrib.gis.db.models.fields.GeometryField(srid=4326),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.1 on 2026-10-18 11:00
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('place_sensors', '0003_locations_outline_geometry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensorplacements',
+            name='perimeter_length',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sensorplacements',
+            name='covered_length',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sensorplacements',
+            name='coverage',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sensorplacements',
+            name='overlap',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sensorplacements',
+            name='sensor_count',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sensorplacements',
+            name='gaps',
+            field=django.contrib.gis.db.models.fields.MultiLineStringField(blank=True, null=True, srid=4326),
+        ),
+    ]
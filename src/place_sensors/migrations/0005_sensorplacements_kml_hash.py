@@ -0,0 +1,18 @@
+# Generated by Django 2.2.1 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('place_sensors', '0004_sensorplacements_coverage_metrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensorplacements',
+            name='kml_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
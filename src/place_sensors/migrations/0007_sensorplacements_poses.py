@@ -0,0 +1,29 @@
+# Generated by Django 2.2.1 on 2026-10-18 18:00
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('place_sensors', '0006_sensorplacements_placement_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensorplacements',
+            name='pose_srs',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='sensorplacements',
+            name='poses',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='sensorplacements',
+            name='placement',
+            field=django.contrib.gis.db.models.fields.MultiPolygonField(blank=True, null=True, srid=4326),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.1 on 2026-10-18 20:00
+
+from django.db import migrations
+
+from final_project.tasks.footprints import polygon_rings
+from final_project.tasks.placement_cache import content_key
+
+
+def rehash_outlines(apps, schema_editor):
+    # the outline hashes as load_sites makes them with the current content_key, so the next
+    # incremental load does not take every site for a changed one
+    Locations = apps.get_model('place_sensors', 'Locations')
+    sites = list(Locations.objects.exclude(outline_hash='').only('id', 'outline'))
+    for site in sites:
+        site.outline_hash = content_key([xy for rings in polygon_rings(site.outline) for xy in rings])
+    Locations.objects.bulk_update(sites, ['outline_hash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('place_sensors', '0007_sensorplacements_poses'),
+    ]
+
+    operations = [
+        migrations.RunPython(rehash_outlines, migrations.RunPython.noop),
+    ]
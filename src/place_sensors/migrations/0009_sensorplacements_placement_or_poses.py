@@ -0,0 +1,17 @@
+# Generated by Django 2.2.1 on 2026-10-18 21:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('place_sensors', '0008_locations_outline_hash_key_version'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='sensorplacements',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('placement__isnull', False), ('poses__isnull', True)), models.Q(('placement__isnull', True), ('poses__isnull', False)), _connector='OR'), name='placement_or_poses'),
+        ),
+    ]
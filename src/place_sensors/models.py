@@ -1,11 +1,29 @@
+import hashlib
+
 from django.contrib.gis.db import models
+from django.contrib.gis.geos import MultiPolygon
+from django.core.exceptions import ValidationError
+
+from final_project.tasks.footprints import polygon_rings
+from final_project.tasks.placement_cache import content_key
+from final_project.tasks.poses import pose_placement, unpack_poses
+
+
+def outline_digest(outline):
+    """content hash of a site outline, as load_sites makes it from the parsed rings, see Locations.outline_hash"""
+    return content_key([xy for rings in polygon_rings(outline) for xy in rings])
 
 
 class Locations(models.Model):
     """Stores the site details & outline fields"""
 
     name = models.CharField(max_length=50)
-    outline = models.PolygonField()
+    outline = models.GeometryField()  # Polygon, with or without holes, or MultiPolygon
+    outline_hash = models.CharField(max_length=64, blank=True, default='')  # sha256 of the outline coordinates
+
+    def save(self, *args, **kwargs):
+        self.outline_hash = outline_digest(self.outline)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -23,16 +41,80 @@ class Sensors(models.Model):
         return '{}({})'.format(self.name, self.stype)
 
 
+def placement_digest(placement):
+    """sha256 of a placement geometry, see SensorPlacements.placement_hash"""
+    return hashlib.sha256(bytes(placement.ewkb)).hexdigest()
+
+
+def poses_digest(poses, srs):
+    """sha256 of packed poses & their projection, see SensorPlacements.placement_hash"""
+    h = hashlib.sha256(bytes(poses))
+    h.update(srs.encode())
+    return h.hexdigest()
+
+
 class SensorPlacements(models.Model):
     """Stores the sensor placement details"""
 
     site = models.ForeignKey(Locations, on_delete=models.CASCADE)  # site
     sensor = models.ForeignKey(Sensors, on_delete=models.CASCADE)  # type of sensor
-    placement = models.MultiPolygonField()  # sensor placement multipolygons
+    placement = models.MultiPolygonField(null=True, blank=True)  # sensor placement multipolygons, unless poses are stored
+    # packed x, y & heading of each sensor (see final_project.tasks.poses) in the local projection pose_srs,
+    # stored instead of the placement by run_algos --poses. the wedges are built from them when needed
+    poses = models.BinaryField(null=True, blank=True)
+    pose_srs = models.CharField(max_length=200, blank=True, default='')  # proj4 string of the local projection
+
+    # coverage metrics of the placement (see final_project.tasks.coverage), set by evaluate_coverage
+    perimeter_length = models.FloatField(null=True, blank=True)  # length of the site outline in metres
+    covered_length = models.FloatField(null=True, blank=True)  # length of the outline covered, in metres
+    coverage = models.FloatField(null=True, blank=True)  # covered length as a percentage of the outline
+    overlap = models.FloatField(null=True, blank=True)  # mean number of sensors covering the covered outline
+    sensor_count = models.IntegerField(null=True, blank=True)  # number of sensors in the placement
+    gaps = models.MultiLineStringField(null=True, blank=True)  # uncovered parts of the outline
+
+    # sha256 of what the kml file of the placement was last written from, see write_kml.export_hash
+    kml_hash = models.CharField(max_length=64, blank=True, default='')
+    # sha256 of the placement, set on save & by run_algos. the map tiles are keyed by it
+    placement_hash = models.CharField(max_length=64, blank=True, default='')
+
+    METRIC_FIELDS = ('perimeter_length', 'covered_length', 'coverage', 'overlap', 'sensor_count', 'gaps')
 
     class Meta:
         unique_together = ('site', 'sensor', )
-    
+        constraints = [
+            # either the wedges or their poses are stored
+            models.CheckConstraint(check=models.Q(placement__isnull=False, poses__isnull=True) |
+                                   models.Q(placement__isnull=True, poses__isnull=False),
+                                   name='placement_or_poses'),
+        ]
+
+    def clean(self):
+        if (self.placement is None) == (self.poses is None):
+            raise ValidationError("either the placement or the poses must be set")
+
+    def save(self, *args, **kwargs):
+        if self.placement is not None:
+            self.placement_hash = placement_digest(self.placement)
+        elif self.poses is not None:
+            self.placement_hash = poses_digest(self.poses, self.pose_srs)
+        else:
+            self.placement_hash = ''
+        super().save(*args, **kwargs)
+
+    def wedges(self):
+        """the placement in lat-long, built from the poses when only they are stored, empty with neither"""
+        if self.placement is not None:
+            return self.placement
+        if self.poses is None:
+            return MultiPolygon([], srid=4326)
+        return pose_placement(bytes(self.poses), self.pose_srs, self.sensor.rng, self.sensor.fov)
+
+    def pose_array(self):
+        """the poses as a numpy record array of x, y & heading, None when only the placement is stored"""
+        if self.poses is None:
+            return None
+        return unpack_poses(bytes(self.poses))
+
     def perimeter(self):
         return self.site.outline
 
@@ -1,7 +1,21 @@
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
 from django.test import TestCase as DJTest
 from django.contrib.gis.geos import GEOSGeometry
 
 from place_sensors.models import Locations, Sensors, SensorPlacements
+from place_sensors import views
+from place_sensors.management.commands import run_algos, write_kml
+
+from final_project.tasks.cov_algo import place_site
+from final_project.tasks.jobs import JobQueue
+from final_project.tasks.kml import iter_placemarks
 
 
 class LocationsTests(DJTest):
@@ -25,3 +39,285 @@ class LocationsTests(DJTest):
         self.assertEqual(s1.outline, self.poly)
         self.assertEqual(s1, "site1")
 
+
+class SavePlacementsTests(DJTest):
+    """run_algos upserts the placements of each site & sensor"""
+
+    wedge = GEOSGeometry("MULTIPOLYGON (((-77.0579 38.8725, -77.0570 38.8730, -77.0571 38.8720, -77.0579 38.8725)))")
+    moved = GEOSGeometry("MULTIPOLYGON (((-77.0547 38.8729, -77.0540 38.8735, -77.0541 38.8722, -77.0547 38.8729)))")
+
+    def setUp(self):
+        self.site = Locations.objects.create(name="site1", outline=LocationsTests.poly)
+        self.radar = Sensors.objects.create(stype='Radar', name='vendor1', fov=45, rng=200)
+
+    def test_upsert(self):
+        key = (self.site.id, self.radar.id)
+        run_algos.Command().save_placements({key: self.wedge}, batch_size=10)
+        first = SensorPlacements.objects.get(site=self.site, sensor=self.radar)
+        self.assertTrue(first.placement.equals(self.wedge))
+
+        run_algos.Command().save_placements({key: self.moved}, batch_size=10)
+        self.assertEqual(SensorPlacements.objects.count(), 1)
+        second = SensorPlacements.objects.get(site=self.site, sensor=self.radar)
+        self.assertEqual(second.id, first.id)
+        self.assertTrue(second.placement.equals(self.moved))
+
+    def test_poses(self):
+        # stored as poses only, the wedges are built on demand
+        key = (self.site.id, self.radar.id)
+        spec = [(self.radar.stype, self.radar.name, self.radar.rng, self.radar.fov)]
+        poses, = place_site(self.site.outline, spec, poses=True)
+        run_algos.Command().save_placements({key: poses}, batch_size=10)
+        p = SensorPlacements.objects.get(site=self.site, sensor=self.radar)
+        self.assertIsNone(p.placement)
+        self.assertEqual(len(p.pose_array()), len(p.wedges()))
+        self.assertTrue(p.wedges().equals_exact(place_site(self.site.outline, spec)[0], 1e-9))
+
+    def test_neither_placement_nor_poses(self):
+        # as left by clearing the placement in the admin, which full_clean turns down
+        p = SensorPlacements(site=self.site, sensor=self.radar)
+        with self.assertRaises(ValidationError):
+            p.full_clean()
+        self.assertTrue(p.wedges().empty)
+
+
+class IncrementalLoadTests(DJTest):
+    """load_sites --incremental only touches the new, changed & removed sites"""
+
+    placemark = "<Placemark><name>{}</name><Polygon><outerBoundaryIs><LinearRing><coordinates>" \
+                "{} 0,0.01,0 0.01,0.01,0 {}</coordinates></LinearRing></outerBoundaryIs></Polygon></Placemark>"
+
+    def load(self, *sites):
+        """load_sites --incremental from a kml of (name, first vertex) sites"""
+        fd, path = tempfile.mkstemp(suffix='.kml')
+        with os.fdopen(fd, 'w') as f:
+            f.write('<kml xmlns="http://www.opengis.net/kml/2.2"><Document>')
+            f.writelines(self.placemark.format(name, start, start) for name, start in sites)
+            f.write('</Document></kml>')
+        try:
+            call_command('load_sites', path, '--incremental', '--no-files', stdout=io.StringIO())
+        finally:
+            os.unlink(path)
+
+    def test_incremental_load(self):
+        self.load(('site1', '0,0,0'), ('site2', '0,0,0'), ('site3', '0,0,0'))
+        ids = dict(Locations.objects.values_list('name', 'id'))
+        radar = Sensors.objects.get(stype='Radar')
+        for site_id in ids.values():
+            SensorPlacements.objects.create(site_id=site_id, sensor=radar, placement=SavePlacementsTests.wedge)
+
+        # site2 moves, site3 goes away & site4 is new
+        self.load(('site1', '0,0,0'), ('site2', '0.001,0,0'), ('site4', '0,0,0'))
+        self.assertEqual(Sensors.objects.count(), 2)
+        self.assertEqual(sorted(Locations.objects.values_list('name', flat=True)), ['site1', 'site2', 'site4'])
+        self.assertEqual(Locations.objects.get(name='site1').id, ids['site1'])
+        self.assertEqual(Locations.objects.get(name='site2').id, ids['site2'])
+        self.assertEqual(Locations.objects.get(name='site2').outline[0][0], (0.001, 0))
+        # only the placement of the unchanged site is left
+        self.assertEqual(list(SensorPlacements.objects.values_list('site_id', flat=True)), [ids['site1']])
+
+
+class EvaluateCoverageTests(DJTest):
+    """evaluate_coverage stores the coverage metrics with each placement"""
+
+    def test_metrics_are_stored(self):
+        site = Locations.objects.create(name="site1", outline=LocationsTests.poly)
+        radar = Sensors.objects.create(stype='Radar', name='vendor1', fov=45, rng=200)
+        SensorPlacements.objects.create(site=site, sensor=radar, placement=SavePlacementsTests.wedge)
+
+        call_command('evaluate_coverage', '--workers', '1', stdout=io.StringIO())
+        p = SensorPlacements.objects.get()
+        self.assertEqual(p.sensor_count, 1)
+        self.assertGreater(p.perimeter_length, 0)
+        self.assertTrue(0 < p.coverage < 100)
+        self.assertFalse(p.gaps.empty)
+
+        # a new placement drops the metrics of the old one
+        run_algos.Command().save_placements({(site.id, radar.id): SavePlacementsTests.moved}, batch_size=10)
+        self.assertIsNone(SensorPlacements.objects.get().coverage)
+
+
+class WriteKmlTests(DJTest):
+    """the streaming kml writer writes the same placemarks as the site.kml template"""
+
+    def write(self, *args):
+        """write_kml into a temporary directory, returns the placemarks of the site1 file"""
+        root = tempfile.mkdtemp()
+        with mock.patch.object(write_kml.Command, 'OUTPUT_ROOT', root):
+            call_command('write_kml', '--workers', '1', '--force', *args, stdout=io.StringIO())
+        name, = os.listdir(root)
+        path = os.path.join(root, name)
+        placemarks = [(site, [[ring.tolist() for ring in rings] for rings in polygons])
+                      for site, polygons in iter_placemarks(path)]
+        os.unlink(path)
+        os.rmdir(root)
+        return name, placemarks
+
+    def test_writer_matches_template(self):
+        site = Locations.objects.create(name="site1", outline=LocationsTests.poly)
+        radar = Sensors.objects.create(stype='Radar', name='vendor1', fov=45, rng=200)
+        SensorPlacements.objects.create(site=site, sensor=radar, placement=SavePlacementsTests.wedge)
+
+        name, streamed = self.write()
+        self.assertEqual(name, 'site1_Radar_vendor1.kml')
+        self.assertEqual([site for site, polygons in streamed], ['site1.Radar.0', 'site1'])
+        self.assertEqual(streamed, self.write('--template')[1])
+
+        name, compressed = self.write('--kmz')
+        self.assertEqual(name, 'site1_Radar_vendor1.kmz')
+        self.assertEqual(compressed, streamed)
+
+    def test_only_changed_placements_are_written(self):
+        site = Locations.objects.create(name="site1", outline=LocationsTests.poly)
+        radar = Sensors.objects.create(stype='Radar', name='vendor1', fov=45, rng=200)
+        camera = Sensors.objects.create(stype='Camera', name='vendor1', fov=10, rng=50)
+        SensorPlacements.objects.create(site=site, sensor=radar, placement=SavePlacementsTests.wedge)
+        SensorPlacements.objects.create(site=site, sensor=camera, placement=SavePlacementsTests.wedge)
+
+        root = tempfile.mkdtemp()
+
+        def export():
+            out = io.StringIO()
+            with mock.patch.object(write_kml.Command, 'OUTPUT_ROOT', root):
+                call_command('write_kml', '--workers', '1', stdout=out)
+            return out.getvalue().strip()
+
+        self.assertEqual(export(), "wrote 2 of 2 placements, removed 0 files")
+        self.assertEqual(export(), "wrote 0 of 2 placements, removed 0 files")
+
+        # a new placement, a changed spec & a deleted placement
+        run_algos.Command().save_placements({(site.id, radar.id): SavePlacementsTests.moved}, batch_size=10)
+        self.assertEqual(export(), "wrote 1 of 2 placements, removed 0 files")
+        Sensors.objects.filter(id=radar.id).update(rng=100)
+        self.assertEqual(export(), "wrote 1 of 2 placements, removed 0 files")
+        SensorPlacements.objects.filter(sensor=camera).delete()
+        self.assertEqual(export(), "wrote 0 of 1 placements, removed 1 files")
+        self.assertEqual(os.listdir(root), ['site1_Radar_vendor1.kml'])
+
+    def test_sensors_of_a_type_get_a_file_each(self):
+        site = Locations.objects.create(name="site1", outline=LocationsTests.poly)
+        for name, placement in (('vendor1', SavePlacementsTests.wedge), ('vendor2', SavePlacementsTests.moved)):
+            radar = Sensors.objects.create(stype='Radar', name=name, fov=45, rng=200)
+            SensorPlacements.objects.create(site=site, sensor=radar, placement=placement)
+
+        root = tempfile.mkdtemp()
+        with mock.patch.object(write_kml.Command, 'OUTPUT_ROOT', root):
+            call_command('write_kml', '--workers', '1', stdout=io.StringIO())
+        self.assertEqual(sorted(os.listdir(root)), ['site1_Radar_vendor1.kml', 'site1_Radar_vendor2.kml'])
+
+
+class PlacementApiTests(DJTest):
+    """outlines submitted to the api are placed in the job queue, once per distinct submission"""
+
+    outline = {'type': 'Polygon', 'coordinates': [[[-77.0579, 38.8725], [-77.0547, 38.8729], [-77.0532, 38.8705],
+                                                   [-77.0555, 38.8688], [-77.0584, 38.8700], [-77.0579, 38.8725]]]}
+
+    def setUp(self):
+        self.queue = JobQueue(workers=1, max_pending=1)
+        patcher = mock.patch.object(views, 'get_queue', return_value=self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.queue.shutdown)
+
+    def submit(self, **data):
+        return self.client.post('/api/placements/', json.dumps(data), content_type='application/json')
+
+    def test_submit_poll_and_fetch(self):
+        camera = Sensors.objects.create(stype='Camera', name='vendor1', fov=10, rng=50)
+        r = self.submit(outline=self.outline, sensor=camera.id, wait=2)
+        self.assertEqual(r.status_code, 200)
+        job = r.json()
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['result']['properties']['sensor'], 'Camera')
+
+        # the same submission gets the same job, and its result straight away
+        again = self.submit(outline=self.outline, sensor=camera.id)
+        self.assertEqual((again.status_code, again.json()['id']), (200, job['id']))
+        self.assertEqual(self.client.get(job['status_url']).json()['status'], 'done')
+        result = self.client.get(job['result_url'])
+        self.assertEqual(result.json()['geometry']['type'], 'MultiPolygon')
+
+    def test_backpressure_and_bad_input(self):
+        # the one pending slot is taken, whether or not the worker is done with anything
+        with mock.patch.object(self.queue, '_pending', self.queue.max_pending):
+            r = self.submit(outline=self.outline, rng=100, fov=45)
+        self.assertEqual(r.status_code, 429)
+        self.assertEqual(r['Retry-After'], '1')
+        self.assertEqual(self.submit(outline='LINESTRING (0 0, 1 1)').status_code, 400)
+        self.assertEqual(self.submit(outline=self.outline, fov=400).status_code, 400)
+        self.assertEqual(self.submit(outline=self.outline, sensor=True).status_code, 400)
+        self.assertEqual(self.submit(outline=self.outline, vectorized='false').status_code, 400)
+
+    def test_malformed_outlines(self):
+        for outline in ({'coordinates': self.outline['coordinates']}, {'type': 'GeometryCollection'},
+                        {'type': 'Polygon', 'coordinates': [[]]}):
+            r = self.submit(outline=outline)
+            self.assertEqual(r.status_code, 400)
+            self.assertIn('error', r.json())
+
+    def test_sensor_limits(self):
+        # a range under PLACEMENT_API_MIN_RNG
+        self.assertEqual(self.submit(outline=self.outline, rng=0.01, fov=45).status_code, 400)
+        # ~1.4 km of outline over 10 m ranges is ~140 sensors
+        with self.settings(PLACEMENT_API_MAX_SENSORS=100):
+            r = self.submit(outline=self.outline, rng=10, fov=45)
+            self.assertEqual(r.status_code, 400)
+            self.assertIn('sensors', r.json()['error'])
+        self.assertEqual(self.client.get('/api/placements/unknown/').status_code, 404)
+
+
+class TileTests(DJTest):
+    """map tiles are served from the cache, with a new ETag only once a site or placement in them changes"""
+
+    tile = '/api/tiles/15/9370/12538.geojson'  # the tile of site1
+
+    def setUp(self):
+        self.site = Locations.objects.create(name="site1", outline=LocationsTests.poly)
+        self.radar = Sensors.objects.create(stype='Radar', name='vendor1', fov=45, rng=200)
+        run_algos.Command().save_placements({(self.site.id, self.radar.id): SavePlacementsTests.wedge}, batch_size=10)
+
+    def test_tile(self):
+        r = self.client.get(self.tile)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r['Content-Type'], 'application/geo+json')
+        features = json.loads(r.content)['features']
+        self.assertEqual([f['properties']['layer'] for f in features], ['site', 'placement'])
+
+        # not modified, then modified once the placement moves
+        self.assertEqual(self.client.get(self.tile, HTTP_IF_NONE_MATCH=r['ETag']).status_code, 304)
+        run_algos.Command().save_placements({(self.site.id, self.radar.id): SavePlacementsTests.moved}, batch_size=10)
+        changed = self.client.get(self.tile, HTTP_IF_NONE_MATCH=r['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], r['ETag'])
+
+    def test_sites_edited_outside_load_sites(self):
+        # e.g. in the admin: save() hashes the outline
+        r = self.client.get(self.tile)
+        self.site.outline = LocationsTests.poly.buffer(0.0001)
+        self.site.save()
+        self.assertTrue(self.site.outline_hash)
+        changed = self.client.get(self.tile, HTTP_IF_NONE_MATCH=r['ETag'])
+        self.assertEqual(changed.status_code, 200)
+
+        # the names drawn are part of the tile too
+        Locations.objects.filter(id=self.site.id).update(name='site2')
+        renamed = self.client.get(self.tile, HTTP_IF_NONE_MATCH=changed['ETag'])
+        self.assertEqual(renamed.status_code, 200)
+        self.assertEqual(json.loads(renamed.content)['features'][0]['properties']['name'], 'site2')
+
+    def test_pose_tiles_follow_the_sensor(self):
+        spec = [(self.radar.stype, self.radar.name, self.radar.rng, self.radar.fov)]
+        poses, = place_site(self.site.outline, spec, poses=True)
+        run_algos.Command().save_placements({(self.site.id, self.radar.id): poses}, batch_size=10)
+        r = self.client.get(self.tile)
+
+        # the wedges are built with the rng of the sensor, so the tile changes with it
+        Sensors.objects.filter(id=self.radar.id).update(rng=100)
+        changed = self.client.get(self.tile, HTTP_IF_NONE_MATCH=r['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.content, r.content)
+
+    def test_placements_only_when_zoomed_in(self):
+        features = json.loads(self.client.get('/api/tiles/11/585/783.geojson').content)['features']
+        self.assertEqual([f['properties']['layer'] for f in features], ['site'])
+        self.assertEqual(self.client.get('/api/tiles/3/9/1.geojson').status_code, 404)
@@ -0,0 +1,11 @@
+from django.urls import path
+
+from place_sensors.views import placement_result_view, placement_status_view, placement_submit_view, tile_view
+
+app_name = "place_sensors"
+urlpatterns = [
+    path("placements/", view=placement_submit_view, name="placement_submit"),
+    path("placements/<slug:job_id>/", view=placement_status_view, name="placement_status"),
+    path("placements/<slug:job_id>/result/", view=placement_result_view, name="placement_result"),
+    path("tiles/<int:z>/<int:x>/<int:y>.geojson", view=tile_view, name="tile"),
+]
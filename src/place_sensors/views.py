@@ -1,3 +1,295 @@
-from django.shortcuts import render
+"""
+JSON API for on-demand placements & map tiles
 
-# Create your views here.
+POST api/placements/ submits an outline & sensor spec, GET api/placements/<id>/ polls the job
+and GET api/placements/<id>/result/ fetches the placement as a GeoJSON Feature. The jobs run in
+the process pool of a JobQueue (final_project.tasks.jobs), never in the request thread, and the
+id of a job is the content hash of what it places, so identical submissions share one job.
+
+GET api/tiles/<z>/<x>/<y>.geojson serves the site outlines & placements in a map tile, clipped &
+simplified for its zoom (final_project.tasks.tiles), from the cache while nothing in it changes.
+"""
+import hashlib
+import json
+import threading
+from math import cos, radians
+
+import numpy as np
+from django.conf import settings
+from django.contrib.gis.geos import GEOSException, Polygon
+from django.core.cache import cache
+from django.db.models import Max, Q
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from place_sensors.models import Locations, Sensors, SensorPlacements
+
+from final_project.tasks.cov_algo import ALGORITHMS, ALGORITHM_VERSION
+from final_project.tasks.footprints import polygon_rings
+from final_project.tasks.jobs import DONE, FAILED, JobQueue, QueueFull, QueueUnavailable, place_outline
+from final_project.tasks.outline_io import parse_geojson, parse_wkt, to_geometry
+from final_project.tasks.placement_cache import DjangoCache, content_key
+from final_project.tasks.poses import pose_placement
+from final_project.tasks.projection import PROJECTIONS
+from final_project.tasks.tiles import BUFFER, MAX_ZOOM, tile_bounds, tile_coordinates, tile_polygons
+
+# version of the tiles, part of their ETags. bump it whenever the tiles served change
+TILE_VERSION = 1
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """the job queue of this process, made on first use from the PLACEMENT_API settings"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(workers=settings.PLACEMENT_API_WORKERS, max_pending=settings.PLACEMENT_API_MAX_PENDING,
+                              store=DjangoCache(timeout=settings.PLACEMENT_API_JOB_TIMEOUT))
+        return _queue
+
+
+def _number(data, name, default, high):
+    value = data.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 < value <= high:
+        raise ValueError("{}: expected a number in (0, {}], got {!r}".format(name, high, value))
+    return value
+
+
+def _perimeter(rings):
+    """rough length in metres of lon-lat rings, with the degrees scaled at the latitude of each edge"""
+    length = 0.0
+    for xy in rings:
+        d = np.diff(xy[:, :2], axis=0)
+        lat = np.radians((xy[1:, 1] + xy[:-1, 1]) / 2)
+        length += np.hypot(d[:, 0] * np.cos(lat), d[:, 1]).sum() * 111320.0
+    return length
+
+
+def parse_submission(data):
+    """
+    job id, outline & arguments of place_outline for a submission
+
+    Args:
+    data: the decoded JSON body, with
+        outline: GeoJSON Polygon or MultiPolygon geometry, or WKT, in lat-long.
+        sensor: id of a Sensors row, or else stype, rng & fov. Default a Radar of 200 m & 45 deg.
+        projection, algorithm, vectorized: see cov_algo.place_site.
+
+    Returns:
+    (key, wkb, sensor, options): content hash of the job, outline as wkb, (stype, rng, fov) spec
+        & dict of the placement options.
+
+    Raises:
+    ValueError: the submission is not valid, the message says why.
+
+    """
+    outline = data.get('outline')
+    if isinstance(outline, dict):
+        polygons = parse_geojson(outline)
+    elif isinstance(outline, str):
+        polygons = parse_wkt(outline)
+    else:
+        raise ValueError("outline: expected a GeoJSON Polygon or MultiPolygon geometry, or WKT")
+    rings = [xy for p in polygons for xy in p]
+    if not rings:
+        raise ValueError("outline: no polygon")
+    vertices = sum(len(xy) for xy in rings)
+    if vertices > settings.PLACEMENT_API_MAX_VERTICES:
+        raise ValueError("outline: {} vertices, at most {} are accepted".format(
+            vertices, settings.PLACEMENT_API_MAX_VERTICES))
+    xy = np.concatenate(rings)
+    if not (np.isfinite(xy).all() and (np.abs(xy[:, 0]) <= 180).all() and (np.abs(xy[:, 1]) <= 90).all()):
+        raise ValueError("outline: expected lon-lat coordinates")
+
+    if 'sensor' in data:
+        pk = data['sensor']
+        sensor = Sensors.objects.filter(pk=pk).values_list('stype', 'rng', 'fov').first() \
+            if isinstance(pk, int) and not isinstance(pk, bool) else None
+        if sensor is None:
+            raise ValueError("sensor: no sensor {!r}".format(pk))
+    else:
+        sensor = (str(data.get('stype', 'Radar')), _number(data, 'rng', 200, 100000), _number(data, 'fov', 45, 360))
+        if sensor[1] < settings.PLACEMENT_API_MIN_RNG:
+            raise ValueError("rng: at least {} m, got {!r}".format(settings.PLACEMENT_API_MIN_RNG, sensor[1]))
+    # about one sensor per rng along the outline
+    count = _perimeter(rings) / max(sensor[1], settings.PLACEMENT_API_MIN_RNG)
+    if count > settings.PLACEMENT_API_MAX_SENSORS:
+        raise ValueError("outline: about {:.0f} sensors of {} m range, at most {} are placed".format(
+            count, sensor[1], settings.PLACEMENT_API_MAX_SENSORS))
+
+    options = {'projection': data.get('projection', 'utm'), 'vectorized': data.get('vectorized', False),
+               'algorithm': data.get('algorithm', 'interval')}
+    if not isinstance(options['vectorized'], bool):
+        raise ValueError("vectorized: expected true or false")
+    if options['projection'] not in PROJECTIONS:
+        raise ValueError("projection: expected one of {}".format(PROJECTIONS))
+    if options['algorithm'] not in ALGORITHMS:
+        raise ValueError("algorithm: expected one of {}".format(ALGORITHMS))
+
+    key = content_key(rings, sensor, options['projection'], options['vectorized'], options['algorithm'],
+                      ALGORITHM_VERSION)
+    return key, bytes(to_geometry(polygons).wkb), sensor, options
+
+
+def _error(status, message, retry_after=None):
+    response = JsonResponse({'error': message}, status=status)
+    if retry_after is not None:
+        response['Retry-After'] = str(retry_after)
+    return response
+
+
+def _job_response(request, record, result=False, status=200):
+    """the record of a job, with the urls to poll it & fetch its result"""
+    body = {k: record[k] for k in ('id', 'status', 'submitted', 'finished', 'seconds', 'error')}
+    body['status_url'] = request.build_absolute_uri(reverse('place_sensors:placement_status', args=[record['id']]))
+    body['result_url'] = request.build_absolute_uri(reverse('place_sensors:placement_result', args=[record['id']]))
+    if result and record['status'] == DONE:
+        body['result'] = record['result']
+    response = JsonResponse(body, status=status)
+    if status == 202:
+        response['Location'] = body['status_url']
+        response['Retry-After'] = '1'
+    return response
+
+
+@csrf_exempt
+@require_POST
+def placement_submit_view(request):
+    """
+    queue a placement, 202 with the job to poll, or 200 with the result if it is already done
+
+    An optional wait (seconds, at most PLACEMENT_API_MAX_WAIT) in the body holds the response until
+    the job is done, so small sites come back in one round trip. Past PLACEMENT_API_MAX_PENDING
+    jobs the submission is turned down with a 429, and with a 503 if the pool is down.
+    """
+    try:
+        data = json.loads(request.body.decode('utf-8'))
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object")
+        key, wkb, sensor, options = parse_submission(data)
+        wait = min(float(data.get('wait', 0)), settings.PLACEMENT_API_MAX_WAIT)
+    except (ValueError, TypeError, GEOSException) as e:
+        return _error(400, str(e))
+
+    queue = get_queue()
+    try:
+        record = queue.submit(key, place_outline, wkb, sensor, **options)
+    except QueueFull:
+        return _error(429, "too many placements pending, retry later", retry_after=1)
+    except QueueUnavailable:
+        return _error(503, "placement workers unavailable, retry later", retry_after=5)
+    if wait > 0 and record['status'] not in (DONE, FAILED):
+        record = queue.wait(key, wait)
+    return _job_response(request, record, result=True, status=200 if record['status'] in (DONE, FAILED) else 202)
+
+
+@require_GET
+def placement_status_view(request, job_id):
+    """status of a job, 404 if it is unknown or expired"""
+    record = get_queue().get(job_id)
+    if record is None:
+        return _error(404, "no placement job {}".format(job_id))
+    return _job_response(request, record)
+
+
+@require_GET
+def placement_result_view(request, job_id):
+    """the placement of a job as a GeoJSON Feature, 202 while it runs & 422 if it failed"""
+    record = get_queue().get(job_id)
+    if record is None:
+        return _error(404, "no placement job {}".format(job_id))
+    if record['status'] == FAILED:
+        return _error(422, record['error'])
+    if record['status'] != DONE:
+        return _job_response(request, record, status=202)
+    return JsonResponse(record['result'])
+
+
+def _tile_querysets(z, x, y):
+    """
+    the sites & placements under a tile, placements only from TILES_PLACEMENT_MIN_ZOOM
+
+    Placements stored as poses have no geometry to query: they are taken when the outline of their
+    site comes within the longest sensor range of the tile, and dropped when rendered if no wedge is in it.
+    """
+    bounds = tile_bounds(z, x, y, BUFFER)
+    box = Polygon.from_bbox(bounds)
+    box.srid = 4326
+    sites = Locations.objects.filter(outline__intersects=box).order_by('id')
+    if z < settings.TILES_PLACEMENT_MIN_ZOOM:
+        return sites, SensorPlacements.objects.none()
+
+    # metres to degrees, at the latitude of the tile edge nearest a pole
+    rng = Sensors.objects.aggregate(rng=Max('rng'))['rng'] or 0
+    dy = rng / 111320.0
+    dx = dy / max(cos(radians(min(max(abs(bounds[1]), abs(bounds[3])), 85.0))), 1e-6)
+    near = Polygon.from_bbox((bounds[0] - dx, bounds[1] - dy, bounds[2] + dx, bounds[3] + dy))
+    near.srid = 4326
+    placements = SensorPlacements.objects.filter(
+        Q(placement__intersects=box) | Q(placement__isnull=True, site__outline__intersects=near)).order_by('id')
+    return sites, placements
+
+
+def _feature(fid, polygons, **properties):
+    return {'type': 'Feature', 'id': fid, 'properties': properties,
+            'geometry': {'type': 'MultiPolygon', 'coordinates': tile_coordinates(polygons)}}
+
+
+def render_tile(z, x, y, sites, placements):
+    """GeoJSON FeatureCollection of a tile, as bytes, with a layer property of site or placement"""
+    features = []
+    for pk, name, outline in sites.values_list('id', 'name', 'outline').iterator():
+        polygons = tile_polygons(polygon_rings(outline), z, x, y)
+        if polygons:
+            features.append(_feature('site.{}'.format(pk), polygons, layer='site', name=name))
+    rows = placements.values_list('id', 'site__name', 'sensor__stype', 'placement', 'poses', 'pose_srs',
+                                  'sensor__rng', 'sensor__fov')
+    for pk, site, stype, placement, poses, srs, rng, fov in rows.iterator():
+        if placement is None:
+            if poses is None:
+                continue
+            placement = pose_placement(bytes(poses), srs, rng, fov)
+        polygons = tile_polygons(polygon_rings(placement), z, x, y)
+        if polygons:
+            features.append(_feature('placement.{}'.format(pk), polygons, layer='placement', site=site,
+                                     sensor=stype))
+    return json.dumps({'type': 'FeatureCollection', 'features': features}, separators=(',', ':')).encode()
+
+
+@require_GET
+def tile_view(request, z, x, y):
+    """
+    GeoJSON map tile of the site outlines & placements
+
+    The ETag of a tile is a hash of the ids & content hashes of the rows under it, plus the names
+    rendered with them & the rng & fov the wedges of pose rows are built with. Tiles are cached by it, so a tile is only rendered again,
+    and downloaded again, once a site, placement or sensor in it changed, and the map gets a 304 for
+    the others.
+    """
+    if not (0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return _error(404, "no tile {}/{}/{}".format(z, x, y))
+    sites, placements = _tile_querysets(z, x, y)
+    rows = (list(sites.values_list('id', 'outline_hash', 'name')),
+            list(placements.values_list('id', 'placement_hash', 'site__name', 'sensor__stype', 'sensor__rng',
+                                        'sensor__fov')))
+    digest = hashlib.sha256(repr((TILE_VERSION, z, x, y) + rows).encode()).hexdigest()
+    etag = quote_etag(digest)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        key = 'tile:' + digest
+        body = cache.get(key)
+        if body is None:
+            body = render_tile(z, x, y, sites, placements)
+            cache.set(key, body, settings.TILES_CACHE_TIMEOUT)
+        response = HttpResponse(body, content_type='application/geo+json')
+    response['ETag'] = etag
+    # revalidated on every use, a 304 costs the map the id & hash query only
+    response['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,62 @@
+import numpy as np
+
+from final_project.tasks.cov_algo import placeSensor, placeSensorPoses
+
+# an L shaped fence, 100m east then 30m north then 150m east
+FENCE = np.array([[0.0, 0.0], [100.0, 0.0], [100.0, 30.0], [250.0, 30.0]])
+
+
+def test_poses_restart_at_every_segment():
+    origins, headings = placeSensorPoses(FENCE, rng=50)
+    assert origins.tolist() == [[0, 0], [50, 0], [100, 0], [100, 30], [150, 30], [200, 30]]
+    assert headings.tolist() == [[1, 0], [1, 0], [0, 1], [1, 0], [1, 0], [1, 0]]
+
+
+def test_poses_split_on_turns_carry_spacing_over_vertices():
+    origins, headings = placeSensorPoses(FENCE, rng=50, split_on_turns=True)
+    assert origins.tolist() == [[0, 0], [50, 0], [100, 0], [120, 30], [170, 30], [220, 30]]
+    assert headings[3].tolist() == [1, 0]
+
+
+def test_poses_station_rounding_onto_the_end():
+    # 3 * 0.1 == 0.1 + 0.2, the last station lands exactly on the end of the outline
+    origins, headings = placeSensorPoses(np.array([[0.0, 0.0], [0.1, 0.0], [0.1, 0.2]]), rng=0.1,
+                                         split_on_turns=True)
+    assert len(origins) == 4
+    assert np.allclose(origins[-1], [0.1, 0.2]) and headings[-1].tolist() == [0, 1]
+
+
+def test_poses_skip_small():
+    origins, _ = placeSensorPoses(FENCE, rng=120)
+    assert origins.tolist() == [[0, 0], [100, 0], [100, 30], [220, 30]]
+
+    # the 30m leg is shorter than rng/2, so it does not get a sensor of its own
+    origins, _ = placeSensorPoses(FENCE, rng=80, skip_small=True)
+    assert origins.tolist() == [[0, 0], [80, 0], [100, 30], [180, 30]]
+
+    # and a sensor 10m before the end of its run is dropped
+    origins, _ = placeSensorPoses(FENCE, rng=120, skip_small=True)
+    assert origins.tolist() == [[0, 0], [100, 30], [220, 30]]
+
+
+def test_poses_ignore_repeated_vertices():
+    xy = np.array([[0.0, 0.0], [0.0, 0.0], [40.0, 0.0], [40.0, 0.0]])
+    origins, headings = placeSensorPoses(xy, rng=20)
+    assert origins.tolist() == [[0, 0], [20, 0]]
+
+
+def test_vectorized_placement_builds_one_wedge_per_pose():
+    origins, _ = placeSensorPoses(FENCE, rng=50, split_on_turns=True)
+    sps = placeSensor(FENCE, rng=50, fov=10, split_on_turns=True, vectorized=True)
+    assert sps.geom_type == 'MultiPolygon'
+    assert len(sps) == len(origins)
+    assert [p.exterior_ring[0] for p in sps] == [tuple(o) for o in origins.tolist()]
+
+
+def test_every_ring_is_placed_independently():
+    outer = np.array([[0.0, 0.0], [200.0, 0.0], [200.0, 200.0], [0.0, 200.0], [0.0, 0.0]])
+    hole = np.array([[50.0, 50.0], [150.0, 50.0], [150.0, 150.0], [50.0, 50.0]])
+    for vectorized in (False, True):
+        sps = placeSensor([outer, hole], rng=50, fov=10, vectorized=vectorized)
+        parts = [placeSensor(xy, rng=50, fov=10, vectorized=vectorized) for xy in (outer, hole)]
+        assert [p.wkb for p in sps] == [p.wkb for part in parts for p in part]
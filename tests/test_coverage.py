@@ -0,0 +1,44 @@
+import pytest
+from django.contrib.gis.geos import MultiPolygon, Polygon
+
+from final_project.tasks.coverage import coverage_exact, coverage_sampled, evaluate_coverage
+
+# a 100m square site in metres, with a strip along its south side covered twice & its east side once
+SQUARE = Polygon(((0, 0), (100, 0), (100, 100), (0, 100), (0, 0)))
+SOUTH = Polygon(((-1, -1), (101, -1), (101, 1), (-1, 1), (-1, -1)))
+EAST = Polygon(((99, 10), (101, 10), (101, 60), (99, 60), (99, 10)))
+PLACEMENT = MultiPolygon(SOUTH, SOUTH.clone(), EAST)
+
+
+def test_coverage_exact():
+    metrics = coverage_exact(SQUARE, PLACEMENT)
+    assert metrics.length == 400
+    # the south side & 1m up the east & west sides, twice, plus 50m of the east side
+    assert metrics.covered_length == pytest.approx(152)
+    assert metrics.coverage == pytest.approx(38)
+    assert metrics.overlap == pytest.approx((2 * 102 + 50) / 152)
+    assert metrics.sensors == 3
+    assert metrics.gaps.length == pytest.approx(248)
+
+
+def test_coverage_sampled_agrees_with_exact():
+    exact = coverage_exact(SQUARE, PLACEMENT)
+    sampled = coverage_sampled(SQUARE, PLACEMENT, spacing=0.5)
+    assert sampled.length == pytest.approx(exact.length)
+    assert sampled.covered_length == pytest.approx(exact.covered_length, abs=1)
+    assert sampled.overlap == pytest.approx(exact.overlap, abs=0.01)
+    assert sampled.gaps.length == pytest.approx(exact.gaps.length, abs=1)
+    # 9m of the east side below the east strip, and from the east strip round to the south west corner
+    assert len(sampled.gaps) == 2
+
+
+def test_evaluate_coverage_in_lat_long():
+    pentagon = Polygon(((-77.0579, 38.8725), (-77.0547, 38.8729), (-77.0532, 38.8705),
+                        (-77.0555, 38.8688), (-77.0584, 38.8700), (-77.0579, 38.8725)), srid=4326)
+    metrics = evaluate_coverage(pentagon, MultiPolygon(pentagon.buffer(0.0001), srid=4326))
+    assert metrics.coverage == pytest.approx(100)
+    assert 1000 < metrics.length < 1500
+    assert metrics.gaps.empty and metrics.gaps.srid == 4326
+
+    with pytest.raises(ValueError):
+        evaluate_coverage(pentagon, MultiPolygon([]), method='guess')
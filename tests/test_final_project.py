@@ -1,6 +1,44 @@
+import json
+
+import pytest
 
 from final_project.cli import main
 
+SQUARE = 'POLYGON ((0 0, 1000 0, 1000 1000, 0 1000, 0 0), (400 400, 600 400, 600 600, 400 600, 400 400))'
+PENTAGON = ('POLYGON ((-77.0579 38.8725, -77.0547 38.8729, -77.0532 38.8705, -77.0555 38.8688, -77.0584 38.8700, '
+            '-77.0579 38.8725))')
+
 
 def test_main():
     main([])
+
+
+@pytest.mark.parametrize('options', [['--vectorized'], ['--algorithm', 'cover'], []])
+def test_main_planar(tmpdir, options):
+    path = tmpdir.join('square.wkt')
+    path.write(SQUARE + '\n')
+    out = tmpdir.join('placement.geojson')
+    assert main([str(path), '--planar', '-s', 'camera', '-o', str(out)] + options) == 0
+
+    feature, = json.loads(out.read())['features']
+    assert feature['properties']['name'] == 'square_0'
+    assert feature['properties']['rng'] == 50
+    assert feature['properties']['sensors'] > 0
+
+
+def test_main_lat_long_to_kml(tmpdir):
+    path = tmpdir.join('pentagon.geojson')
+    path.write(json.dumps({'type': 'Feature', 'properties': {'name': 'pentagon'},
+                           'geometry': {'type': 'Polygon', 'coordinates': [[[float(v) for v in p.split()] for p in
+                                        PENTAGON[10:-2].split(', ')]]}}))
+    out = tmpdir.join('placement.kml')
+    assert main([str(path), '--rng', '100', '-o', str(out)]) == 0
+    assert '<name>pentagon.Radar.0</name>' in out.read()
+
+
+def test_main_bad_input(tmpdir):
+    path = tmpdir.join('line.wkt')
+    path.write('LINESTRING (0 0, 1 1)\n')
+    with pytest.raises(SystemExit) as e:
+        main([str(path)])
+    assert e.value.code == 1
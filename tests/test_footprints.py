@@ -0,0 +1,61 @@
+from math import ceil, cos, pi, sin
+
+import numpy as np
+import pytest
+
+from final_project.tasks.footprints import polygon_rings, wedge_bounds, wedge_multipolygon, wedge_polygons, wedge_rings
+
+
+def scalar_wedge(x0, y0, ux, uy, rng, fov):
+    # the wedge as placeSensor used to build it, one vertex at a time
+    t = (fov / 180.0) * pi
+    x = ux * rng
+    y = uy * rng
+    n = ceil(fov / 4)
+    coords = [(x0, y0)]
+    for s in list(range(1, n + 1)) + list(range(-n, 0)):
+        coords.append((x * cos(t / s) - y * sin(t / s) + x0, y * cos(t / s) + x * sin(t / s) + y0))
+    coords.append((x0, y0))
+    return coords
+
+
+def test_wedge_rings_match_scalar_construction():
+    origins = np.array([[500000.0, 4200000.0], [500123.5, 4200456.25], [0.0, 0.0]])
+    headings = np.array([[1.0, 0.0], [0.6, 0.8], [-0.28, 0.96]])
+
+    for rng, fov in ((200, 45), (50, 10)):
+        rings = wedge_rings(origins, headings, rng, fov)
+        assert rings.shape == (3, 2 * ceil(fov / 4) + 2, 2)
+        for ring, (x0, y0), (ux, uy) in zip(rings, origins, headings):
+            assert ring.tolist() == [list(c) for c in scalar_wedge(x0, y0, ux, uy, rng, fov)]
+
+
+def test_wedge_rings_accepts_heading_angles():
+    origins = np.zeros((2, 2))
+    angles = np.array([0.0, pi / 2])
+    vectors = np.array([[1.0, 0.0], [cos(pi / 2), sin(pi / 2)]])
+    np.testing.assert_allclose(wedge_rings(origins, angles, 50, 10, angles=True),
+                               wedge_rings(origins, vectors, 50, 10))
+    # a single vector is shared, never read as two angles
+    np.testing.assert_array_equal(wedge_rings(origins, (0.0, 1.0), 50, 10), wedge_rings(origins, [[0.0, 1.0]], 50, 10))
+    with pytest.raises(ValueError):
+        wedge_rings(origins, angles[:1], 50, 10)
+
+
+def test_wedge_geometries():
+    rings = wedge_rings([[0.0, 0.0], [100.0, 0.0]], ((1.0, 0.0),), 50, 10)
+    polys = wedge_polygons(rings, srid=32618)
+    mpoly = wedge_multipolygon(rings, srid=32618)
+
+    assert [p.geom_type for p in polys] == ['Polygon', 'Polygon']
+    assert polys[1].srid == 32618
+    assert len(mpoly) == 2 and mpoly.srid == 32618
+    assert [list(p.extent) for p in mpoly] == wedge_bounds(rings).tolist()
+    assert mpoly[0].equals_exact(polys[0])
+
+
+def test_polygon_rings_read_back_the_wkb():
+    rings = wedge_rings(np.array([[0.0, 0.0], [5.0, 5.0]]), np.array([[1.0, 0.0]]), 10, 20)
+    polygons = polygon_rings(wedge_multipolygon(rings))
+    assert len(polygons) == 2
+    assert all(len(p) == 1 and np.array_equal(p[0], r) for p, r in zip(polygons, rings))
@@ -0,0 +1,18 @@
+from django.contrib.gis.geos import GEOSGeometry
+
+from final_project.tasks.geoio import FORMATS, geometry_path, read_geometry, write_geometry
+
+OUTLINE = GEOSGeometry("POLYGON ((-77.0579 38.8725, -77.0547 38.8729, -77.0532 38.8705, -77.0579 38.8725))")
+
+
+def test_round_trip(tmpdir):
+    for fmt in FORMATS:
+        path = geometry_path(str(tmpdir), 'site1', fmt)
+        with open(path, 'wb' if fmt == 'wkb' else 'w') as f:
+            write_geometry(f, OUTLINE, fmt)
+        assert read_geometry(path, fmt).equals_exact(OUTLINE, 0)
+
+
+def test_paths_keep_the_wkt_layout():
+    assert geometry_path('data/site_wkt', 'site1') == 'data/site_wkt/site1'
+    assert geometry_path('data/site_wkt', 'site1', 'wkb') == 'data/site_wkt/site1.wkb'
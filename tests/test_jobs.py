@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+
+import pytest
+
+from final_project.tasks.jobs import DONE, FAILED, JobQueue, QueueFull, place_outline
+from final_project.tasks.outline_io import to_geometry, parse_wkt
+
+PENTAGON = ('POLYGON ((-77.0579 38.8725, -77.0547 38.8729, -77.0532 38.8705, -77.0555 38.8688, -77.0584 38.8700, '
+            '-77.0579 38.8725))')
+
+
+def square(x):
+    return x * x
+
+
+def fail():
+    raise ValueError("bad outline")
+
+
+def wait_for(path):
+    """block until the test creates path, to hold a worker busy"""
+    while not os.path.exists(path):
+        time.sleep(0.01)
+    return path
+
+
+class Store(dict):
+    """placement cache interface over a dict"""
+
+    def set(self, key, value):
+        self[key] = value
+
+
+@pytest.fixture
+def queue():
+    q = JobQueue(workers=1, max_pending=2, keep=2, store=Store())
+    yield q
+    q.shutdown()
+
+
+def test_jobs_run_in_the_pool(queue):
+    record = queue.submit('a', square, 3)
+    assert record['id'] == 'a'
+    record = queue.wait('a', 10)
+    assert record['status'] == DONE
+    assert record['result'] == 9
+    assert record['seconds'] >= 0
+    # written through to the store too
+    assert queue.store['job:a']['result'] == 9
+
+
+def test_failures_are_recorded_and_run_again(queue):
+    record = queue.wait(queue.submit('f', fail)['id'], 10)
+    assert record['status'] == FAILED
+    assert record['error'] == "ValueError: bad outline"
+    record = queue.wait(queue.submit('f', square, 2)['id'], 10)
+    assert record['status'] == DONE
+
+
+def test_identical_submissions_share_a_job(queue, tmpdir):
+    gate = str(tmpdir.join('gate'))
+    first = queue.submit('slow', wait_for, gate)
+    second = queue.submit('slow', wait_for, gate)
+    assert second['submitted'] == first['submitted']
+    assert queue.pending() == 1
+    open(gate, 'w').close()
+    assert queue.wait('slow', 10)['status'] == DONE
+    # done jobs are not run again either
+    assert queue.submit('slow', fail)['status'] == DONE
+
+
+def test_backpressure(queue, tmpdir):
+    gate = str(tmpdir.join('gate'))
+    queue.submit('a', wait_for, gate)
+    queue.submit('b', wait_for, gate)
+    with pytest.raises(QueueFull):
+        queue.submit('c', square, 1)
+    open(gate, 'w').close()
+    queue.wait('a', 10)
+    queue.wait('b', 10)
+    assert queue.wait(queue.submit('c', square, 1)['id'], 10)['status'] == DONE
+
+
+def test_old_jobs_are_read_from_the_store(queue):
+    for key in 'abc':
+        queue.wait(queue.submit(key, square, 1)['id'], 10)
+    # only keep=2 finished jobs stay in memory
+    assert 'a' not in queue._jobs
+    assert queue.get('a')['result'] == 1
+    assert JobQueue(store=queue.store).get('c')['status'] == DONE
+    assert JobQueue().get('c') is None
+
+
+def test_pending_jobs_of_another_process_are_run_again(queue):
+    # left pending in the shared store by a web server process that died
+    queue.store['job:orphan'] = {'id': 'orphan', 'status': 'pending', 'submitted': 0, 'finished': None,
+                                 'seconds': None, 'result': None, 'error': None}
+    record = queue.submit('orphan', square, 5)
+    assert record['submitted'] > 0
+    assert queue.wait('orphan', 10)['result'] == 25
+    assert queue.store['job:orphan']['status'] == DONE
+
+    # the results of the others are reused
+    other = JobQueue(workers=1, store=queue.store)
+    try:
+        assert other.submit('orphan', fail)['result'] == 25
+    finally:
+        other.shutdown()
+
+
+def test_concurrent_submissions(queue):
+    records = []
+    threads = [threading.Thread(target=lambda: records.append(queue.submit('x', square, 4))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len({r['submitted'] for r in records}) == 1
+    assert queue.wait('x', 10)['result'] == 16
+
+
+def test_place_outline():
+    feature = place_outline(bytes(to_geometry(parse_wkt(PENTAGON)).wkb), ('Camera', 50, 10), vectorized=True)
+    assert feature['type'] == 'Feature'
+    assert feature['properties']['sensor'] == 'Camera'
+    assert feature['properties']['sensors'] == len(feature['geometry']['coordinates']) > 0
@@ -0,0 +1,87 @@
+import zipfile
+
+import numpy as np
+from django.contrib.gis.geos import LinearRing, MultiPolygon, Polygon
+
+from final_project.tasks.kml import create_kml, format_coordinates, iter_placemarks, parse_coordinates, write_site_kml
+
+KML = """<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2">
+<Document>
+  <Folder>
+    <Placemark>
+      <name>courtyard</name>
+      <Polygon>
+        <outerBoundaryIs><LinearRing><coordinates>
+          0,0,10 4,0,10 4,4,10 0,4,10 0,0,10
+        </coordinates></LinearRing></outerBoundaryIs>
+        <innerBoundaryIs><LinearRing><coordinates>1,1 2,1 2,2 1,1</coordinates></LinearRing></innerBoundaryIs>
+      </Polygon>
+    </Placemark>
+    <Placemark><name>gate</name><Point><coordinates>1,2</coordinates></Point></Placemark>
+    <Placemark>
+      <name>parcels</name>
+      <MultiGeometry>
+        <Polygon><outerBoundaryIs><LinearRing><coordinates>0,0 1,0 1,1 0,0</coordinates></LinearRing></outerBoundaryIs></Polygon>
+        <Polygon><outerBoundaryIs><LinearRing><coordinates>5,5 6,5 6,6 5,5</coordinates></LinearRing></outerBoundaryIs></Polygon>
+      </MultiGeometry>
+    </Placemark>
+  </Folder>
+</Document>
+</kml>
+"""
+
+
+def test_parse_coordinates_drops_altitude_without_copying():
+    xy = parse_coordinates(" 1.5,2,100\n3,4,100 ")
+    assert xy.tolist() == [[1.5, 2], [3, 4]]
+    assert xy.base is not None
+    assert parse_coordinates("1,2 3,4").tolist() == [[1, 2], [3, 4]]
+
+
+def test_iter_placemarks(tmpdir):
+    path = tmpdir.join('sites.kml')
+    path.write(KML)
+    placemarks = list(iter_placemarks(str(path)))
+
+    # the point placemark is skipped
+    assert [name for name, polygons in placemarks] == ['courtyard', 'parcels']
+    courtyard, parcels = placemarks[0][1], placemarks[1][1]
+    assert [len(rings) for rings in courtyard] == [2]
+    assert courtyard[0][0].tolist() == [[0, 0], [4, 0], [4, 4], [0, 4], [0, 0]]
+    assert len(parcels) == 2
+
+
+def test_iter_placemarks_names_unnamed_placemarks(tmpdir):
+    path = tmpdir.join('sites.kml')
+    path.write(KML.replace('<name>courtyard</name>', '').replace('<name>parcels</name>', '<name> </name>'))
+    assert [name for name, polygons in iter_placemarks(str(path))] == ['sites_0', 'sites_1']
+
+
+def test_iter_placemarks_from_kmz(tmpdir):
+    path = str(tmpdir.join('sites.kmz'))
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('doc.kml', KML)
+    assert [name for name, polygons in iter_placemarks(path)] == ['courtyard', 'parcels']
+
+
+def test_format_coordinates_like_geos():
+    ring = LinearRing((0.1, 0.2), (1 / 3.0, 2.5e-7), (1e20, -4.0), (0.1, 0.2))
+    assert '<LinearRing>{}</LinearRing>'.format(format_coordinates(np.array(ring.coords))) == ring.kml
+    ring = LinearRing((0.1, 0.2, 5), (1 / 3.0, 2.5e-7, 1.5), (1e20, -4.0, 0), (0.1, 0.2, 5))
+    assert '<LinearRing>{}</LinearRing>'.format(format_coordinates(np.array(ring.coords))) == ring.kml
+
+
+def test_written_sites_read_back(tmpdir):
+    placement = MultiPolygon(Polygon(((0, 0), (1, 0), (1, 1), (0, 0))), Polygon(((2, 2), (3, 2), (3, 3), (2, 2))))
+    outline = Polygon(((0, 0), (4, 0), (4, 4), (0, 0)), ((1, 0.5), (3, 0.5), (3, 2), (1, 0.5)))
+    for kmz in (False, True):
+        path = str(tmpdir.join('site.kmz' if kmz else 'site.kml'))
+        with create_kml(path, kmz) as f:
+            assert write_site_kml(f, 'a&b', 'Radar', placement, outline) == 3
+        assert zipfile.is_zipfile(path) == kmz
+
+        placemarks = list(iter_placemarks(path))
+        assert [name for name, polygons in placemarks] == ['a&b.Radar.0', 'a&b.Radar.1', 'a&b']
+        assert placemarks[1][1][0][0].tolist() == [[2, 2], [3, 2], [3, 3], [2, 2]]
+        assert [ring.tolist() for ring in placemarks[2][1][0]] == [list(map(list, ring)) for ring in outline.coords]
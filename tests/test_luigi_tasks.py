@@ -0,0 +1,15 @@
+from final_project.tasks.luigi_tasks import PlaceSensorTask, PlaceSiteTask
+
+
+def test_place_sensor_targets_follow_the_spec():
+    radar = dict(site='site1', sensor_stype='Radar', sensor_rng=200, sensor_fov=45)
+    paths = {PlaceSensorTask(**dict(radar, **changed)).output().path
+             for changed in ({}, {'sensor_rng': 250}, {'sensor_fov': 30}, {'vectorized': True},
+                             {'projection': 'aeqd'}, {'simplify': True})}
+    assert len(paths) == 6
+    # cache settings do not change the placement
+    assert PlaceSensorTask(cache='disk', **radar).output().path in paths
+
+    # named with the digest of PlaceSiteTask
+    digest = PlaceSiteTask.output_path('site1', 'Radar', 'vendor1', 200, 45).rsplit('_', 1)[1]
+    assert PlaceSensorTask(**radar).output().path.endswith('site1_Radar_' + digest)
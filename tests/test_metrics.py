@@ -0,0 +1,79 @@
+import json
+import logging
+import os
+
+import numpy as np
+import pytest
+
+from final_project.tasks import metrics
+from final_project.tasks.cov_algo import placeSensor
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_timer_counts_calls_time_and_items():
+    with metrics.timer('load', sites=1) as counts:
+        counts['vertices'] = 5
+    metrics.add('load', 0.5, sites=2)
+    metrics.count('load', rows=3)
+
+    s = metrics.snapshot()['load']
+    assert s['calls'] == 2
+    assert s['seconds'] >= 0.5
+    assert (s['sites'], s['vertices'], s['rows']) == (3, 5, 3)
+
+
+def test_timed_iter_times_every_item():
+    assert list(metrics.timed_iter('parse', iter('abc'))) == ['a', 'b', 'c']
+    assert metrics.snapshot()['parse']['calls'] == 3
+
+
+def test_collect_and_merge_move_counts_between_processes():
+    metrics.add('place', 1.0, sensors=4)
+    stages = metrics.collect()
+    assert metrics.snapshot() == {}
+
+    metrics.add('place', 0.5, sensors=1)
+    metrics.merge(stages)
+    assert metrics.snapshot() == {'place': {'calls': 2, 'seconds': 1.5, 'sensors': 5}}
+
+
+def test_place_sensor_records_its_stages():
+    fence = np.array([[0.0, 0.0], [100.0, 0.0], [100.0, 30.0], [250.0, 30.0]])
+    sps = placeSensor(fence, rng=50, fov=10)
+
+    s = metrics.snapshot()
+    assert s['placeSensor']['calls'] == 1
+    assert s['placeSensor']['vertices'] == 4
+    assert s['placeSensor']['sensors'] == len(sps)
+    assert s['placeSensor.check']['intersections'] <= s['placeSensor.check']['tests']
+
+
+def test_log_metrics_one_json_line_per_stage(caplog):
+    metrics.add('b', 1.0, rows=2)
+    metrics.add('a', 2.0)
+    with caplog.at_level(logging.INFO, logger=metrics.logger.name):
+        metrics.log_metrics()
+    assert [json.loads(r.getMessage()) for r in caplog.records] == [
+        {'stage': 'a', 'calls': 1, 'seconds': 2.0},
+        {'stage': 'b', 'calls': 1, 'seconds': 1.0, 'rows': 2},
+    ]
+
+
+def test_write_textfile(tmpdir):
+    metrics.add('load_sites.db_write', 0.25, created=10)
+    path = os.path.join(str(tmpdir), 'load_sites.prom')
+    metrics.write_textfile(path, labels={'command': 'load_sites'})
+
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert '# TYPE site_planner_stage_seconds gauge' in lines
+    assert 'site_planner_stage_seconds{command="load_sites",stage="load_sites.db_write"} 0.25' in lines
+    assert 'site_planner_stage_calls{command="load_sites",stage="load_sites.db_write"} 1.0' in lines
+    assert 'site_planner_stage_items{command="load_sites",item="created",stage="load_sites.db_write"} 10.0' in lines
+    assert os.listdir(str(tmpdir)) == ['load_sites.prom']
@@ -0,0 +1,85 @@
+import io
+import json
+
+import numpy as np
+import pytest
+from django.contrib.gis.geos import GEOSGeometry, MultiPolygon
+
+from final_project.tasks.outline_io import (GeoJSONWriter, KmlWriter, WktWriter, format_wkt, guess_format,
+                                            iter_outlines, parse_geojson, parse_wkt, to_geometry)
+
+SQUARE = [[np.array([[0, 0], [4, 0], [4, 4], [0, 4], [0, 0]], dtype=float),
+           np.array([[1, 1], [2, 1], [2, 2], [1, 1]], dtype=float)]]
+
+
+def test_parse_wkt_polygon_with_hole():
+    polygons = parse_wkt('SRID=4326;POLYGON Z ((0 0 1, 4 0 1, 4 4 1, 0 4 1, 0 0 1), (1 1 1, 2 1 1, 2 2 1, 1 1 1))')
+    assert [len(rings) for rings in polygons] == [2]
+    assert polygons[0][0].tolist() == SQUARE[0][0].tolist()
+    assert polygons[0][1].tolist() == SQUARE[0][1].tolist()
+
+
+def test_parse_wkt_multipolygon():
+    polygons = parse_wkt('MULTIPOLYGON (((0 0, 1 0, 1 1, 0 0)), ((5 5, 6 5, 6 6, 5 5), (5.2 5.1, 5.8 5.1, 5.8 5.7, 5.2 5.1)))')
+    assert [len(rings) for rings in polygons] == [1, 2]
+    assert parse_wkt('MULTIPOLYGON EMPTY') == []
+    with pytest.raises(ValueError):
+        parse_wkt('LINESTRING (0 0, 1 1)')
+
+
+def test_format_wkt_reads_in_geos():
+    geom = GEOSGeometry(format_wkt(SQUARE + SQUARE))
+    assert geom.equals_exact(MultiPolygon(to_geometry(SQUARE), to_geometry(SQUARE)))
+    assert format_wkt([]) == 'MULTIPOLYGON EMPTY'
+    assert [r.tolist() for r in parse_wkt(format_wkt(SQUARE))[0]] == [r.tolist() for r in SQUARE[0]]
+
+
+def test_guess_format():
+    assert guess_format('sites.KMZ') == 'kml'
+    assert guess_format('sites.json') == 'geojson'
+    assert guess_format('-') == 'wkt'
+
+
+def test_geojson_round_trip():
+    f = io.StringIO()
+    writer = GeoJSONWriter(f, ('Radar', 200, 45))
+    writer.write('a', SQUARE, SQUARE)
+    writer.write('b', SQUARE + SQUARE, SQUARE)
+    writer.close()
+
+    data = json.loads(f.getvalue())
+    assert [feature['properties']['sensors'] for feature in data['features']] == [1, 2]
+    outlines = list(iter_outlines(io.StringIO(f.getvalue()), 'geojson'))
+    assert [name for name, polygons in outlines] == ['a', 'b']
+    assert outlines[1][1][1][1].tolist() == SQUARE[0][1].tolist()
+
+
+def test_parse_geojson_rejects_malformed_geometries():
+    ring = [[0, 0], [4, 0], [4, 4], [0, 0]]
+    assert parse_geojson({'type': 'Point', 'coordinates': [0, 0]}) == []
+    assert parse_geojson({'type': 'Polygon', 'coordinates': []}) == []
+    assert parse_geojson({'type': 'Polygon', 'coordinates': [ring]})[0][0].tolist() == ring
+    for geometry in ({'coordinates': [ring]}, {'type': 'GeometryCollection'},
+                     {'type': 'Polygon', 'coordinates': [[]]}, {'type': 'Polygon', 'coordinates': [[[0, 0]]]},
+                     {'type': 'Polygon', 'coordinates': [[0, 0], [1, 1]]}, {'type': 'MultiPolygon', 'coordinates': 1}):
+        with pytest.raises(ValueError):
+            parse_geojson(geometry)
+
+
+def test_kml_and_wkt_round_trip():
+    f = io.StringIO()
+    writer = KmlWriter(f, ('Radar', 200, 45))
+    writer.write('yard', SQUARE, SQUARE)
+    writer.close()
+    # the wedge (no holes) & the outline
+    placemarks = list(iter_outlines(io.BytesIO(f.getvalue().encode()), 'kml'))
+    assert [name for name, polygons in placemarks] == ['yard.Radar.0', 'yard']
+    assert [len(polygons[0]) for name, polygons in placemarks] == [1, 2]
+
+    f = io.StringIO()
+    writer = WktWriter(f, ('Radar', 200, 45))
+    writer.write('yard', SQUARE, SQUARE)
+    writer.write('none', [], SQUARE)
+    writer.close()
+    assert f.getvalue().splitlines()[1] == 'MULTIPOLYGON EMPTY'
+    assert [len(polygons) for name, polygons in iter_outlines(io.StringIO(f.getvalue()), 'wkt')] == [1, 0]
@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+from django.contrib.gis.geos import Polygon
+
+from final_project.tasks.cov_algo import place_site
+from final_project.tasks.placement_cache import DiskCache, content_key
+
+# the pentagon from place_sensors.tests, in Arlington VA
+PENTAGON = Polygon(((-77.0579, 38.8725), (-77.0547, 38.8729), (-77.0532, 38.8705),
+                    (-77.0555, 38.8688), (-77.0584, 38.8700), (-77.0579, 38.8725)))
+
+
+def test_content_key():
+    xy = np.array([[0.0, 0.0], [100.0, 0.0], [100.0, 30.0]])
+    key = content_key(xy, 50, 10)
+    assert key == content_key(xy.tolist(), 50, 10) == content_key(xy.copy(order='F'), 50, 10)
+    assert key != content_key(xy, 50, 11)
+    assert key != content_key(xy + 1e-9, 50, 10)
+    # the same vertices split into other rings
+    assert content_key([xy], 50, 10) == key != content_key([xy[:1], xy[1:]], 50, 10)
+    assert content_key([xy[:2], xy[2:]], 50, 10) != content_key([xy[:1], xy[1:]], 50, 10)
+
+
+def test_disk_cache_evicts_least_recently_used(tmpdir):
+    cache = DiskCache(str(tmpdir), max_bytes=250)
+    for i, key in enumerate(['aa1', 'bb2', 'cc3']):
+        cache.set(key, bytes(100))
+        # distinct mtimes, the oldest first
+        os.utime(cache._path(key), (i, i))
+    assert cache.get('missing') is None
+
+    # reading aa1 makes bb2 the least recently used entry
+    assert cache.get('aa1') == bytes(100)
+    assert cache.evict() == 1
+    assert cache.get('bb2') is None
+    assert cache.get('aa1') == cache.get('cc3') == bytes(100)
+
+
+def test_disk_cache_hit_on_an_evicted_entry(tmpdir, monkeypatch):
+    cache = DiskCache(str(tmpdir))
+    cache.set('aa1', b'wkb')
+
+    # evicted by another process between the read & the touch
+    def evicted(path):
+        raise FileNotFoundError(path)
+    monkeypatch.setattr(os, 'utime', evicted)
+    assert cache.get('aa1') == b'wkb'
+
+
+def test_place_site_reuses_cached_placements(tmpdir):
+    cache = DiskCache(str(tmpdir))
+    sensors = [('Radar', 'vendor1', 200, 45), ('Camera', 'vendor1', 50, 10)]
+    placed = place_site(PENTAGON, sensors, cache=cache)
+
+    # the second run reads every placement back from the cache, whatever the sensor names
+    renamed = [('Radar', 'vendor2', 200, 45), ('Camera', 'vendor2', 50, 10)]
+    cached = place_site(PENTAGON, renamed, cache=cache)
+    assert len(list(tmpdir.visit('*.wkb'))) == 2
+    assert all(a.equals_exact(b, 0) for a, b in zip(placed, cached))
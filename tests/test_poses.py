@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from django.contrib.gis.geos import Polygon
+
+from final_project.tasks.cov_algo import place_site, placeSensorRings, sensorPoses
+from final_project.tasks.poses import POSE_DTYPE, merge_poses, pack_poses, pose_placement, pose_rings, unpack_poses
+
+# the pentagon from place_sensors.tests, in Arlington VA
+PENTAGON = Polygon(((-77.0579, 38.8725), (-77.0547, 38.8729), (-77.0532, 38.8705),
+                    (-77.0555, 38.8688), (-77.0584, 38.8700), (-77.0579, 38.8725)))
+
+# a 300m x 200m ring around the origin
+RING = np.array([[0.0, 0.0], [300.0, 0.0], [300.0, 200.0], [0.0, 200.0], [0.0, 0.0]])
+
+
+def test_pack_poses():
+    data = pack_poses([[1.0, 2.0], [3.0, 4.0]], [[0.0, 1.0], [-1.0, 0.0]])
+    assert len(data) == 2 * POSE_DTYPE.itemsize == 48
+    poses = unpack_poses(data)
+    assert poses['x'].tolist() == [1, 3] and poses['y'].tolist() == [2, 4]
+    assert np.allclose(poses['heading'], [np.pi / 2, np.pi])
+    assert unpack_poses(pack_poses(np.empty((0, 2)), np.empty(0))).size == 0
+    assert unpack_poses(merge_poses([data, data])).tolist() == poses.tolist() * 2
+
+
+@pytest.mark.parametrize("options", [{}, {'vectorized': True}, {'algorithm': 'cover'}])
+def test_pose_rings_match_the_placement(options):
+    origins, headings = sensorPoses(RING, rng=50, fov=45, **options)
+    assert origins.shape == headings.shape == (len(origins), 2) and len(origins)
+    rings = placeSensorRings(RING, rng=50, fov=45, **options)
+    assert np.allclose(pose_rings(pack_poses(origins, headings), 50, 45), rings, rtol=0, atol=1e-9)
+
+
+def test_place_site_poses():
+    sensors = [('Radar', 'vendor1', 200, 45), ('Camera', 'vendor1', 50, 10)]
+    placed = place_site(PENTAGON, sensors)
+    poses = place_site(PENTAGON, sensors, poses=True)
+    for mpoly, (data, srs), (stype, name, rng, fov) in zip(placed, poses, sensors):
+        assert srs.startswith('+proj=utm')
+        assert len(unpack_poses(data)) == len(mpoly)
+        assert pose_placement(data, srs, rng, fov).equals_exact(mpoly, 1e-9)
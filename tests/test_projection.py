@@ -0,0 +1,42 @@
+import pytest
+from django.contrib.gis.geos import Polygon
+
+from final_project.tasks.projection import WGS84, coord_transform, local_projection, transform_pair, utm_zone
+
+# the pentagon from place_sensors.tests, in Arlington VA
+PENTAGON = Polygon(((-77.0579, 38.8725), (-77.0547, 38.8729), (-77.0532, 38.8705),
+                    (-77.0555, 38.8688), (-77.0584, 38.8700), (-77.0579, 38.8725)))
+
+
+def test_utm_zone():
+    assert utm_zone(-77.05, 38.87) == 18
+    assert utm_zone(-180, 0) == 1
+    assert utm_zone(179.9, 0) == 60
+    assert utm_zone(151.2, -33.9) == 56
+    # Norway & Svalbard exceptions
+    assert utm_zone(5, 60) == 32
+    assert utm_zone(15, 78) == 33
+
+
+def test_local_projection():
+    assert local_projection(PENTAGON) == '+proj=utm +zone=18 +ellps=WGS84'
+    assert local_projection(PENTAGON, 'aeqd') == '+proj=aeqd +lat_0=38.87 +lon_0=-77.06 +ellps=WGS84 +units=m'
+
+    sydney = Polygon(((151.20, -33.86), (151.21, -33.86), (151.21, -33.87), (151.20, -33.86)))
+    assert local_projection(sydney) == '+proj=utm +zone=56 +south +ellps=WGS84'
+
+    with pytest.raises(ValueError):
+        local_projection(PENTAGON, 'mercator')
+
+
+def test_transforms_are_pooled():
+    srs = local_projection(PENTAGON)
+    to_local, to_wgs = transform_pair(srs)
+    assert coord_transform(WGS84, srs) is to_local
+    assert transform_pair(srs) == (to_local, to_wgs)
+
+    poly = PENTAGON.clone()
+    poly.transform(to_local)
+    assert 321000 < poly.centroid.x < 322000
+    poly.transform(to_wgs)
+    assert poly.equals_exact(PENTAGON, 1e-9)
@@ -0,0 +1,58 @@
+import numpy as np
+from django.contrib.gis.geos import Point
+
+from final_project.tasks.cov_algo import placeSensor
+from final_project.tasks.set_cover import candidate_poses, coverage_targets, greedy_cover, incidence
+
+# a 1km straight fence & a jagged ring around a 2km circle
+FENCE = np.array([[0.0, 0.0], [1000.0, 0.0]])
+t = np.linspace(0, 2 * np.pi, 400, endpoint=False)
+r = 2000 * (1 + 0.15 * np.sin(7 * t) + 0.05 * np.random.RandomState(0).rand(400))
+JAGGED = np.column_stack([r * np.cos(t), r * np.sin(t)])
+JAGGED = np.vstack([JAGGED, JAGGED[:1]])
+
+
+def test_targets_and_candidates():
+    targets, weights = coverage_targets(FENCE, 300)
+    assert targets.tolist() == [[150, 0], [450, 0], [750, 0], [950, 0]]
+    assert weights.tolist() == [300, 300, 300, 100]
+
+    origins, headings = candidate_poses(FENCE, 500)
+    assert origins.tolist() == [[0, 0], [0, 0], [500, 0], [500, 0]]
+    assert headings.tolist() == [[1, 0], [-1, 0], [1, 0], [-1, 0]]
+
+
+def test_incidence_matches_brute_force():
+    origins, headings = candidate_poses(JAGGED, 100)
+    targets, _ = coverage_targets(JAGGED, 50)
+    indptr, indices = incidence(origins, headings, targets, 200, 45)
+
+    v = targets[None, :, :] - origins[:, None, :]
+    dist = np.hypot(v[..., 0], v[..., 1])
+    along = (v * headings[:, None, :]).sum(axis=2)
+    # the sector inscribed in the wedge: 45 degrees each side of the heading, inside the arc chords
+    hit = (dist <= 200 * np.cos(np.pi / 16)) & ((along >= dist * np.cos(np.pi / 4)) | (dist == 0))
+    for i in range(len(origins)):
+        assert indices[indptr[i]:indptr[i + 1]].tolist() == np.flatnonzero(hit[i]).tolist()
+
+
+def test_greedy_cover():
+    # the classic instance where picking the biggest set first is not optimal
+    sets = [[0, 1, 2, 3, 4, 5, 6], [0, 1, 2, 7], [3, 4, 5, 6, 8], [7, 8]]
+    indptr = np.cumsum([0] + [len(c) for c in sets])
+    indices = np.concatenate(sets)
+    assert greedy_cover(indptr, indices, np.ones(9)).tolist() == [0, 3]
+    # when the big set costs more than two others together, they are picked instead
+    assert greedy_cover(indptr, indices, np.ones(9), costs=[4, 1, 1, 1]).tolist() == [1, 2]
+
+
+def test_cover_places_fewer_sensors_on_a_jagged_outline():
+    cover = placeSensor(JAGGED, rng=200, fov=45, algorithm='cover')
+    # without skip_small, the interval placement leaves no gaps either
+    interval = placeSensor(JAGGED, rng=200, fov=45)
+    assert len(cover) < len(interval)
+
+    # every coverage target is inside a wedge
+    targets, _ = coverage_targets(JAGGED, 200 / 16)
+    covered = cover.unary_union
+    assert all(covered.intersects(Point(x, y)) for x, y in targets.tolist())
@@ -0,0 +1,92 @@
+import numpy as np
+from django.contrib.gis.geos import Polygon
+
+from final_project.tasks import metrics
+from final_project.tasks.cov_algo import place_site
+from final_project.tasks.placement_cache import DiskCache
+from final_project.tasks.simplify import douglas_peucker, simplify_rings, tolerance_for
+
+# a wobbly 500m ring digitized every ~3cm
+t = np.linspace(0, 2 * np.pi, 100001)
+WOBBLY = np.column_stack([(500 + np.sin(40 * t)) * np.cos(t), (500 + np.sin(40 * t)) * np.sin(t)])
+WOBBLY[-1] = WOBBLY[0]
+
+
+def reference(xy, tolerance):
+    """recursive Douglas-Peucker, one span at a time"""
+    def distance(q, a, b):
+        d = b - a
+        length2 = d.dot(d)
+        u = np.clip((q - a).dot(d) / length2, 0, 1) if length2 else 0.0
+        return np.hypot(*(q - a - d * u))
+
+    def split(i, j):
+        if j - i < 2:
+            return []
+        dist = [distance(xy[k], xy[i], xy[j]) for k in range(i + 1, j)]
+        k = i + 1 + int(np.argmax(dist))
+        return split(i, k) + [k] + split(k, j) if dist[k - i - 1] > tolerance else []
+
+    return xy[[0] + split(0, len(xy) - 1) + [len(xy) - 1]]
+
+
+def test_tolerance_for():
+    assert [tolerance_for(rng) for rng in (200, 180, 50, 0)] == [2.0, 1.0, 0.5, 0.0]
+
+
+def test_douglas_peucker_matches_the_recursive_algorithm():
+    # jittered, so no two vertices tie for the farthest
+    xy = WOBBLY[::50] + np.random.RandomState(0).normal(0, 0.1, (2001, 2))
+    xy[-1] = xy[0]
+    for tolerance in (0.25, 2.0, 8.0):
+        assert np.array_equal(douglas_peucker(xy, tolerance), reference(xy, tolerance))
+
+
+def test_douglas_peucker():
+    simplified = douglas_peucker(WOBBLY, 2.0)
+    assert 4 <= len(simplified) < len(WOBBLY) / 100
+    assert (simplified[0] == simplified[-1]).all()
+
+    # every dropped vertex is within the tolerance of the simplified ring
+    a, b = simplified[:-1], simplified[1:]
+    d = b - a
+    q = WOBBLY[::97, None, :] - a[None]
+    u = np.clip((q * d).sum(axis=2) / (d * d).sum(axis=1), 0, 1)
+    assert np.hypot(*np.moveaxis(q - d * u[..., None], 2, 0)).min(axis=1).max() <= 2.0
+
+    # the z values come along, and rings too small to simplify are kept whole
+    square = np.array([[0, 0, 5], [1, 0, 5], [2, 0, 5], [2, 2, 5], [0, 2, 5], [0, 0, 5]], dtype=float)
+    assert douglas_peucker(square, 0.1).tolist() == square[[0, 2, 3, 4, 5]].tolist()
+    assert douglas_peucker(square, 10.0) is square
+
+
+def test_simplify_rings_are_cached(tmpdir):
+    cache = DiskCache(str(tmpdir))
+    metrics.reset()
+    first = simplify_rings([WOBBLY, WOBBLY[::-1]], 2.0, cache)
+    second = simplify_rings([WOBBLY, WOBBLY[::-1]], 2.0, cache)
+    assert all(np.array_equal(a, b) for a, b in zip(first, second))
+    counts = metrics.snapshot()['simplify']
+    assert counts['misses'] == counts['hits'] == 1
+    assert counts['vertices'] == 4 * len(WOBBLY) and counts['kept'] < counts['vertices'] / 100
+
+
+def test_place_site_simplified():
+    # the pentagon from place_sensors.tests, in Arlington VA, with a vertex every ~10cm
+    corners = np.array([(-77.0579, 38.8725), (-77.0547, 38.8729), (-77.0532, 38.8705), (-77.0555, 38.8688),
+                        (-77.0584, 38.8700), (-77.0579, 38.8725)])
+    f = np.linspace(0, 1, 2000, endpoint=False)[:, None]
+    dense = np.concatenate([a + (b - a) * f for a, b in zip(corners[:-1], corners[1:])] + [corners[-1:]])
+    sensors = [('Radar', 'vendor1', 200, 45), ('Radar', 'vendor2', 250, 45), ('Camera', 'vendor1', 50, 10)]
+
+    metrics.reset()
+    placed = place_site(Polygon(dense), sensors, simplify=True)
+    stages = metrics.snapshot()
+    # one simplified outline per tolerance, shared by the radars
+    assert stages['simplify']['calls'] == 2
+    assert stages['simplify']['kept'] < stages['simplify']['vertices'] / 1000
+    check = stages['simplify.check']
+    assert check['calls'] == 3
+    assert abs(check['covered_length'] / check['length'] -
+               check['simplified_covered_length'] / check['simplified_length']) < 0.01
+    assert [len(p) for p in placed] == [len(p) for p in place_site(Polygon(corners), sensors)]
@@ -0,0 +1,32 @@
+import pytest
+
+from final_project.tasks.spatial_index import GridIndex
+
+
+def test_query_returns_overlapping_boxes_in_insertion_order():
+    index = GridIndex(10)
+    index.insert((25, 25, 35, 35))
+    index.insert((0, 0, 5, 5))
+    index.insert((100, 100, 120, 120))
+    index.insert((4, 4, 30, 30))
+
+    assert len(index) == 4
+    assert index.query((0, 0, 40, 40)) == [0, 1, 3]
+    assert index.query((110, 0, 130, 10)) == []
+
+
+def test_touching_boxes_overlap():
+    index = GridIndex(10)
+    index.insert((0, 0, 10, 10))
+    assert index.query((10, 10, 20, 20)) == [0]
+
+
+def test_negative_coordinates_and_large_boxes():
+    index = GridIndex(1)
+    index.insert((-50, -50, 50, 50))
+    assert index.query((-0.5, -0.5, -0.25, -0.25)) == [0]
+
+
+def test_cell_size_must_be_positive():
+    with pytest.raises(ValueError):
+        GridIndex(0)
@@ -0,0 +1,64 @@
+from math import asinh, floor, pi, radians, tan
+
+import numpy as np
+import pytest
+
+from final_project.tasks.tiles import EXTENT, clip_ring, snap_ring, tile_bounds, tile_polygons
+
+SQUARE = np.array([[0, 0], [4, 0], [4, 4], [0, 4], [0, 0]], dtype=float)
+
+
+def tile_of(z, lon, lat):
+    """the tile of a lon-lat position"""
+    n = 2 ** z
+    return z, floor((lon + 180) / 360 * n), floor((1 - asinh(tan(radians(lat))) / pi) / 2 * n)
+
+
+def test_tile_bounds():
+    assert tile_bounds(0, 0, 0) == pytest.approx((-180, -85.0511287798, 180, 85.0511287798))
+    assert tile_bounds(1, 1, 0) == pytest.approx((0, 0, 180, 85.0511287798))
+    west, south, east, north = tile_bounds(1, 1, 1, buffer=EXTENT / 4)
+    assert (west, east) == pytest.approx((-45, 225))
+
+
+def test_clip_ring():
+    assert clip_ring(SQUARE, (-1, -1, 5, 5)) is SQUARE
+    assert not len(clip_ring(SQUARE, (5, 5, 6, 6)))
+    clipped = clip_ring(SQUARE, (1, 1, 3, 10))
+    assert clipped.tolist() == [[3, 4], [1, 4], [1, 1], [3, 1], [3, 4]]
+
+    # the two arms of a U cut across are joined along the edge of the box
+    u = np.array([[0, 0], [3, 0], [3, 3], [2, 3], [2, 1], [1, 1], [1, 3], [0, 3], [0, 0]], dtype=float)
+    clipped = clip_ring(u, (-1, 2, 4, 4))
+    assert clipped[0].tolist() == clipped[-1].tolist()
+    assert clipped.min(axis=0).tolist() == [0, 2]
+
+
+def test_snap_ring_drops_vertices_in_the_same_cell():
+    ring = np.array([[0, 0], [1e-9, 0], [1, 0], [1, 1], [1 + 1e-9, 1], [0, 0]])
+    assert snap_ring(ring, (0, 0, 4096, 4096)).tolist() == [[0, 0], [1, 0], [1, 1], [0, 0]]
+    # a ring within one or two cells collapses
+    assert not len(snap_ring(ring, (0, 0, 4096 * 4, 4096 * 4)))
+
+
+def test_tile_polygons_collapse_at_low_zoom():
+    # a 10 m square with a hole, inside a zoom 20 tile (~38 m) near null island. off its centre,
+    # which is on the grid lines of the lower zooms
+    tile = tile_of(20, 0.001, 0.001)
+    west, south, east, north = tile_bounds(*tile)
+    d = 10 / 111320.0
+    corner = np.array([west + 0.123 * (east - west), south + 0.123 * (north - south)])
+    outer = np.array([[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]) * d + corner
+    hole = np.array([[0.3, 0.3], [0.6, 0.3], [0.6, 0.6], [0.3, 0.3]]) * d + corner
+
+    polygons = tile_polygons([[outer, hole]], *tile)
+    assert [len(rings) for rings in polygons] == [2]
+    assert np.abs(polygons[0][0] - outer).max() <= (east - west) / EXTENT
+
+    # a hole within a cell (~1 cm at zoom 20) is dropped, not the polygon
+    speck = (hole - corner) / 1000 + corner
+    assert [len(rings) for rings in tile_polygons([[outer, speck]], *tile)] == [1]
+    # a few cells at most at zoom 8 (~38 m cells)
+    assert tile_polygons([[outer, hole]], *tile_of(8, 0.001, 0.001)) == []
+    # outside the tile
+    assert tile_polygons([[outer, hole]], 20, 0, 0) == []